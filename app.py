@@ -2,15 +2,20 @@
 import streamlit as st
 from datetime import datetime
 from utils.database import init_db
+from utils.jobs import init_jobs_db
 from components.ui_components import (
     render_sidebar,
     render_product_form,
     render_quick_add,
+    render_bulk_import,
     render_product_list,
     render_generate_pdf_section,
     render_saved_reports,
     render_footer
 )
+from components.admin_panel import render_performance_panel
+from components.analytics_panel import render_analytics_panel
+from utils.warmup import start_warmup
 
 # Page configuration
 st.set_page_config(
@@ -18,15 +23,29 @@ st.set_page_config(
     layout="wide"
 )
 
-# Initialize database
+# Initialize database (and resume PDF jobs queued before a restart)
 init_db()
+init_jobs_db()
 
 # Initialize session state
 if 'products' not in st.session_state:
     st.session_state.products = []
 
-if 'show_reports' not in st.session_state:
-    st.session_state.show_reports = False
+# Page shown in the main area: 'editor', 'reports', 'analytics' or 'performance'
+if 'view' not in st.session_state:
+    st.session_state.view = 'editor'
+
+if 'saved_report_pdfs' not in st.session_state:
+    st.session_state.saved_report_pdfs = {}
+
+if 'reports_page_cursors' not in st.session_state:
+    st.session_state.reports_page_cursors = [None]
+
+if 'pdf_jobs' not in st.session_state:
+    st.session_state.pdf_jobs = []
+
+if 'pdf_job_results' not in st.session_state:
+    st.session_state.pdf_job_results = {}
 
 # Main title
 st.title("📄 Medghor.com Focus Item PDF Generator")
@@ -39,7 +58,13 @@ start_date, end_date, brand_name, rate_label = render_sidebar(
 )
 
 # Main content area
-if st.session_state.show_reports:
+if st.session_state.view == 'performance':
+    # Show admin performance panel
+    render_performance_panel()
+elif st.session_state.view == 'analytics':
+    # Show pre-aggregated offer analytics
+    render_analytics_panel()
+elif st.session_state.view == 'reports':
     # Show saved reports view
     render_saved_reports(rate_label)
 else:
@@ -52,11 +77,17 @@ else:
     # Quick add from popular products
     render_quick_add()
     
+    # Bulk import from a price list
+    render_bulk_import()
+    
     # Display current products
-    render_product_list()
+    render_product_list(rate_label)
     
     # Generate PDF section
     render_generate_pdf_section(start_date, end_date, brand_name, rate_label)
 
 # Footer
 render_footer()
+
+# Preload deferred modules once the first page has been sent
+start_warmup()
@@ -0,0 +1 @@
+"""Performance benchmarks for Medghor Focus Item PDF Generator"""
@@ -0,0 +1,201 @@
+"""Load test for the headless HTTP service
+
+Usage:
+    python -m benchmarks.load_test --self-host                 # temp DB + in-process server
+    python -m benchmarks.load_test --url http://127.0.0.1:8502 --scenario list
+    python -m benchmarks.load_test --self-host --scenario render --etag --concurrency 16
+
+Scenarios:
+    render      POST /render with a fresh product list per request (cache misses)
+    render-hot  POST /render with one product list (PDF cache hits)
+    list        GET /reports, following next_cursor for a few pages
+    report      GET /reports/<id> for random saved reports
+    report-pdf  GET /reports/<id>/pdf for random saved reports
+
+With --etag, requests repeat the ETag of the previous PDF response in
+If-None-Match, measuring the 304 path. Prints p50/p90/p99 latency,
+throughput and status counts as JSON.
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.synthetic import make_products, populate_reports
+from utils.connection import set_database_path, DB_PATH
+
+SCENARIOS = ('render', 'render-hot', 'list', 'report', 'report-pdf')
+
+
+def _request(url, body=None, headers=None):
+    """Send one request; returns (status, headers, body bytes)"""
+    data = json.dumps(body).encode() if body is not None else None
+    request = urllib.request.Request(url, data=data, headers=dict(headers or {}))
+    if data is not None:
+        request.add_header('Content-Type', 'application/json')
+    try:
+        with urllib.request.urlopen(request, timeout=120) as response:
+            return response.status, response.headers, response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.headers, e.read()
+
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(q * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def make_request_factory(base_url, scenario, product_count=50, report_ids=()):
+    """Return a function i -> (url, body) producing the i-th request of a scenario"""
+    hot_products = make_products(product_count, seed=1)
+
+    def render(i):
+        products = hot_products if scenario == 'render-hot' else make_products(product_count, seed=i + 2)
+        return f'{base_url}/render', {
+            'start_date': '2025-10-07', 'end_date': '2025-10-10',
+            'brand_name': 'GENERIC FOCUS BRAND', 'products': products,
+        }
+
+    def listing(i):
+        return f'{base_url}/reports?limit=20', None
+
+    def report(i):
+        report_id = random.Random(i).choice(report_ids)
+        suffix = '/pdf' if scenario == 'report-pdf' else ''
+        return f'{base_url}/reports/{report_id}{suffix}', None
+
+    if scenario in ('render', 'render-hot'):
+        return render
+    if scenario == 'list':
+        return listing
+    if not report_ids:
+        raise ValueError(f"Scenario '{scenario}' needs saved reports")
+    return report
+
+
+def run_load(make_request, requests, concurrency, use_etag=False):
+    """Fire requests with a fixed number of client threads
+
+    Returns:
+        dict: Latency percentiles in ms, throughput and status counts
+    """
+    latencies = []
+    statuses = {}
+    lock = threading.Lock()
+    etags = {}
+
+    def one(i):
+        url, body = make_request(i)
+        headers = {}
+        if use_etag and url in etags:
+            headers['If-None-Match'] = etags[url]
+        started = time.perf_counter()
+        try:
+            status, response_headers, _ = _request(url, body, headers)
+        except OSError:
+            status, response_headers = 'error', {}
+        elapsed = (time.perf_counter() - started) * 1000
+        with lock:
+            latencies.append(elapsed)
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+            if use_etag and response_headers and response_headers.get('ETag'):
+                etags[url] = response_headers['ETag']
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(one, range(requests)))
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'requests': requests,
+        'concurrency': concurrency,
+        'wall_s': round(wall, 3),
+        'throughput_rps': round(requests / wall, 2),
+        'p50_ms': round(_percentile(latencies, 0.50), 2),
+        'p90_ms': round(_percentile(latencies, 0.90), 2),
+        'p99_ms': round(_percentile(latencies, 0.99), 2),
+        'mean_ms': round(statistics.fmean(latencies), 2),
+        'max_ms': round(latencies[-1], 2),
+        'statuses': statuses,
+    }
+
+
+def _start_local_server(workdir, workers, reports):
+    """Serve a temporary database with synthetic reports from this process"""
+    from utils import database
+    from utils.http_service import BoundedHTTPServer
+    from utils.pdf_cache import PDFCache
+
+    path = f'{workdir}/load_test.db'
+    set_database_path(path)
+    database.init_db()
+    if reports:
+        populate_reports(reports)
+        # Re-run schema setup so the synthetic rows are migrated and indexed
+        set_database_path(path)
+        database.init_db()
+    # A private cache keeps cold runs cold and rendered PDFs out of the working tree
+    cache = PDFCache(disk_dir=os.path.join(workdir, 'pdf_cache'))
+    server = BoundedHTTPServer(('127.0.0.1', 0), workers=workers, quiet=True, cache=cache)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_port}', list(range(1, reports + 1))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the Medghor HTTP service")
+    parser.add_argument('--url', help="Base URL of a running service")
+    parser.add_argument('--self-host', action='store_true',
+                        help="Start a service on a temporary database in this process")
+    parser.add_argument('--workers', type=int, default=4, help="Server workers with --self-host")
+    parser.add_argument('--reports', type=int, default=1000,
+                        help="Synthetic reports created with --self-host")
+    parser.add_argument('--scenario', choices=SCENARIOS, default='render-hot')
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--products', type=int, default=50, help="Products per rendered sheet")
+    parser.add_argument('--etag', action='store_true', help="Send If-None-Match when known")
+    parser.add_argument('--report-ids', type=int, nargs='*', default=(),
+                        help="Report IDs to request (with --url)")
+    args = parser.parse_args(argv)
+    if bool(args.url) == args.self_host:
+        parser.error("pass exactly one of --url and --self-host")
+
+    server = workdir = None
+    try:
+        if args.self_host:
+            workdir = tempfile.mkdtemp(prefix='medghor_load_')
+            server, base_url, report_ids = _start_local_server(workdir, args.workers, args.reports)
+        else:
+            base_url, report_ids = args.url.rstrip('/'), list(args.report_ids)
+        make_request = make_request_factory(base_url, args.scenario, args.products, report_ids)
+        # One untimed request warms caches and imports on the server
+        _request(*make_request(0))
+        result = run_load(make_request, args.requests, args.concurrency, args.etag)
+    finally:
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+            set_database_path(DB_PATH)
+        if workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    result['scenario'] = args.scenario
+    json.dump(result, sys.stdout, indent=2)
+    print()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
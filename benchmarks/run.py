@@ -0,0 +1,190 @@
+"""Benchmark suite for PDF rendering and database paths
+
+Usage:
+    python -m benchmarks.run                         # full suite, JSON to stdout
+    python -m benchmarks.run --quick --output results.json
+    python -m benchmarks.run --compare baseline.json --threshold 0.25
+
+Each benchmark is repeated until it has run for at least --min-time seconds
+(and at least once), and the median is compared against the baseline. The
+process exits with status 1 when any benchmark regressed by more than the
+threshold.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date
+
+import reportlab
+from reportlab.lib.units import inch
+
+from benchmarks.synthetic import make_products, populate_reports
+from utils.connection import set_database_path, DB_PATH
+from utils import database
+from utils.pdf_generator import create_product_table, generate_pdf
+
+PRODUCT_COUNTS = (10, 100, 1000, 10000)
+REPORT_COUNTS = (1000, 10000, 100000)
+QUICK_PRODUCT_COUNTS = (10, 100, 1000)
+QUICK_REPORT_COUNTS = (1000, 10000)
+
+START = date(2025, 10, 7)
+END = date(2025, 10, 10)
+
+
+def measure(func, min_time=1.0, max_repeats=20):
+    """Time func() repeatedly and summarize the samples in milliseconds"""
+    samples = []
+    started = time.perf_counter()
+    while len(samples) < max_repeats:
+        t0 = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - t0) * 1000)
+        if time.perf_counter() - started >= min_time:
+            break
+    return {
+        'repeats': len(samples),
+        'min_ms': round(min(samples), 3),
+        'median_ms': round(statistics.median(samples), 3),
+        'mean_ms': round(statistics.fmean(samples), 3),
+    }
+
+
+def bench_pdf(results, product_counts, min_time):
+    for count in product_counts:
+        products = make_products(count, seed=count)
+
+        def build_table():
+            create_product_table(products, 'Rate/Discount').wrap(7.5*inch, 10*inch)
+
+        def render():
+            generate_pdf(START, END, 'GENERIC FOCUS BRAND', products, 'Rate/Discount')
+
+        results[f'create_product_table[{count}]'] = measure(build_table, min_time)
+        results[f'generate_pdf[{count}]'] = measure(render, min_time)
+        print(f"  pdf {count} products done", file=sys.stderr)
+
+
+def bench_save_report(results, workdir, product_counts, min_time):
+    set_database_path(os.path.join(workdir, 'save.db'))
+    database.init_db()
+    for count in product_counts:
+        products = make_products(count, seed=count)
+        results[f'save_report[{count}]'] = measure(
+            lambda: database.save_report(START, END, 'GENERIC FOCUS BRAND', products), min_time)
+    print("  save_report done", file=sys.stderr)
+
+
+def bench_queries(results, workdir, report_counts, min_time):
+    for count in report_counts:
+        path = os.path.join(workdir, f'reports_{count}.db')
+        set_database_path(path)
+        database.init_db()
+        populate_reports(count)
+        # Re-run schema setup so derived tables are backfilled from the new rows
+        set_database_path(path)
+        database.init_db()
+        middle_id = count // 2
+
+        def popular_cold():
+            database.invalidate_popular_products()
+            database.get_popular_products(10)
+
+        results[f'get_all_reports[{count}]'] = measure(database.get_all_reports, min_time)
+        results[f'get_reports_page[{count}]'] = measure(lambda: database.get_reports_page(20), min_time)
+        results[f'get_popular_products_cold[{count}]'] = measure(popular_cold, min_time)
+        results[f'get_popular_products_warm[{count}]'] = measure(
+            lambda: database.get_popular_products(10), min_time)
+        results[f'load_report[{count}]'] = measure(lambda: database.load_report(middle_id), min_time)
+        print(f"  queries {count} reports done", file=sys.stderr)
+
+
+def run_suite(quick=False, min_time=1.0):
+    """Run every benchmark and return the JSON-serializable results"""
+    product_counts = QUICK_PRODUCT_COUNTS if quick else PRODUCT_COUNTS
+    report_counts = QUICK_REPORT_COUNTS if quick else REPORT_COUNTS
+    results = {}
+    workdir = tempfile.mkdtemp(prefix='medghor_bench_')
+    try:
+        bench_pdf(results, product_counts, min_time)
+        bench_save_report(results, workdir, (10, 100, 1000), min_time)
+        bench_queries(results, workdir, report_counts, min_time)
+    finally:
+        set_database_path(DB_PATH)
+        shutil.rmtree(workdir, ignore_errors=True)
+    return {
+        'meta': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'reportlab': reportlab.Version,
+            'sqlite': sqlite3.sqlite_version,
+            'quick': quick,
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'results': results,
+    }
+
+
+def compare(current, baseline, threshold, min_delta_ms=0.5):
+    """List benchmarks whose median grew by more than threshold (a fraction)
+
+    Changes smaller than min_delta_ms are ignored so timer noise on
+    sub-millisecond benchmarks does not fail the run.
+
+    Returns:
+        list: (name, baseline_ms, current_ms, change) tuples for regressions
+    """
+    regressions = []
+    for name, result in current['results'].items():
+        base = baseline['results'].get(name)
+        if not base or not base['median_ms']:
+            continue
+        change = result['median_ms'] / base['median_ms'] - 1
+        if change > threshold and result['median_ms'] - base['median_ms'] >= min_delta_ms:
+            regressions.append((name, base['median_ms'], result['median_ms'], change))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark PDF rendering and database paths")
+    parser.add_argument('--quick', action='store_true', help="Skip the largest data sizes")
+    parser.add_argument('--min-time', type=float, default=1.0,
+                        help="Minimum seconds spent repeating each benchmark")
+    parser.add_argument('--output', help="Write JSON results to this file instead of stdout")
+    parser.add_argument('--compare', help="Baseline JSON file to compare against")
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help="Allowed slowdown versus the baseline (0.25 = 25%%)")
+    parser.add_argument('--min-delta-ms', type=float, default=0.5,
+                        help="Ignore slowdowns smaller than this many milliseconds")
+    args = parser.parse_args(argv)
+
+    current = run_suite(quick=args.quick, min_time=args.min_time)
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(current, file, indent=2)
+    else:
+        json.dump(current, sys.stdout, indent=2)
+        print()
+
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+        regressions = compare(current, baseline, args.threshold, args.min_delta_ms)
+        for name, base_ms, current_ms, change in regressions:
+            print(f"REGRESSION {name}: {base_ms:.2f} ms -> {current_ms:.2f} ms (+{change:.0%})",
+                  file=sys.stderr)
+        if regressions:
+            return 1
+        print(f"No regressions above {args.threshold:.0%}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
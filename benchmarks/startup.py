@@ -0,0 +1,139 @@
+"""Cold-start measurement for the Streamlit app
+
+Usage:
+    python -m benchmarks.startup                     # report only
+    python -m benchmarks.startup --budget-ms 800     # exit 1 when over budget
+    python -m benchmarks.startup --repeats 5 --top 20
+
+Every sample runs in a fresh interpreter with an empty working directory
+(so the database is created from scratch) and background warm-up disabled:
+
+- first_render_ms: AppTest's first run of app.py, i.e. the app's own
+  imports, schema setup and the first page (Streamlit itself is excluded,
+  a running server has already imported it)
+- rerun_ms: a second run of the same session
+- deferred_loaded: modules that should only load on first use but were
+  imported during the first render
+
+The import profile (python -X importtime) of the slowest modules first
+imported by app.py is printed as well.
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP = os.path.join(REPO, 'app.py')
+
+# Heavy modules that must stay out of the first render
+DEFERRED_MODULES = ('reportlab', 'streamlit_authenticator', 'bcrypt', 'yaml', 'openpyxl')
+
+DEFAULT_BUDGET_MS = 1000
+
+PROBE = '''
+import json, sys, time
+sys.path.insert(0, {repo!r})
+from streamlit.testing.v1 import AppTest
+app_modules = set(sys.modules)
+started = time.perf_counter()
+at = AppTest.from_file({app!r}, default_timeout=120).run()
+first = time.perf_counter() - started
+if at.exception:
+    raise SystemExit(f"app raised: {{at.exception}}")
+started = time.perf_counter()
+at.run()
+rerun = time.perf_counter() - started
+print(json.dumps({{
+    'first_render_ms': round(first * 1000, 1),
+    'rerun_ms': round(rerun * 1000, 1),
+    'deferred_loaded': sorted(m for m in {deferred!r} if m in sys.modules),
+    'app_imports': sorted(set(sys.modules) - app_modules),
+}}))
+'''
+
+
+def _run_probe(extra_args=()):
+    """Run the probe in a fresh interpreter; returns (result dict, stderr)"""
+    workdir = tempfile.mkdtemp(prefix='medghor_startup_')
+    env = dict(os.environ, MEDGHOR_WARMUP='0', PYTHONDONTWRITEBYTECODE='1')
+    try:
+        proc = subprocess.run(
+            [sys.executable, *extra_args, '-c',
+             PROBE.format(repo=REPO, app=APP, deferred=DEFERRED_MODULES)],
+            cwd=workdir, env=env, capture_output=True, text=True, timeout=300)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"startup probe failed:\n{proc.stderr[-2000:]}")
+    return json.loads(proc.stdout.strip().splitlines()[-1]), proc.stderr
+
+
+def import_profile(top=15):
+    """Slowest modules imported by app.py, by cumulative import time
+
+    Returns:
+        list: (module, cumulative_ms) pairs for modules first imported by
+        the app script (Streamlit's own startup imports are excluded)
+    """
+    result, stderr = _run_probe(['-X', 'importtime'])
+    app_imports = set(result['app_imports'])
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        _, cumulative, name = line.split('|', 2)
+        module = name.strip()
+        if module in app_imports and cumulative.strip().isdigit():
+            rows.append((module, int(cumulative) / 1000))
+    rows.sort(key=lambda row: row[1], reverse=True)
+    return rows[:top]
+
+
+def measure(repeats=3):
+    """Median cold-start numbers over several fresh interpreters"""
+    samples = [_run_probe()[0] for _ in range(repeats)]
+    return {
+        'repeats': repeats,
+        'first_render_ms': statistics.median(s['first_render_ms'] for s in samples),
+        'first_render_max_ms': max(s['first_render_ms'] for s in samples),
+        'rerun_ms': statistics.median(s['rerun_ms'] for s in samples),
+        'deferred_loaded': sorted(set().union(*(s['deferred_loaded'] for s in samples))),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure app cold start against a budget")
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--budget-ms', type=float, default=DEFAULT_BUDGET_MS,
+                        help="Maximum median first-render time")
+    parser.add_argument('--top', type=int, default=15, help="Import profile rows to print")
+    parser.add_argument('--no-profile', action='store_true', help="Skip the import profile")
+    args = parser.parse_args(argv)
+
+    result = measure(args.repeats)
+    if not args.no_profile:
+        result['import_profile_ms'] = {module: round(ms, 1)
+                                       for module, ms in import_profile(args.top)}
+    result['budget_ms'] = args.budget_ms
+    json.dump(result, sys.stdout, indent=2)
+    print()
+
+    failures = []
+    if result['first_render_ms'] > args.budget_ms:
+        failures.append(f"first render {result['first_render_ms']:.0f} ms exceeds the "
+                        f"{args.budget_ms:.0f} ms budget")
+    if result['deferred_loaded']:
+        failures.append(f"deferred modules imported at startup: "
+                        f"{', '.join(result['deferred_loaded'])}")
+    for failure in failures:
+        print(f"STARTUP BUDGET FAILED: {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,88 @@
+"""Synthetic data generators for the benchmark suite"""
+import json
+import random
+from datetime import date, timedelta
+
+from utils.connection import transaction
+
+DOSAGE_FORMS = ['TAB', 'CAP', 'SYP', 'INJ', 'GEL', 'CREAM', 'DROPS']
+STRENGTHS = ['5MG', '10MG', '50MG', '100MG', '250MG', '500MG', '650MG']
+BRANDS = ['GENERIC FOCUS BRAND', 'PHARMA FOCUS BRAND', 'HIMALAYA WELLNESS',
+          'CIPLA', 'SUN PHARMA', 'MANKIND']
+
+
+def make_product_names(count, seed=0):
+    """Deterministic, realistic looking product names"""
+    rng = random.Random(seed)
+    letters = 'ABCDEFGHIKLMNOPRSTUVZ'
+    return [
+        f"{''.join(rng.choice(letters) for _ in range(rng.randint(5, 9)))}{i} "
+        f"{rng.choice(STRENGTHS)} {rng.choice(DOSAGE_FORMS)} (1*{rng.randint(1, 15)})"
+        for i in range(count)
+    ]
+
+
+def make_rate(rng):
+    """Rate text in one of the formats operators type"""
+    kind = rng.randint(0, 2)
+    if kind == 0:
+        return f"{rng.randint(5, 900)}/- NET"
+    if kind == 1:
+        return f"{rng.randint(5, 40)}% @ {rng.randint(5, 20)}+{rng.randint(1, 3)}"
+    return f"{rng.randint(5, 40)}%"
+
+
+def make_products(count, seed=0, catalog=None):
+    """List of product dictionaries as kept in st.session_state.products
+
+    Args:
+        count: Number of products
+        seed: Random seed so runs are reproducible
+        catalog: Optional list of names to draw from (default: fresh names)
+    """
+    rng = random.Random(seed)
+    names = rng.sample(catalog, count) if catalog else make_product_names(count, seed)
+    return [{'name': name, 'rate': make_rate(rng)} for name in names]
+
+
+def populate_reports(report_count, products_per_report=20, catalog_size=2000, seed=0):
+    """Bulk insert synthetic reports into the current database
+
+    Reports are written in the legacy products-JSON shape; init_db()
+    afterwards derives report_items and the other indexes from them exactly
+    as it would for an upgraded production database.
+
+    Args:
+        report_count: Number of reports to insert
+        products_per_report: Products in every report
+        catalog_size: Number of distinct product names to draw from
+        seed: Random seed
+    """
+    rng = random.Random(seed)
+    catalog = make_product_names(catalog_size, seed)
+    start = date(2023, 1, 2)
+    batch = []
+    with transaction() as conn:
+        for i in range(report_count):
+            period_start = start + timedelta(days=7 * (i // 20))
+            products = make_products(products_per_report, seed=rng.random(), catalog=catalog)
+            batch.append((
+                period_start.strftime('%Y-%m-%d'),
+                (period_start + timedelta(days=6)).strftime('%Y-%m-%d'),
+                rng.choice(BRANDS),
+                json.dumps(products),
+                rng.randint(1, 5),
+                f"{period_start.strftime('%Y-%m-%d')} {i % 24:02d}:{i % 60:02d}:00",
+            ))
+            if len(batch) >= 5000:
+                _insert_reports(conn, batch)
+                batch = []
+        if batch:
+            _insert_reports(conn, batch)
+    return catalog
+
+
+def _insert_reports(conn, rows):
+    conn.executemany('''INSERT INTO reports (start_date, end_date, brand_name, products,
+                                             user_id, created_at)
+                        VALUES (?, ?, ?, ?, ?, ?)''', rows)
@@ -0,0 +1,112 @@
+"""Admin-only performance panel
+
+The app runs without a login page, so admin access is unlocked with the
+deployment's admin key (MEDGHOR_ADMIN_KEY, or admin_key in Streamlit
+secrets). Users signed in with the admin role are admins as well.
+"""
+import hmac
+import os
+
+import streamlit as st
+from utils import tracing
+from utils.pdf_cache import pdf_cache
+
+ADMIN_KEY_ENV = 'MEDGHOR_ADMIN_KEY'
+
+
+def admin_key():
+    """Configured admin key, or None when admin access is not set up"""
+    key = os.environ.get(ADMIN_KEY_ENV)
+    if not key:
+        try:
+            key = st.secrets.get('admin_key')
+        except Exception:
+            # No secrets file
+            key = None
+    return key or None
+
+
+def is_admin():
+    """Check whether this session unlocked admin access or has the admin role"""
+    if st.session_state.get('admin_unlocked'):
+        return True
+    if not st.session_state.get('session_token'):
+        return False
+    from components.login import check_permission, current_user
+    return current_user() is not None and check_permission('admin')
+
+
+def render_admin_unlock():
+    """Ask for the admin key; returns True once this session is unlocked"""
+    key = admin_key()
+    if key is None:
+        st.error(f"Admin access is not configured. Set {ADMIN_KEY_ENV} to enable this page")
+        return False
+    with st.form("admin_unlock"):
+        entered = st.text_input("Admin key", type="password")
+        submitted = st.form_submit_button("Unlock")
+    if submitted:
+        if hmac.compare_digest(entered.encode(), key.encode()):
+            st.session_state.admin_unlocked = True
+            return True
+        st.error("Incorrect admin key")
+    return False
+
+
+def _pdf_cache_counters():
+    """PDF cache counters as Prometheus gauge names"""
+    return {f'medghor_pdf_cache_{key}': value for key, value in pdf_cache.stats().items()}
+
+
+def render_performance_panel():
+    """Render tracing metrics and PDF cache statistics for admins"""
+    st.markdown("---")
+    st.header("📈 Performance")
+    
+    if not is_admin() and not render_admin_unlock():
+        return
+    
+    enabled = st.toggle("Record timings", value=tracing.is_enabled(),
+                        help="Tracing adds a little overhead to every database call and PDF build")
+    if enabled and not tracing.is_enabled():
+        tracing.enable()
+    elif not enabled and tracing.is_enabled():
+        tracing.disable()
+    
+    st.subheader("Hot Paths")
+    metrics = tracing.snapshot()
+    if metrics:
+        st.dataframe(metrics, use_container_width=True, hide_index=True)
+    else:
+        st.info("No timings recorded yet. Turn on recording and use the app.")
+    
+    st.subheader("PDF Cache")
+    stats = pdf_cache.stats()
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Hits", stats['hits'] + stats['disk_hits'])
+    col2.metric("Misses", stats['misses'])
+    col3.metric("Evictions", stats['evictions'])
+    col4.metric("Memory", f"{stats['bytes'] / 1024 / 1024:.1f} / "
+                          f"{stats['max_bytes'] / 1024 / 1024:.0f} MB")
+    if stats['disk_max_bytes']:
+        st.caption(f"Disk tier: {stats['disk_entries']} PDFs, "
+                   f"{stats['disk_bytes'] / 1024 / 1024:.1f} / "
+                   f"{stats['disk_max_bytes'] / 1024 / 1024:.0f} MB, "
+                   f"{stats['disk_evictions']} evictions")
+    
+    st.subheader("Prometheus Export")
+    metrics_text = tracing.prometheus_text(_pdf_cache_counters())
+    st.download_button("💾 Download metrics.txt", data=metrics_text,
+                       file_name="medghor_metrics.txt", mime="text/plain")
+    with st.expander("Show raw metrics"):
+        st.code(metrics_text, language="text")
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        if st.button("🔄 Reset Timings", use_container_width=True):
+            tracing.reset()
+            st.rerun()
+    with col2:
+        if st.button("✖️ Close Performance View", use_container_width=True):
+            st.session_state.view = 'editor'
+            st.rerun()
@@ -0,0 +1,70 @@
+"""Offer analytics page built on the weekly summary tables"""
+from datetime import date, timedelta
+
+import streamlit as st
+
+from utils.analytics import (get_analytics_brands, get_analytics_weeks, get_brand_trend,
+                             get_top_products, get_product_trend)
+
+# Weeks shown when the page opens, ending at the latest saved report
+DEFAULT_WEEKS = 26
+
+
+def _monday(day):
+    return day - timedelta(days=day.weekday())
+
+
+def render_analytics_panel():
+    """Render weekly brand trends, top products and one product's rate history"""
+    import pandas as pd
+
+    st.markdown("---")
+    st.header("📊 Offer Analytics")
+
+    brands = get_analytics_brands()
+    if not brands:
+        st.info("No saved reports yet. Analytics appear once reports are saved.")
+    else:
+        first_week, last_week = (date.fromisoformat(week) for week in get_analytics_weeks())
+        default_from = max(first_week, last_week - timedelta(weeks=DEFAULT_WEEKS - 1))
+        col1, col2, col3 = st.columns([2, 1, 1])
+        with col1:
+            brand = st.selectbox("Brand", ["All brands"] + brands, key="analytics_brand")
+        with col2:
+            week_from = st.date_input("From", value=default_from, key="analytics_from")
+        with col3:
+            week_to = st.date_input("To", value=last_week + timedelta(days=6),
+                                    key="analytics_to")
+        brand_name = None if brand == "All brands" else brand
+        week_from = _monday(week_from).isoformat()
+        week_to = week_to.isoformat()
+
+        st.subheader("Weekly Activity")
+        trend = pd.DataFrame(get_brand_trend(brand_name, week_from, week_to),
+                             columns=["Week", "Reports", "Items", "Avg Net Price",
+                                      "Avg Discount %"])
+        if trend.empty:
+            st.info("No reports in this period.")
+        else:
+            trend = trend.set_index("Week")
+            st.bar_chart(trend[["Items"]])
+            st.line_chart(trend[["Avg Net Price", "Avg Discount %"]])
+
+        st.subheader("Top Products")
+        top = pd.DataFrame(get_top_products(brand_name, week_from, week_to),
+                           columns=["Product", "Offers", "Weeks", "Avg Net Price",
+                                    "Avg Discount %"])
+        st.dataframe(top, use_container_width=True, hide_index=True)
+
+        if not top.empty:
+            st.subheader("Product Rate History")
+            product = st.selectbox("Product", top["Product"].tolist(), key="analytics_product")
+            history = pd.DataFrame(get_product_trend(product, brand_name),
+                                   columns=["Week", "Offers", "Avg Net Price",
+                                            "Avg Discount %"]).set_index("Week")
+            st.line_chart(history[["Avg Net Price", "Avg Discount %"]])
+            st.dataframe(history, use_container_width=True)
+
+    if st.button("✖️ Close Analytics View", use_container_width=True):
+        st.session_state.view = 'editor'
+        st.rerun()
@@ -1,44 +1,78 @@
 """Login and authentication UI components"""
 import streamlit as st
-from utils.auth import AuthManager
+from datetime import datetime
+from utils.auth import authenticate_credentials, get_auth_manager
 from utils.database import log_action
+from utils.sessions import login, revoke_session, validate_session
+
+SESSION_KEYS = ('session_token', 'authentication_status', 'username', 'name', 'roles')
+
+def _client_ip():
+    """Address of the browser's connection, if Streamlit exposes it"""
+    try:
+        return getattr(st.context, 'ip_address', None)
+    except Exception:
+        return None
+
+def _sign_out_state():
+    for key in SESSION_KEYS:
+        st.session_state.pop(key, None)
+
+def current_user():
+    """Return the signed-in user, checked against the server-side session
+    
+    A session revoked or expired on the server signs the browser out here.
+    """
+    token = st.session_state.get('session_token')
+    user = validate_session(token)
+    if user is None and token:
+        _sign_out_state()
+    return user
 
 def render_login_page():
     """Render login page"""
+    if current_user():
+        return True
+    
     st.title("🔐 Medghor Login")
     st.markdown("Please login to access the Focus Item PDF Generator")
     
-    auth_manager = AuthManager()
-    
     # Login form
-    auth_manager.login()
+    with st.form("login"):
+        username = st.text_input("Username")
+        password = st.text_input("Password", type="password")
+        submitted = st.form_submit_button("Login")
     
-    # Check authentication status
-    if st.session_state.get('authentication_status'):
-        st.success(f"Welcome {st.session_state.get('name')}!")
+    if submitted:
+        token, user, error = login(username, password, _client_ip(),
+                                   authenticate=authenticate_credentials)
+        if token is None:
+            st.error(error)
+            return False
+        st.session_state.session_token = token
+        st.session_state.authentication_status = True
+        st.session_state.username = user['username']
+        st.session_state.name = user['full_name'] or user['username']
+        st.session_state.roles = [user['role']]
+        st.success(f"Welcome {st.session_state.name}!")
         log_action(
-            st.session_state.get('username'),
+            user['username'],
             'LOGIN',
-            f"User logged in at {st.datetime.now()}"
+            f"User logged in at {datetime.now()}"
         )
         return True
-    elif st.session_state.get('authentication_status') is False:
-        st.error('Username/password is incorrect')
-        return False
-    elif st.session_state.get('authentication_status') is None:
-        st.warning('Please enter your username and password')
-        
-        # Show registration option
-        with st.expander("📝 New User? Register Here"):
-            auth_manager.register_user()
-        
-        return False
+    
+    st.warning('Please enter your username and password')
+    
+    # Show registration option
+    with st.expander("📝 New User? Register Here"):
+        get_auth_manager().register_user()
+    
+    return False
 
 def render_user_menu():
     """Render user menu in sidebar"""
-    if st.session_state.get('authentication_status'):
-        auth_manager = AuthManager()
-        
+    if current_user():
         st.sidebar.markdown("---")
         st.sidebar.write(f"👤 **{st.session_state.get('name')}**")
         st.sidebar.write(f"Role: {st.session_state.get('roles', ['viewer'])[0]}")
@@ -51,14 +85,19 @@ def render_user_menu():
                 st.session_state.show_profile_update = True
         
         # Logout button
-        auth_manager.logout()
+        if st.sidebar.button("Logout"):
+            revoke_session(st.session_state.session_token)
+            log_action(st.session_state.get('username'), 'LOGOUT',
+                       f"User logged out at {datetime.now()}")
+            _sign_out_state()
+            st.rerun()
         
         # Handle modals
         if st.session_state.get('show_password_reset'):
-            auth_manager.reset_password()
+            get_auth_manager().reset_password()
         
         if st.session_state.get('show_profile_update'):
-            auth_manager.update_user_details()
+            get_auth_manager().update_user_details()
 
 def check_permission(required_role):
     """Check if user has required permission"""
@@ -2,8 +2,14 @@
 import streamlit as st
 from datetime import datetime
 import json
-from utils.database import get_popular_products, delete_report, load_report
-from utils.pdf_generator import generate_pdf
+from utils.audit import log_action
+from utils.database import get_popular_products, delete_report, load_report, search_products
+from utils.pdf_cache import generate_pdf_cached
+from utils.tracing import span
+
+# Seconds between job status polls and how many jobs a session keeps listed
+JOB_POLL_SECONDS = 2
+MAX_TRACKED_JOBS = 5
 
 def render_sidebar(default_start, default_end):
     """Render sidebar configuration options
@@ -41,26 +47,37 @@ def render_sidebar(default_start, default_end):
     
     # Load saved reports button
     if st.sidebar.button("📂 View Saved Reports"):
-        st.session_state.show_reports = True
+        st.session_state.view = 'reports'
+    
+    # Offer analytics
+    if st.sidebar.button("📊 Offer Analytics"):
+        st.session_state.view = 'analytics'
+    
+    # Performance panel (admins only)
+    from components.admin_panel import admin_key, is_admin
+    if (is_admin() or admin_key()) and st.sidebar.button("📈 Performance"):
+        st.session_state.view = 'performance'
     
     return start_date, end_date, brand_name, rate_label
 
 def render_product_form(rate_label):
-    """Render product addition form
+    """Render product addition form with autocomplete from saved products
     
     Args:
         rate_label: Label for the rate/discount field
     """
+    render_product_search()
+    
     with st.form("add_product_form"):
         st.subheader("Add New Product")
         col1, col2, col3 = st.columns([3, 2, 1])
         
         with col1:
-            product_name = st.text_input("Product Name", 
+            product_name = st.text_input("Product Name", key="new_product_name",
                                         placeholder="e.g., AZINTAS 500MG TAB (1*5)")
         
         with col2:
-            rate_discount = st.text_input(rate_label, 
+            rate_discount = st.text_input(rate_label, key="new_product_rate",
                                          placeholder="e.g., 39/- NET or 15% @ 9+1")
         
         with col3:
@@ -75,6 +92,31 @@ def render_product_form(rate_label):
             })
             st.success(f"Added: {product_name}")
 
+def _fill_product_form(product_name, last_rate):
+    """Prefill the add-product form with a saved product"""
+    st.session_state.new_product_name = product_name
+    st.session_state.new_product_rate = last_rate
+
+def render_product_search():
+    """Render product name search that fills the add-product form"""
+    query = st.text_input("🔍 Search Saved Products", key="product_search",
+                          placeholder="Start typing a product name, e.g. AZIN 500")
+    if not query.strip():
+        return
+    
+    matches = {f"{name} ({last_rate})": (name, last_rate)
+               for name, last_rate, usage_count in search_products(query, 8)}
+    if matches:
+        col1, col2 = st.columns([5, 1])
+        with col1:
+            choice = st.selectbox("Matches", list(matches), key="product_search_choice",
+                                  label_visibility="collapsed")
+        with col2:
+            st.button("↪️ Use", on_click=_fill_product_form, args=matches[choice],
+                      use_container_width=True)
+    else:
+        st.caption("No saved products match. Enter it below as a new product.")
+
 def render_quick_add():
     """Render quick add section for popular products"""
     with st.expander("⚡ Quick Add from Popular Products"):
@@ -93,24 +135,85 @@ def render_quick_add():
         else:
             st.info("No products saved yet. Add some products to see them here!")
 
-def render_product_list():
-    """Display current products with delete option"""
+def render_bulk_import():
+    """Render bulk product import from a CSV/Excel price list"""
+    with st.expander("📤 Bulk Import from CSV/Excel"):
+        st.caption("Columns: Product Name and Rate/Discount (header row optional)")
+        uploaded = st.file_uploader("Price List", type=["csv", "xlsx"],
+                                    key="bulk_import_file")
+        if uploaded and st.button("📥 Import Products", use_container_width=True):
+            from utils.importer import import_price_list
+            with st.spinner("Importing products..."):
+                try:
+                    products, errors, skipped = import_price_list(uploaded, uploaded.name)
+                except ValueError as e:
+                    st.error(str(e))
+                    return
+            st.session_state.products.extend(products)
+            st.success(f"Imported {len(products)} products")
+            if skipped:
+                st.warning(f"Skipped {skipped} invalid rows")
+                for line_number, error in errors:
+                    st.write(f"Line {line_number}: {error}")
+
+def _apply_product_grid(edited):
+    """Replace the draft with the edited grid in one batch
+    
+    Rows are ordered by the SL column (new rows go last), rows without a
+    product name are dropped and serial numbers are renumbered.
+    """
+    edited = edited.assign(sl=edited['sl'].fillna(float('inf')))
+    edited = edited.sort_values('sl', kind='stable')
+    st.session_state.products = [
+        {'name': str(name).strip(), 'rate': '' if rate is None or rate != rate else str(rate).strip()}
+        for name, rate in zip(edited['name'], edited['rate'])
+        if name is not None and name == name and str(name).strip()
+    ]
+
+def render_product_list(rate_label):
+    """Display current products as a single editable grid
+    
+    Edits, row deletions (select rows and press Delete), new rows and
+    reordering (change SL) are collected by the grid and applied to
+    st.session_state.products in one batch, so the number of widgets does
+    not grow with the number of products.
+    
+    Args:
+        rate_label: Label for rate/discount column
+    """
     if st.session_state.products:
+        import pandas as pd
+        
         st.subheader("Current Products")
+        products = st.session_state.products
+        grid = pd.DataFrame({
+            'sl': pd.Series(range(1, len(products) + 1), dtype='float'),
+            'name': [product['name'] for product in products],
+            'rate': [product['rate'] for product in products],
+        })
+        # A new key whenever the draft changes elsewhere resets pending grid edits
+        grid_key = f"product_grid_{hash(tuple((p['name'], p['rate']) for p in products))}"
         
-        for idx, product in enumerate(st.session_state.products):
-            col1, col2, col3, col4 = st.columns([0.5, 3, 2, 0.5])
-            
-            with col1:
-                st.write(f"**{idx + 1}**")
-            with col2:
-                st.write(product['name'])
-            with col3:
-                st.write(product['rate'])
-            with col4:
-                if st.button("🗑️", key=f"delete_{idx}"):
-                    st.session_state.products.pop(idx)
-                    st.rerun()
+        with st.form("product_grid_form", border=False):
+            edited = st.data_editor(
+                grid,
+                key=grid_key,
+                num_rows="dynamic",
+                hide_index=True,
+                use_container_width=True,
+                column_config={
+                    'sl': st.column_config.NumberColumn(
+                        "SL", help="Change to reorder (e.g. 2.5 moves a row between 2 and 3)",
+                        width="small", format="%g"),
+                    'name': st.column_config.TextColumn("Product Name", required=True),
+                    'rate': st.column_config.TextColumn(rate_label),
+                }
+            )
+            apply_button = st.form_submit_button("💾 Apply Changes", use_container_width=True)
+        
+        if apply_button:
+            _apply_product_grid(edited)
+            st.rerun()
         
         # Clear all button
         col1, col2 = st.columns(2)
@@ -121,7 +224,10 @@ def render_product_list():
                 st.rerun()
 
 def render_generate_pdf_section(start_date, end_date, brand_name, rate_label):
-    """Render PDF generation section with download button
+    """Render PDF generation section with download buttons
+    
+    Generation runs as a background job; this session only keeps the job
+    IDs and polls their status.
     
     Args:
         start_date: Start date for the report
@@ -129,7 +235,7 @@ def render_generate_pdf_section(start_date, end_date, brand_name, rate_label):
         brand_name: Brand name for the report
         rate_label: Label for rate/discount column
     """
-    from utils.database import save_report
+    from utils.jobs import submit_job
     
     st.markdown("---")
     col1, col2, col3 = st.columns([1, 1, 1])
@@ -139,72 +245,204 @@ def render_generate_pdf_section(start_date, end_date, brand_name, rate_label):
             if not st.session_state.products:
                 st.error("Please add at least one product before generating PDF")
             else:
-                with st.spinner("Generating PDF..."):
-                    pdf_buffer = generate_pdf(start_date, end_date, brand_name, 
-                                             st.session_state.products, rate_label)
-                    
-                    # Save to database
-                    save_report(start_date, end_date, brand_name, 
-                              st.session_state.products)
-                    
-                    st.success("✅ PDF Generated and Saved Successfully!")
-                    
-                    # Download button
-                    st.download_button(
-                        label="💾 Download PDF",
-                        data=pdf_buffer,
-                        file_name=f"Medghor_Focus_Items_{start_date.strftime('%d%m%Y')}_{end_date.strftime('%d%m%Y')}.pdf",
-                        mime="application/pdf",
-                        use_container_width=True
-                    )
-
-def render_saved_reports(rate_label):
-    from utils.database import get_all_reports
-    import streamlit as st
-    import json
-    from datetime import datetime
+                job_id = submit_job(start_date, end_date, brand_name, st.session_state.products,
+                                    rate_label, username=st.session_state.get('username'))
+                st.session_state.pdf_jobs.insert(0, job_id)
+                del st.session_state.pdf_jobs[MAX_TRACKED_JOBS:]
+    
+    if st.session_state.pdf_jobs:
+        if _update_pdf_jobs():
+            _poll_pdf_jobs()
+        else:
+            _show_pdf_jobs()
+
+def _update_pdf_jobs():
+    """Fetch the status of unfinished jobs and keep finished ones in the session
+    
+    A finished job (with its PDF bytes) is read from the database once; later
+    reruns show it from st.session_state.pdf_job_results.
+    
+    Returns:
+        bool: True while some tracked job is still queued or running
+    """
+    from utils.jobs import get_job, get_job_pdf
+    
+    results = st.session_state.pdf_job_results
+    for job_id in list(results):
+        if job_id not in st.session_state.pdf_jobs:
+            del results[job_id]
+    
+    pending = False
+    for job_id in st.session_state.pdf_jobs:
+        cached = results.get(job_id)
+        if cached is not None and cached[0]['status'] in ('done', 'failed'):
+            continue
+        job = get_job(job_id)
+        if job is None:
+            continue
+        pdf = get_job_pdf(job_id) if job['status'] == 'done' else None
+        results[job_id] = (job, pdf)
+        pending = pending or job['status'] in ('queued', 'running')
+    return pending
+
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def _poll_pdf_jobs():
+    """Re-poll unfinished jobs; rerun the app (ending the polling) once all are done"""
+    if not _update_pdf_jobs():
+        st.rerun()
+    _show_pdf_jobs()
+
+def _job_file_name(job):
+    """Download name of a finished job's PDF, as for a PDF built in the session"""
+    start, end = (datetime.strptime(job[key], '%Y-%m-%d').strftime('%d%m%Y')
+                  for key in ('start_date', 'end_date'))
+    return f"Medghor_Focus_Items_{start}_{end}.pdf"
+
+def _show_pdf_jobs():
+    """Show this session's PDF jobs from the session's job results"""
+    results = st.session_state.pdf_job_results
+    for job_id in st.session_state.pdf_jobs:
+        if job_id not in results:
+            continue
+        job, pdf = results[job_id]
+        label = f"{job['brand_name']} ({job['product_count']} products)"
+        if job['status'] in ('queued', 'running'):
+            st.info(f"⏳ Job #{job_id}: {label} is {job['status']}...")
+        elif job['status'] == 'failed':
+            st.error(f"❌ Job #{job_id}: {label} failed: {job['error']}")
+        else:
+            col1, col2 = st.columns([2, 1])
+            with col1:
+                st.success(f"✅ Job #{job_id}: {label} generated and saved as report #{job['report_id']}")
+            with col2:
+                st.download_button(
+                    label="💾 Download PDF",
+                    data=pdf,
+                    file_name=_job_file_name(job),
+                    mime="application/pdf",
+                    key=f"job_download_{job_id}",
+                    use_container_width=True
+                )
+
+def _load_report_products(report_id):
+    """Load and decode a saved report's product list"""
+    products_json = load_report(report_id)[3]
+    with span('ui.decode_products') as decode_span:
+        products = json.loads(products_json)
+        decode_span.rows = len(products)
+        decode_span.size = len(products_json)
+    return products
+
+def _render_saved_report_pdf(report_id, start, end, brand, products, rate_label):
+    """Render a saved report's PDF and keep the bytes for the rest of the session
+
+    Args:
+        report_id: ID of the saved report
+        start: Start date string ('%Y-%m-%d')
+        end: End date string ('%Y-%m-%d')
+        brand: Brand name of the report
+        products: List of product dictionaries
+        rate_label: Label for rate/discount column
+
+    Returns:
+        bytes: The rendered PDF
+    """
+    pdf_key = (report_id, rate_label)
+    pdf_cache = st.session_state.saved_report_pdfs
+    if pdf_key not in pdf_cache:
+        start_dt = datetime.strptime(start, '%Y-%m-%d')
+        end_dt = datetime.strptime(end, '%Y-%m-%d')
+        pdf_buffer = generate_pdf_cached(start_dt, end_dt, brand, products, rate_label)
+        pdf_cache[pdf_key] = pdf_buffer.getvalue()
+    return pdf_cache[pdf_key]
+
+def _reset_reports_pagination():
+    """Go back to the first page of saved reports (e.g. after a filter change)"""
+    st.session_state.reports_page_cursors = [None]
+
+def render_saved_reports(rate_label, page_size=20):
+    """Render saved reports one page at a time with on-demand PDF downloads
+
+    Only the current page is read from the database. Expander bodies run
+    even when collapsed, so a report's products are only loaded when the
+    user asks for them (Show products, Prepare PDF or Load to Editor).
+    PDFs are kept in session state so later reruns do not rebuild them.
+
+    Args:
+        rate_label: Label for rate/discount column
+        page_size: Number of reports shown per page
+    """
+    from utils.database import get_reports_page
     st.markdown("---")
     st.header("📂 Saved Reports")
-    reports = get_all_reports()
+    brand_filter = st.text_input("Filter by Brand", key="reports_brand_filter",
+                                 on_change=_reset_reports_pagination)
+    cursors = st.session_state.reports_page_cursors
+    reports, next_cursor = get_reports_page(page_size, cursor=cursors[-1],
+                                            brand_name=brand_filter or None)
     if reports:
         for report in reports:
-            report_id, start, end, brand, products_json, user_id, created = report
-            products = json.loads(products_json)
-            with st.expander(f"Report #{report_id} - {brand} ({start} to {end}) - {len(products)} products"):
+            report_id, start, end, brand, product_count, user_id, created = report
+            with st.expander(f"Report #{report_id} - {brand} ({start} to {end}) - {product_count} products"):
                 st.write(f"**Created:** {created}")
                 st.write(f"**Date Range:** {start} to {end}")
                 st.write(f"**Brand:** {brand}")
-                st.write(f"**Products:** {len(products)}")
-                for idx, prod in enumerate(products, 1):
-                    st.write(f"{idx}. {prod['name']} - {prod['rate']}")
+                st.write(f"**Products:** {product_count}")
+                if st.toggle("Show products", key=f"show_products_{report_id}"):
+                    import pandas as pd
+                    products = _load_report_products(report_id)
+                    st.dataframe(pd.DataFrame(products, columns=['name', 'rate'],
+                                              index=range(1, len(products) + 1)),
+                                 use_container_width=True)
                 col1, col2, col3 = st.columns(3)
                 with col1:
-                    start_dt = datetime.strptime(start, '%Y-%m-%d')
-                    end_dt = datetime.strptime(end, '%Y-%m-%d')
-                    from utils.pdf_generator import generate_pdf
-                    pdf_buffer = generate_pdf(start_dt, end_dt, brand, products, rate_label)
-                    st.download_button(
-                        label="📥 Download PDF",
-                        data=pdf_buffer,
-                        file_name=f"Medghor_Report_{report_id}.pdf",
-                        mime="application/pdf",
-                        key=f"download_{report_id}"
-                    )
+                    pdf_key = (report_id, rate_label)
+                    if pdf_key not in st.session_state.saved_report_pdfs:
+                        if st.button("📄 Prepare PDF", key=f"prepare_{report_id}"):
+                            with st.spinner("Generating PDF..."):
+                                _render_saved_report_pdf(report_id, start, end, brand,
+                                                         _load_report_products(report_id),
+                                                         rate_label)
+                    if pdf_key in st.session_state.saved_report_pdfs:
+                        st.download_button(
+                            label="📥 Download PDF",
+                            data=st.session_state.saved_report_pdfs[pdf_key],
+                            file_name=f"Medghor_Report_{report_id}.pdf",
+                            mime="application/pdf",
+                            key=f"download_{report_id}"
+                        )
 
                 with col2:
                     if st.button("♻️ Load to Editor", key=f"load_{report_id}"):
-                        st.session_state.products = products
-                        st.session_state.show_reports = False
+                        st.session_state.products = _load_report_products(report_id)
+                        st.session_state.view = 'editor'
                         st.rerun()
                 with col3:
-                    from utils.database import delete_report
                     if st.button("🗑️ Delete", key=f"del_{report_id}", type="secondary"):
                         delete_report(report_id)
+                        log_action(st.session_state.get('username'), 'DELETE_REPORT',
+                                   f"Report {report_id}: {brand}")
+                        for key in [k for k in st.session_state.saved_report_pdfs if k[0] == report_id]:
+                            del st.session_state.saved_report_pdfs[key]
                         st.rerun()
     else:
         st.info("No saved reports yet. Generate your first report!")
+    
+    # Page navigation
+    col1, col2, col3 = st.columns([1, 1, 1])
+    with col1:
+        if len(cursors) > 1 and st.button("⬅️ Newer", use_container_width=True):
+            cursors.pop()
+            st.rerun()
+    with col2:
+        st.write(f"Page {len(cursors)}")
+    with col3:
+        if next_cursor and st.button("Older ➡️", use_container_width=True):
+            cursors.append(next_cursor)
+            st.rerun()
+    
     if st.button("✖️ Close Reports View"):
-        st.session_state.show_reports = False
+        st.session_state.view = 'editor'
         st.rerun()
 
 def render_footer():
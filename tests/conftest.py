@@ -0,0 +1,16 @@
+"""Shared fixtures for tests that touch the database"""
+import pytest
+
+from utils import connection, database
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    """Point the process-wide pool at a fresh database file for one test"""
+    original = connection.get_pool().path
+    path = str(tmp_path / 'medghor_reports.db')
+    connection.set_database_path(path)
+    database.invalidate_popular_products()
+    yield path
+    connection.set_database_path(original)
+    database.invalidate_popular_products()
@@ -0,0 +1,68 @@
+"""Incrementally maintained weekly stats must match a full rebuild"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from utils.analytics import get_brand_trend, rebuild_analytics
+from utils.archive import archive_reports
+from utils.connection import connection, transaction
+from utils.database import delete_report, init_db, save_report
+
+RATES = ['20%', '39/- NET', '10+1', '15% @ 9+1', 'MRP 120 NET 95', 'call for rate']
+
+
+def _snapshot():
+    with connection() as conn:
+        return {table: sorted(conn.execute(f'SELECT * FROM {table}').fetchall())
+                for table in ('product_weekly_stats', 'brand_weekly_stats')}
+
+
+def _assert_same(actual, expected):
+    for table in expected:
+        assert len(actual[table]) == len(expected[table]), table
+        for got, want in zip(actual[table], expected[table]):
+            assert got == pytest.approx(want), table
+
+
+def _save_history():
+    report_ids = []
+    start = datetime(2025, 9, 1)
+    for index in range(12):
+        day = start + timedelta(days=3 * index)
+        products = [{'name': f'Product {(index + n) % 7}', 'rate': RATES[(index * n) % len(RATES)]}
+                    for n in range(1, 6)]
+        report_ids.append(save_report(day, day + timedelta(days=6),
+                                      ('ACME', 'ZETA')[index % 2], products))
+    return report_ids
+
+
+def test_saves_and_deletes_match_rebuild(db_path):
+    init_db()
+    report_ids = _save_history()
+    for report_id in report_ids[::4]:
+        delete_report(report_id)
+    incremental = _snapshot()
+    assert incremental['brand_weekly_stats']
+    rebuild_analytics()
+    _assert_same(_snapshot(), incremental)
+
+
+def test_deleting_everything_empties_the_stats(db_path):
+    init_db()
+    for report_id in _save_history():
+        delete_report(report_id)
+    assert _snapshot() == {'product_weekly_stats': [], 'brand_weekly_stats': []}
+
+
+def test_archived_reports_stay_counted(db_path):
+    init_db()
+    report_ids = _save_history()
+    before = _snapshot()
+    with transaction() as conn:
+        conn.executemany("UPDATE reports SET created_at = datetime('now', '-2 years') "
+                         "WHERE id = ?", [(report_id,) for report_id in report_ids[:6]])
+    assert archive_reports(months=12) == 6
+    rebuild_analytics()
+    _assert_same(_snapshot(), before)
+    rebuild_analytics(include_archive=False)
+    assert sum(row[1] for row in get_brand_trend()) == 6
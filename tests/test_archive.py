@@ -0,0 +1,63 @@
+"""Moving old reports to the archive database, loading them back and compacting"""
+import json
+import os
+from datetime import datetime
+
+from utils.archive import (archive_path, archive_reports, compact_database, count_archivable,
+                           search_archive)
+from utils.connection import connection, transaction
+from utils.database import init_db, load_report, save_report
+
+SHARED = [{'name': 'Paracetamol 500', 'rate': '20%'}, {'name': 'Cetirizine 10', 'rate': '39/- NET'}]
+
+
+def _save(brand, products):
+    return save_report(datetime(2024, 1, 1), datetime(2024, 1, 7), brand, products)
+
+
+def _age(report_ids, months):
+    with transaction() as conn:
+        conn.executemany(f"UPDATE reports SET created_at = datetime('now', '-{months} months') "
+                         "WHERE id = ?", [(report_id,) for report_id in report_ids])
+
+
+def test_old_reports_move_to_archive_and_stay_loadable(db_path):
+    init_db()
+    old = _save('ACME', SHARED)
+    old_only = _save('ZETA', [{'name': 'Azithro 500', 'rate': '10+1'}])
+    recent = _save('ACME', SHARED)
+    _age([old, old_only], 18)
+
+    assert count_archivable(12) == 2
+    assert archive_reports(months=12, batch_size=1) == 2
+    assert os.path.exists(archive_path())
+    with connection() as conn:
+        hot = [row[0] for row in conn.execute('SELECT id FROM reports')]
+        payloads = conn.execute('SELECT COUNT(*) FROM report_payloads').fetchone()[0]
+        items = conn.execute('SELECT COUNT(DISTINCT report_id) FROM report_items').fetchone()[0]
+    assert hot == [recent]
+    # The shared payload is still used by the recent report; the other one moved
+    assert payloads == 1 and items == 1
+
+    assert json.loads(load_report(old)[3]) == SHARED
+    assert load_report(old_only)[2] == 'ZETA'
+    assert [row[0] for row in search_archive(brand_name='ACME')] == [old]
+    assert [row[0] for row in search_archive(product_name='Azithro 500')] == [old_only]
+
+    # Repeating the run moves nothing
+    assert archive_reports(months=12) == 0
+
+
+def test_compact_switches_to_incremental_vacuum(db_path):
+    init_db()
+    report_ids = [_save(f'BRAND {index}', [{'name': f'Item {index} {n}', 'rate': f'{n}%'}
+                                           for n in range(200)])
+                  for index in range(20)]
+    _age(report_ids, 24)
+    archive_reports(months=12)
+    freed, size = compact_database()
+    with connection() as conn:
+        assert conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 2
+        assert conn.execute('PRAGMA freelist_count').fetchone()[0] == 0
+    assert size == os.path.getsize(db_path)
+    assert freed >= 0
@@ -0,0 +1,117 @@
+"""Connection pool reuse, nested transactions and after-commit callbacks"""
+import threading
+
+import pytest
+
+from utils.connection import ConnectionPool
+
+
+@pytest.fixture
+def pool(tmp_path):
+    pool = ConnectionPool(str(tmp_path / 'pool.db'))
+    pool.run_once('schema', lambda conn: conn.execute('CREATE TABLE t (value INTEGER)'))
+    yield pool
+    pool.close_all()
+
+
+def _values(pool):
+    with pool.connection() as conn:
+        return [row[0] for row in conn.execute('SELECT value FROM t ORDER BY value')]
+
+
+def test_connections_are_tuned(pool):
+    with pool.connection() as conn:
+        assert conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+        assert conn.execute('PRAGMA busy_timeout').fetchone()[0] == 5000
+        assert conn.execute("SELECT rate_field('20%', 1)").fetchone()[0] == 20.0
+
+
+def test_nested_use_shares_the_thread_connection(pool):
+    with pool.connection() as outer:
+        with pool.connection() as inner:
+            assert inner is outer
+        with pool.transaction() as conn:
+            assert conn is outer
+    # Returned to the pool and handed out again
+    with pool.connection() as again:
+        assert again is outer
+
+
+def test_threads_get_their_own_connections(pool):
+    seen = []
+    barrier = threading.Barrier(2)
+
+    def worker():
+        with pool.connection() as conn:
+            seen.append(conn)
+            barrier.wait()
+
+    threads = [threading.Thread(target=worker) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert seen[0] is not seen[1]
+
+
+def test_inner_transaction_joins_the_outer_one(pool):
+    with pool.transaction() as conn:
+        conn.execute('INSERT INTO t VALUES (1)')
+        with pool.transaction() as inner:
+            inner.execute('INSERT INTO t VALUES (2)')
+        # The inner block did not commit on its own
+        assert conn.in_transaction
+    assert _values(pool) == [1, 2]
+
+
+def test_error_in_inner_transaction_rolls_back_everything(pool):
+    with pytest.raises(RuntimeError):
+        with pool.transaction() as conn:
+            conn.execute('INSERT INTO t VALUES (1)')
+            with pool.transaction() as inner:
+                inner.execute('INSERT INTO t VALUES (2)')
+                raise RuntimeError
+    assert _values(pool) == []
+    # The connection is usable again afterwards
+    with pool.transaction() as conn:
+        conn.execute('INSERT INTO t VALUES (3)')
+    assert _values(pool) == [3]
+
+
+def test_after_commit_waits_for_the_outermost_commit(pool):
+    calls = []
+    with pool.transaction() as conn:
+        with pool.transaction():
+            conn.execute('INSERT INTO t VALUES (1)')
+            pool.after_commit(lambda: calls.append(_values_from_other_thread(pool)))
+        assert calls == []
+    assert calls == [[1]]
+
+
+def _values_from_other_thread(pool):
+    result = []
+    thread = threading.Thread(target=lambda: result.extend(_values(pool)))
+    thread.start()
+    thread.join()
+    return result
+
+
+def test_after_commit_is_dropped_on_rollback(pool):
+    calls = []
+    with pytest.raises(RuntimeError):
+        with pool.transaction():
+            pool.after_commit(lambda: calls.append('called'))
+            raise RuntimeError
+    assert calls == []
+    pool.after_commit(lambda: calls.append('now'))
+    assert calls == ['now']
+
+
+def test_run_once_runs_setup_once(pool):
+    calls = []
+    for _ in range(3):
+        pool.run_once('setup', calls.append)
+    assert len(calls) == 1
+    pool.close_all()
+    pool.run_once('setup', calls.append)
+    assert len(calls) == 2
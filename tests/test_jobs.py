@@ -0,0 +1,81 @@
+"""PDF job queue: claiming, running, failures, stale claims and purging"""
+from datetime import datetime
+
+import pytest
+
+from utils import jobs
+from utils.connection import get_pool, transaction
+from utils.database import init_db, load_report
+
+PRODUCTS = [{'name': 'Paracetamol 500', 'rate': '20%'}, {'name': 'Cetirizine 10', 'rate': '39/- NET'}]
+
+
+@pytest.fixture
+def queue(db_path, monkeypatch):
+    """Jobs schema on a fresh database, with the background workers kept off"""
+    monkeypatch.setattr(jobs.job_pool, 'start', lambda: None)
+    monkeypatch.setattr(jobs.job_pool, 'wake', lambda: None)
+    init_db()
+    get_pool().run_once('jobs_schema', jobs._create_jobs_schema)
+
+
+def _submit(products=PRODUCTS):
+    return jobs.submit_job(datetime(2025, 10, 7), datetime(2025, 10, 10), 'ACME', products,
+                           'Rate/Discount', username='tester')
+
+
+def test_submit_then_claim_in_order(queue):
+    first, second = _submit(), _submit()
+    assert jobs.get_job(first)['status'] == 'queued'
+    row = jobs._claim_job('owner-a')
+    assert row[0] == first
+    with transaction() as conn:
+        assert conn.execute('SELECT status, worker FROM jobs WHERE id = ?',
+                            (first,)).fetchone() == ('running', 'owner-a')
+    assert jobs._claim_job('owner-b')[0] == second
+    assert jobs._claim_job('owner-b') is None
+
+
+def test_run_job_saves_report_and_pdf(queue):
+    job_id = _submit()
+    jobs._run_job(jobs._claim_job('owner'))
+    job = jobs.get_job(job_id)
+    assert job['status'] == 'done' and job['error'] is None
+    assert (job['start_date'], job['end_date']) == ('2025-10-07', '2025-10-10')
+    assert jobs.get_job_pdf(job_id).startswith(b'%PDF')
+    assert load_report(job['report_id'])[2] == 'ACME'
+
+
+def test_failed_job_records_error(queue):
+    job_id = _submit([{'name': 'No rate'}])
+    jobs._run_job(jobs._claim_job('owner'))
+    job = jobs.get_job(job_id)
+    assert job['status'] == 'failed'
+    assert job['error'].startswith('KeyError')
+    assert jobs.get_job_pdf(job_id) is None
+
+
+def test_only_stale_claims_are_requeued(queue):
+    live, stale = _submit(), _submit()
+    jobs._claim_job('live-owner')
+    jobs._claim_job('dead-owner')
+    with transaction() as conn:
+        conn.execute("UPDATE jobs SET heartbeat_at = datetime('now', '-1 hours') WHERE id = ?",
+                     (stale,))
+        assert jobs._requeue_stale_jobs(conn) == 1
+        rows = dict(conn.execute('SELECT id, status FROM jobs'))
+    assert rows == {live: 'running', stale: 'queued'}
+    assert jobs._claim_job('new-owner')[0] == stale
+
+
+def test_purge_removes_only_old_finished_jobs(queue):
+    old, recent, queued = _submit(), _submit(), _submit()
+    with transaction() as conn:
+        conn.execute('''UPDATE jobs SET status = 'done', finished_at = datetime('now', '-3 days')
+                        WHERE id = ?''', (old,))
+        conn.execute('''UPDATE jobs SET status = 'done', finished_at = CURRENT_TIMESTAMP
+                        WHERE id = ?''', (recent,))
+    assert jobs.purge_jobs(older_than_days=1) == 1
+    assert jobs.get_job(old) is None
+    assert jobs.get_job(recent)['status'] == 'done'
+    assert jobs.get_job(queued)['status'] == 'queued'
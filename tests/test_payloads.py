@@ -0,0 +1,78 @@
+"""Compressed, deduplicated report payloads and the inline-JSON migration"""
+import json
+import sqlite3
+from datetime import datetime
+
+from utils.connection import connection
+from utils.database import delete_report, init_db, load_report, save_report
+
+PRODUCTS = [{'name': f'Product {index}', 'rate': f'{index}%'} for index in range(1, 41)]
+
+
+def _count(table):
+    with connection() as conn:
+        return conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+
+
+def _save(products=PRODUCTS, brand='ACME'):
+    return save_report(datetime(2025, 10, 6), datetime(2025, 10, 12), brand, products)
+
+
+def test_identical_lists_share_one_compressed_payload(db_path):
+    init_db()
+    first, second = _save(), _save(brand='OTHER')
+    _save(PRODUCTS[:5])
+    assert _count('report_payloads') == 2
+    with connection() as conn:
+        hashes = conn.execute('SELECT payload_hash FROM reports WHERE id IN (?, ?)',
+                              (first, second)).fetchall()
+        size, stored = conn.execute('SELECT size, length(data) FROM report_payloads '
+                                    'WHERE hash = ?', hashes[0]).fetchone()
+        inline = conn.execute('SELECT COUNT(*) FROM reports WHERE products IS NOT NULL').fetchone()[0]
+    assert hashes[0] == hashes[1]
+    assert inline == 0
+    assert size == len(json.dumps(PRODUCTS)) and stored < size
+    assert json.loads(load_report(second)[3]) == PRODUCTS
+
+
+def test_payload_is_deleted_with_its_last_report(db_path):
+    init_db()
+    first, second = _save(), _save()
+    delete_report(first)
+    assert _count('report_payloads') == 1
+    assert json.loads(load_report(second)[3]) == PRODUCTS
+    delete_report(second)
+    assert _count('report_payloads') == 0
+
+
+def test_migrates_reports_saved_with_inline_json(db_path):
+    # Schema and rows as written before report_payloads existed
+    legacy = [('2025-09-01', '2025-09-07', 'ACME', json.dumps(PRODUCTS[:3])),
+              ('2025-09-08', '2025-09-14', 'ACME', json.dumps(PRODUCTS[:3])),
+              ('2025-09-08', '2025-09-14', 'ZETA', json.dumps(PRODUCTS[3:5]))]
+    conn = sqlite3.connect(db_path)
+    conn.execute('''CREATE TABLE reports
+                    (id INTEGER PRIMARY KEY AUTOINCREMENT, start_date TEXT, end_date TEXT,
+                     brand_name TEXT, products TEXT, user_id INTEGER DEFAULT 1,
+                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
+    conn.execute('''CREATE TABLE products
+                    (id INTEGER PRIMARY KEY AUTOINCREMENT, product_name TEXT UNIQUE,
+                     last_rate TEXT, usage_count INTEGER DEFAULT 1,
+                     last_used TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
+    conn.executemany('INSERT INTO reports (start_date, end_date, brand_name, products) '
+                     'VALUES (?, ?, ?, ?)', legacy)
+    conn.commit()
+    conn.close()
+
+    init_db()
+    with connection() as conn:
+        rows = conn.execute('SELECT id, products, payload_hash, product_count FROM reports '
+                            'ORDER BY id').fetchall()
+        items = conn.execute('SELECT COUNT(*) FROM report_items').fetchone()[0]
+    assert all(products is None and payload_hash for _, products, payload_hash, _ in rows)
+    assert [count for *_, count in rows] == [3, 3, 2]
+    assert rows[0][2] == rows[1][2] != rows[2][2]
+    assert _count('report_payloads') == 2
+    assert items == 8
+    for report_id, (start, end, brand, products_json) in zip((1, 2, 3), legacy):
+        assert load_report(report_id) == (start, end, brand, products_json)
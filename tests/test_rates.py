@@ -0,0 +1,38 @@
+"""Table-driven checks of the offer rate parser"""
+import pytest
+
+from utils.rates import parse_rate
+
+CASES = [
+    # (rate text, (net_price, discount_pct, scheme_buy, scheme_free))
+    ('39/- NET', (39.0, None, None, None)),
+    ('NET 39', (39.0, None, None, None)),
+    ('39 PTR', (39.0, None, None, None)),
+    ('₹245', (245.0, None, None, None)),
+    ('Rs. 99.50', (99.5, None, None, None)),
+    ('45', (45.0, None, None, None)),
+    ('20%', (None, 20.0, None, None)),
+    ('12.5%', (None, 12.5, None, None)),
+    ('10+1', (None, None, 10, 1)),
+    ('15% @ 9+1', (None, 15.0, 9, 1)),
+    # Thousands separators
+    ('1,250/- NET', (1250.0, None, None, None)),
+    ('RS 1,499', (1499.0, None, None, None)),
+    ('1,25,000', (125000.0, None, None, None)),
+    # The MRP is not the offer price
+    ('MRP 120 NET 95', (95.0, None, None, None)),
+    ('MRP: Rs 150/- Rs 120', (120.0, None, None, None)),
+    ('MRP 120', (None, None, None, None)),
+    # "@" introduces a price wherever it appears
+    ('10% @ 45', (45.0, 10.0, None, None)),
+    ('@45', (45.0, None, None, None)),
+    ('@ 45%', (None, 45.0, None, None)),
+    ('', (None, None, None, None)),
+    (None, (None, None, None, None)),
+    ('ASK', (None, None, None, None)),
+]
+
+
+@pytest.mark.parametrize('text, expected', CASES)
+def test_parse_rate(text, expected):
+    assert parse_rate(text) == expected
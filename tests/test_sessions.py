@@ -0,0 +1,128 @@
+"""Login rate limiting, session validation caching and revocation"""
+import pytest
+
+from utils import connection, sessions
+from utils.database import create_user, init_auth_db
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """Point the pool at an empty database with one active user"""
+    original = connection.get_pool().path
+    connection.set_database_path(str(tmp_path / 'sessions.db'))
+    monkeypatch.setattr(sessions, '_cache', sessions.collections.OrderedDict())
+    monkeypatch.setattr(sessions, 'rate_limiter', sessions.LoginRateLimiter())
+    monkeypatch.setattr(sessions, '_next_sweep', 0.0)
+    init_auth_db()
+    create_user('alice', 'alice@example.com', 'secret', 'Alice', 'manager')
+    yield
+    connection.set_database_path(original)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_rate_limiter_blocks_username_after_failures(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(sessions.time, 'monotonic', clock)
+    limiter = sessions.LoginRateLimiter(window=60, max_failures=3, max_attempts=100)
+    for _ in range(3):
+        assert limiter.retry_after('Alice') == 0
+        limiter.record_attempt('alice')
+    assert limiter.retry_after('ALICE') == pytest.approx(60)
+    clock.now += 59
+    assert limiter.retry_after('alice') == pytest.approx(1)
+    clock.now += 1
+    assert limiter.retry_after('alice') == 0
+
+
+def test_rate_limiter_success_clears_failures_but_not_ip_attempts(monkeypatch):
+    monkeypatch.setattr(sessions.time, 'monotonic', Clock())
+    limiter = sessions.LoginRateLimiter(window=60, max_failures=2, max_attempts=3)
+    limiter.record_attempt('alice', '10.0.0.1')
+    limiter.record_attempt('alice', '10.0.0.1', success=True)
+    assert limiter.retry_after('alice') == 0
+    limiter.record_attempt('bob', '10.0.0.1')
+    assert limiter.retry_after('carol', '10.0.0.1') > 0
+    assert limiter.retry_after('carol', '10.0.0.2') == 0
+
+
+def test_throttled_login_never_checks_password(db, monkeypatch):
+    checked = []
+
+    def authenticate(username, password):
+        checked.append(username)
+        return False, None
+
+    for _ in range(sessions.MAX_FAILURES_PER_USERNAME):
+        token, user, error = sessions.login('alice', 'wrong', authenticate=authenticate)
+        assert token is None and error == "Username/password is incorrect"
+    token, user, error = sessions.login('alice', 'secret', authenticate=authenticate)
+    assert token is None and error.startswith("Too many login attempts")
+    assert len(checked) == sessions.MAX_FAILURES_PER_USERNAME
+
+
+def test_login_issues_token_stored_as_digest(db):
+    token, user, error = sessions.login('alice', 'secret')
+    assert error is None and user['username'] == 'alice'
+    with connection.connection() as conn:
+        stored = conn.execute('SELECT session_token FROM user_sessions').fetchone()[0]
+    assert stored == sessions._digest(token) != token
+    assert sessions.validate_session(token)['role'] == 'manager'
+
+
+def test_validation_is_cached_until_ttl(db, monkeypatch):
+    token, _, _ = sessions.login('alice', 'secret')
+    assert sessions.validate_session(token) is not None
+    with connection.transaction() as conn:
+        conn.execute('DELETE FROM user_sessions')
+    # Served from the cache without reading the deleted row
+    assert sessions.validate_session(token) is not None
+    now = sessions.time.time()
+    monkeypatch.setattr(sessions.time, 'time', lambda: now + sessions.VALIDATION_CACHE_TTL + 1)
+    monkeypatch.setattr(sessions, '_next_sweep', float('inf'))
+    assert sessions.validate_session(token) is None
+
+
+def test_expired_session_is_rejected_and_swept(db):
+    token, _, _ = sessions.login('alice', 'secret')
+    with connection.transaction() as conn:
+        conn.execute("UPDATE user_sessions SET expires_at = datetime('now', '-1 seconds')")
+    assert sessions.validate_session(token) is None
+    assert sessions.sweep_expired_sessions() == 1
+
+
+def test_unknown_tokens_are_not_cached(db):
+    for index in range(50):
+        assert sessions.validate_session(f'forged-{index}') is None
+    assert len(sessions._cache) == 0
+
+
+def test_cache_is_bounded(db, monkeypatch):
+    monkeypatch.setattr(sessions, 'VALIDATION_CACHE_SIZE', 3)
+    tokens = [sessions.create_session(1) for _ in range(5)]
+    for token in tokens:
+        assert sessions.validate_session(token) is not None
+    assert list(sessions._cache) == [sessions._digest(token) for token in tokens[-3:]]
+
+
+def test_revoke_session_logs_out_immediately(db):
+    token, _, _ = sessions.login('alice', 'secret')
+    other, _, _ = sessions.login('alice', 'secret')
+    assert sessions.validate_session(token) is not None
+    sessions.revoke_session(token)
+    assert sessions.validate_session(token) is None
+    assert sessions.validate_session(other) is not None
+
+
+def test_revoke_user_sessions_logs_out_everywhere(db):
+    tokens = [sessions.login('alice', 'secret')[0] for _ in range(3)]
+    for token in tokens:
+        assert sessions.validate_session(token) is not None
+    sessions.revoke_user_sessions(1)
+    assert all(sessions.validate_session(token) is None for token in tokens)
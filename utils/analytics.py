@@ -0,0 +1,308 @@
+"""Pre-aggregated weekly analytics of offers per product and per brand
+
+Two summary tables are kept up to date incrementally: save_report() adds a
+report's items and delete_report() subtracts them, in the same transaction
+as the report itself. Dashboards read only these tables, so their cost
+depends on the number of weeks shown, not on the length of the history.
+
+- product_weekly_stats: one row per product, brand and week
+- brand_weekly_stats: one row per brand and week
+
+A week is keyed by the Monday on or before the report's start date. Rates
+are summarized through the numeric fields parsed by utils.rates; averages
+are sum / count. Archiving a report keeps it in the analytics, so the
+dashboards still cover the full history.
+
+Usage:
+    python -m utils.analytics --rebuild    # recompute both tables from scratch
+"""
+import argparse
+import sys
+
+from utils.connection import get_pool, transaction
+
+# Monday on or before a YYYY-MM-DD date
+WEEK_SQL = "date({}, '-6 days', 'weekday 1')"
+
+_STAT_COLUMNS = ('net_price_sum', 'net_price_count', 'discount_sum', 'discount_count')
+
+
+def _create_analytics_schema(c, rebuild=False):
+    """Create the summary tables; fill them when they are new or rebuild is set
+
+    Called by init_db, which sets rebuild after re-parsing the stored rates.
+    """
+    exists = c.execute("""SELECT 1 FROM sqlite_master
+                          WHERE type = 'table' AND name = 'brand_weekly_stats'""").fetchone()
+    c.execute('''CREATE TABLE IF NOT EXISTS product_weekly_stats
+                 (product_id INTEGER NOT NULL,
+                  brand_name TEXT NOT NULL,
+                  week TEXT NOT NULL,
+                  offers INTEGER NOT NULL,
+                  net_price_sum REAL NOT NULL,
+                  net_price_count INTEGER NOT NULL,
+                  discount_sum REAL NOT NULL,
+                  discount_count INTEGER NOT NULL,
+                  PRIMARY KEY (product_id, brand_name, week)) WITHOUT ROWID''')
+    c.execute('''CREATE INDEX IF NOT EXISTS idx_product_weekly_brand
+                 ON product_weekly_stats(brand_name, week)''')
+    c.execute('''CREATE TABLE IF NOT EXISTS brand_weekly_stats
+                 (brand_name TEXT NOT NULL,
+                  week TEXT NOT NULL,
+                  reports INTEGER NOT NULL,
+                  items INTEGER NOT NULL,
+                  net_price_sum REAL NOT NULL,
+                  net_price_count INTEGER NOT NULL,
+                  discount_sum REAL NOT NULL,
+                  discount_count INTEGER NOT NULL,
+                  PRIMARY KEY (brand_name, week)) WITHOUT ROWID''')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_brand_weekly_week ON brand_weekly_stats(week)')
+    if rebuild or not exists:
+        _rebuild(c)
+
+
+def _upsert_sql(table, key_columns, count_columns):
+    """INSERT ... SELECT that adds the selected values onto existing rows"""
+    columns = (*key_columns, *count_columns, *_STAT_COLUMNS)
+    updates = ', '.join(f'{column} = {column} + excluded.{column}'
+                        for column in (*count_columns, *_STAT_COLUMNS))
+    return (f"INSERT INTO {table} ({', '.join(columns)}) {{select}} "
+            f"ON CONFLICT ({', '.join(key_columns)}) DO UPDATE SET {updates}")
+
+
+_PRODUCT_UPSERT = _upsert_sql('product_weekly_stats',
+                              ('product_id', 'brand_name', 'week'), ('offers',))
+_BRAND_UPSERT = _upsert_sql('brand_weekly_stats', ('brand_name', 'week'), ('reports', 'items'))
+
+# Per-item aggregates scaled by :sign (1 to add, -1 to subtract)
+_ITEM_STATS = ('COUNT(i.report_id) * :sign, '
+               'TOTAL(i.net_price) * :sign, COUNT(i.net_price) * :sign, '
+               'TOTAL(i.discount_pct) * :sign, COUNT(i.discount_pct) * :sign')
+
+
+def update_report_stats(conn, report_id, sign=1):
+    """Add (sign=1) or subtract (sign=-1) one report's items in the summary tables
+
+    Must run inside the transaction that inserts the report (after its
+    report_items) or deletes it (before its report_items are removed).
+
+    Args:
+        conn: Connection with an open transaction
+        report_id: Report to count or uncount
+        sign: 1 when the report is saved, -1 when it is deleted
+    """
+    row = conn.execute(f'SELECT brand_name, {WEEK_SQL.format("start_date")} FROM reports '
+                       'WHERE id = ?', (report_id,)).fetchone()
+    if row is None or None in row:
+        return
+    brand_name, week = row
+    params = {'report_id': report_id, 'sign': sign, 'brand_name': brand_name, 'week': week}
+    conn.execute(_PRODUCT_UPSERT.format(select=f'''
+                     SELECT i.product_id, :brand_name, :week, {_ITEM_STATS}
+                     FROM report_items i WHERE i.report_id = :report_id
+                     GROUP BY i.product_id'''), params)
+    conn.execute(_BRAND_UPSERT.format(select=f'''
+                     SELECT :brand_name, :week, :sign, {_ITEM_STATS}
+                     FROM report_items i WHERE i.report_id = :report_id'''), params)
+    if sign < 0:
+        # Every row touched by one report shares its brand and week
+        conn.execute('''DELETE FROM product_weekly_stats
+                        WHERE brand_name = ? AND week = ? AND offers <= 0''', (brand_name, week))
+        conn.execute('''DELETE FROM brand_weekly_stats
+                        WHERE brand_name = ? AND week = ? AND reports <= 0''', (brand_name, week))
+
+
+def _rebuild(conn, include_archive=True):
+    """Recompute both summary tables from report_items (and the archive)"""
+    conn.execute('DELETE FROM product_weekly_stats')
+    conn.execute('DELETE FROM brand_weekly_stats')
+    week = WEEK_SQL.format('r.start_date')
+    params = {'sign': 1}
+    conn.execute(_PRODUCT_UPSERT.format(select=f'''
+                     SELECT i.product_id, r.brand_name, {week}, {_ITEM_STATS}
+                     FROM reports r JOIN report_items i ON i.report_id = r.id
+                     WHERE r.brand_name IS NOT NULL AND r.start_date IS NOT NULL
+                     GROUP BY 1, 2, 3'''), params)
+    conn.execute(_BRAND_UPSERT.format(select=f'''
+                     SELECT r.brand_name, {week}, COUNT(DISTINCT r.id), {_ITEM_STATS}
+                     FROM reports r LEFT JOIN report_items i ON i.report_id = r.id
+                     WHERE r.brand_name IS NOT NULL AND r.start_date IS NOT NULL
+                     GROUP BY 1, 2'''), params)
+    if include_archive:
+        _add_archived_stats(conn)
+
+
+def _add_archived_stats(conn):
+    """Add the reports stored in the archive database to the summary tables"""
+    from utils.archive import _archive_pool
+
+    pool = _archive_pool()
+    if pool is None:
+        return
+    week = WEEK_SQL.format('r.start_date')
+    # Archived items keep only the rate text and product name; parse them here
+    items = f'''SELECT r.id AS report_id, r.brand_name, {week} AS week, i.product_name,
+                       rate_field(i.rate, 0) AS net_price, rate_field(i.rate, 1) AS discount_pct
+                FROM reports r LEFT JOIN report_items i ON i.report_id = r.id
+                WHERE r.brand_name IS NOT NULL AND r.start_date IS NOT NULL'''
+    stats = ('COUNT(i.product_name), TOTAL(i.net_price), COUNT(i.net_price), '
+             'TOTAL(i.discount_pct), COUNT(i.discount_pct)')
+    with pool.connection() as archive:
+        product_rows = archive.execute(f'''SELECT i.product_name, i.brand_name, i.week, {stats}
+                                          FROM ({items}) i WHERE i.product_name IS NOT NULL
+                                          GROUP BY 1, 2, 3''').fetchall()
+        brand_rows = archive.execute(f'''SELECT i.brand_name, i.week,
+                                                COUNT(DISTINCT i.report_id), {stats}
+                                        FROM ({items}) i GROUP BY 1, 2''').fetchall()
+    conn.executemany(_PRODUCT_UPSERT.format(select='''
+                         SELECT id, ?, ?, ?, ?, ?, ?, ? FROM products WHERE product_name = ?'''),
+                     [(*row[1:], row[0]) for row in product_rows])
+    conn.executemany(_BRAND_UPSERT.format(select='SELECT ?, ?, ?, ?, ?, ?, ?, ? WHERE true'),
+                     brand_rows)
+
+
+def rebuild_analytics(include_archive=True):
+    """Recompute the summary tables from scratch in one transaction
+
+    Args:
+        include_archive: Also count reports moved to the archive database
+
+    Returns:
+        tuple: (product rows, brand rows) written
+    """
+    from utils.database import init_db
+
+    init_db()
+    with transaction() as conn:
+        _rebuild(conn, include_archive)
+        return (conn.execute('SELECT COUNT(*) FROM product_weekly_stats').fetchone()[0],
+                conn.execute('SELECT COUNT(*) FROM brand_weekly_stats').fetchone()[0])
+
+
+def _average(total, count):
+    return round(total / count, 2) if count else None
+
+
+def get_analytics_brands():
+    """Brands that appear in the analytics, alphabetically"""
+    with get_pool().connection() as conn:
+        return [row[0] for row in conn.execute('''SELECT DISTINCT brand_name
+                                                  FROM brand_weekly_stats ORDER BY brand_name''')]
+
+
+def get_analytics_weeks():
+    """First and last week with saved reports
+    
+    Returns:
+        tuple: (first_week, last_week) as YYYY-MM-DD strings, or (None, None)
+    """
+    with get_pool().connection() as conn:
+        return conn.execute('SELECT MIN(week), MAX(week) FROM brand_weekly_stats').fetchone()
+
+
+def get_brand_trend(brand_name=None, week_from=None, week_to=None):
+    """Weekly totals of one brand, or of all brands combined
+
+    Args:
+        brand_name: Brand to show, or None for all brands
+        week_from: First week (YYYY-MM-DD), inclusive
+        week_to: Last week (YYYY-MM-DD), inclusive
+
+    Returns:
+        list: (week, reports, items, avg_net_price, avg_discount_pct) rows, oldest first
+    """
+    conditions, params = [], []
+    if brand_name:
+        conditions.append('brand_name = ?')
+        params.append(brand_name)
+    if week_from:
+        conditions.append('week >= ?')
+        params.append(week_from)
+    if week_to:
+        conditions.append('week <= ?')
+        params.append(week_to)
+    where = ' AND '.join(conditions) or '1'
+    with get_pool().connection() as conn:
+        rows = conn.execute(f'''SELECT week, SUM(reports), SUM(items),
+                                       SUM(net_price_sum), SUM(net_price_count),
+                                       SUM(discount_sum), SUM(discount_count)
+                                FROM brand_weekly_stats WHERE {where}
+                                GROUP BY week ORDER BY week''', params).fetchall()
+    return [(week, reports, items, _average(net_sum, net_count),
+             _average(discount_sum, discount_count))
+            for week, reports, items, net_sum, net_count, discount_sum, discount_count in rows]
+
+
+def get_top_products(brand_name=None, week_from=None, week_to=None, limit=20):
+    """Most frequently offered products over a range of weeks
+
+    Returns:
+        list: (product_name, offers, weeks, avg_net_price, avg_discount_pct) rows
+    """
+    conditions, params = [], []
+    if brand_name:
+        conditions.append('s.brand_name = ?')
+        params.append(brand_name)
+    if week_from:
+        conditions.append('s.week >= ?')
+        params.append(week_from)
+    if week_to:
+        conditions.append('s.week <= ?')
+        params.append(week_to)
+    where = ' AND '.join(conditions) or '1'
+    with get_pool().connection() as conn:
+        rows = conn.execute(f'''SELECT p.product_name, SUM(s.offers), COUNT(DISTINCT s.week),
+                                       SUM(s.net_price_sum), SUM(s.net_price_count),
+                                       SUM(s.discount_sum), SUM(s.discount_count)
+                                FROM product_weekly_stats s
+                                JOIN products p ON p.id = s.product_id
+                                WHERE {where}
+                                GROUP BY s.product_id
+                                ORDER BY SUM(s.offers) DESC, p.product_name
+                                LIMIT ?''', (*params, limit)).fetchall()
+    return [(name, offers, weeks, _average(net_sum, net_count),
+             _average(discount_sum, discount_count))
+            for name, offers, weeks, net_sum, net_count, discount_sum, discount_count in rows]
+
+
+def get_product_trend(product_name, brand_name=None):
+    """Weekly offer count and average rate of one product, oldest first
+
+    Returns:
+        list: (week, offers, avg_net_price, avg_discount_pct) rows
+    """
+    params = [product_name]
+    brand_filter = ''
+    if brand_name:
+        brand_filter = 'AND s.brand_name = ?'
+        params.append(brand_name)
+    with get_pool().connection() as conn:
+        rows = conn.execute(f'''SELECT s.week, SUM(s.offers),
+                                       SUM(s.net_price_sum), SUM(s.net_price_count),
+                                       SUM(s.discount_sum), SUM(s.discount_count)
+                                FROM products p
+                                JOIN product_weekly_stats s ON s.product_id = p.id
+                                WHERE p.product_name = ? {brand_filter}
+                                GROUP BY s.week ORDER BY s.week''', params).fetchall()
+    return [(week, offers, _average(net_sum, net_count), _average(discount_sum, discount_count))
+            for week, offers, net_sum, net_count, discount_sum, discount_count in rows]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Maintain the weekly analytics tables")
+    parser.add_argument('--rebuild', action='store_true',
+                        help="Recompute the analytics tables from all reports")
+    parser.add_argument('--no-archive', action='store_true',
+                        help="Leave archived reports out of the rebuild")
+    args = parser.parse_args(argv)
+
+    if not args.rebuild:
+        parser.print_help()
+        return 1
+    products, brands = rebuild_analytics(include_archive=not args.no_archive)
+    print(f"Rebuilt analytics: {products} product-week rows, {brands} brand-week rows")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
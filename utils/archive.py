@@ -0,0 +1,254 @@
+"""Retention policy: move old reports into a separate archive database
+
+Usage:
+    python -m utils.archive --months 12            # archive, then compact
+    python -m utils.archive --months 12 --dry-run  # only count candidates
+
+Reports older than the retention period are copied in batches into an
+archive SQLite file next to the main database (medghor_reports_archive.db
+for medghor_reports.db) and removed from the hot database, which is then
+compacted with incremental vacuum. Archived reports keep their IDs, stay
+loadable through database.load_report and can be searched by brand and
+product with search_archive().
+"""
+import argparse
+import os
+import sys
+
+from utils.connection import ConnectionPool, get_pool, transaction
+
+DEFAULT_RETENTION_MONTHS = 12
+ARCHIVE_BATCH_SIZE = 2000
+
+_archive_pools = {}
+
+
+def archive_path(main_path=None):
+    """Archive file belonging to a main database file"""
+    root, ext = os.path.splitext(main_path or get_pool().path)
+    return f"{root}_archive{ext or '.db'}"
+
+
+def _create_archive_schema(c, schema='main'):
+    c.execute(f'''CREATE TABLE IF NOT EXISTS {schema}.reports
+                  (id INTEGER PRIMARY KEY,
+                   start_date TEXT,
+                   end_date TEXT,
+                   brand_name TEXT,
+                   payload_hash TEXT,
+                   product_count INTEGER,
+                   user_id INTEGER,
+                   created_at TIMESTAMP,
+                   archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
+    c.execute(f'''CREATE TABLE IF NOT EXISTS {schema}.report_payloads
+                  (hash TEXT PRIMARY KEY,
+                   codec TEXT NOT NULL,
+                   data BLOB NOT NULL,
+                   size INTEGER NOT NULL) WITHOUT ROWID''')
+    # Product names are denormalized: archived rows must not depend on the hot products table
+    c.execute(f'''CREATE TABLE IF NOT EXISTS {schema}.report_items
+                  (report_id INTEGER NOT NULL,
+                   position INTEGER NOT NULL,
+                   product_name TEXT NOT NULL,
+                   rate TEXT,
+                   PRIMARY KEY (report_id, position)) WITHOUT ROWID''')
+    c.execute(f'CREATE INDEX IF NOT EXISTS {schema}.idx_archive_created ON reports(created_at, id)')
+    c.execute(f'''CREATE INDEX IF NOT EXISTS {schema}.idx_archive_brand_created
+                  ON reports(brand_name, created_at, id)''')
+    c.execute(f'''CREATE INDEX IF NOT EXISTS {schema}.idx_archive_items_product
+                  ON report_items(product_name, report_id)''')
+
+
+def _archive_pool():
+    """Pool for reading the archive file, or None if nothing was archived yet"""
+    path = archive_path()
+    if not os.path.exists(path):
+        return None
+    pool = _archive_pools.get(path)
+    if pool is None:
+        pool = _archive_pools.setdefault(path, ConnectionPool(path, size=2))
+    return pool
+
+
+def count_archivable(months=DEFAULT_RETENTION_MONTHS):
+    """Number of reports older than the retention period"""
+    from utils.database import init_db
+
+    init_db()
+    with get_pool().connection() as conn:
+        return conn.execute('''SELECT COUNT(*) FROM reports
+                               WHERE created_at < datetime('now', ?)''',
+                            (f'-{int(months)} months',)).fetchone()[0]
+
+
+def archive_reports(months=DEFAULT_RETENTION_MONTHS, batch_size=ARCHIVE_BATCH_SIZE):
+    """Move reports older than months into the archive database
+
+    Each batch is one transaction over the main database with the archive
+    attached. Rows are copied with INSERT OR IGNORE before they are
+    deleted, so an interrupted run can simply be repeated.
+
+    Args:
+        months: Retention period of the hot database
+        batch_size: Reports moved per transaction
+
+    Returns:
+        int: Number of reports archived
+    """
+    from utils.database import init_db, invalidate_popular_products
+
+    init_db()
+    cutoff = f'-{int(months)} months'
+    moved = 0
+    with get_pool().connection() as conn:
+        conn.execute('ATTACH DATABASE ? AS archive', (archive_path(),))
+        try:
+            with transaction():
+                _create_archive_schema(conn, 'archive')
+                conn.execute('CREATE TEMP TABLE IF NOT EXISTS archive_batch (id INTEGER PRIMARY KEY)')
+            while True:
+                with transaction():
+                    conn.execute('DELETE FROM temp.archive_batch')
+                    count = conn.execute('''INSERT INTO temp.archive_batch (id)
+                                            SELECT id FROM reports
+                                            WHERE created_at < datetime('now', ?)
+                                            ORDER BY id LIMIT ?''',
+                                         (cutoff, batch_size)).rowcount
+                    if not count:
+                        break
+                    _move_batch(conn)
+                moved += count
+        finally:
+            conn.execute('DROP TABLE IF EXISTS temp.archive_batch')
+            conn.execute('DETACH DATABASE archive')
+    if moved:
+        invalidate_popular_products()
+    return moved
+
+
+def _move_batch(conn):
+    """Copy the reports listed in temp.archive_batch to the archive, then delete them"""
+    conn.execute('''INSERT OR IGNORE INTO archive.report_payloads (hash, codec, data, size)
+                    SELECT p.hash, p.codec, p.data, p.size
+                    FROM report_payloads p
+                    WHERE p.hash IN (SELECT r.payload_hash FROM reports r
+                                     JOIN temp.archive_batch b ON b.id = r.id)''')
+    conn.execute('''INSERT OR IGNORE INTO archive.reports
+                        (id, start_date, end_date, brand_name, payload_hash, product_count,
+                         user_id, created_at)
+                    SELECT r.id, r.start_date, r.end_date, r.brand_name, r.payload_hash,
+                           r.product_count, r.user_id, r.created_at
+                    FROM reports r JOIN temp.archive_batch b ON b.id = r.id''')
+    conn.execute('''INSERT OR IGNORE INTO archive.report_items
+                        (report_id, position, product_name, rate)
+                    SELECT i.report_id, i.position, p.product_name, i.rate
+                    FROM temp.archive_batch b
+                    JOIN report_items i ON i.report_id = b.id
+                    JOIN products p ON p.id = i.product_id''')
+
+    hashes = conn.execute('''SELECT DISTINCT r.payload_hash FROM reports r
+                             JOIN temp.archive_batch b ON b.id = r.id
+                             WHERE r.payload_hash IS NOT NULL''').fetchall()
+    conn.execute('DELETE FROM report_items WHERE report_id IN (SELECT id FROM temp.archive_batch)')
+    conn.execute('DELETE FROM reports WHERE id IN (SELECT id FROM temp.archive_batch)')
+    conn.executemany('''DELETE FROM report_payloads WHERE hash = ?
+                        AND NOT EXISTS (SELECT 1 FROM reports WHERE payload_hash = ?)''',
+                     [(payload_hash, payload_hash) for (payload_hash,) in hashes])
+
+
+def compact_database(max_pages=None):
+    """Return free pages of the main database to the file system
+
+    The first call on a database created before auto_vacuum was enabled
+    runs one full VACUUM to switch it to incremental mode.
+
+    Args:
+        max_pages: Free pages to release, or None for all of them
+
+    Returns:
+        tuple: (pages freed, file size in bytes afterwards)
+    """
+    pool = get_pool()
+    with pool.connection() as conn:
+        if conn.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+            conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+            conn.execute('VACUUM')
+        free_before = conn.execute('PRAGMA freelist_count').fetchone()[0]
+        # execute() steps the pragma only once (one page); executescript runs it to completion
+        pages = '' if max_pages is None else f'({int(max_pages)})'
+        conn.executescript(f'PRAGMA incremental_vacuum{pages};')
+        freed = free_before - conn.execute('PRAGMA freelist_count').fetchone()[0]
+        conn.execute('PRAGMA wal_checkpoint(TRUNCATE)').fetchall()
+    return freed, os.path.getsize(pool.path)
+
+
+def load_archived_report(report_id):
+    """Load an archived report in the shape returned by database.load_report
+
+    Returns:
+        tuple or None: (start_date, end_date, brand_name, products_json)
+    """
+    from utils.database import _decode_payload
+
+    pool = _archive_pool()
+    if pool is None:
+        return None
+    with pool.connection() as conn:
+        row = conn.execute('''SELECT r.start_date, r.end_date, r.brand_name, p.codec, p.data
+                              FROM reports r
+                              JOIN report_payloads p ON p.hash = r.payload_hash
+                              WHERE r.id = ?''', (report_id,)).fetchone()
+    if row is None:
+        return None
+    start, end, brand, codec, data = row
+    return start, end, brand, _decode_payload(None, codec, data)
+
+
+def search_archive(brand_name=None, product_name=None, limit=50):
+    """Find archived reports by brand and/or contained product, newest first
+
+    Returns:
+        list: (id, start_date, end_date, brand_name, product_count, created_at) rows
+    """
+    pool = _archive_pool()
+    if pool is None:
+        return []
+    clauses = []
+    params = []
+    if brand_name:
+        clauses.append('r.brand_name = ?')
+        params.append(brand_name)
+    if product_name:
+        clauses.append('r.id IN (SELECT report_id FROM report_items WHERE product_name = ?)')
+        params.append(product_name)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+    with pool.connection() as conn:
+        return conn.execute(f'''SELECT r.id, r.start_date, r.end_date, r.brand_name,
+                                       r.product_count, r.created_at
+                                FROM reports r {where}
+                                ORDER BY r.created_at DESC, r.id DESC LIMIT ?''',
+                            params + [limit]).fetchall()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Archive old reports and compact the database")
+    parser.add_argument('--months', type=int, default=DEFAULT_RETENTION_MONTHS,
+                        help="Keep reports newer than this many months in the main database")
+    parser.add_argument('--dry-run', action='store_true',
+                        help="Only report how many reports would be archived")
+    parser.add_argument('--no-compact', action='store_true', help="Skip incremental vacuum")
+    args = parser.parse_args(argv)
+
+    if args.dry_run:
+        print(f"{count_archivable(args.months)} reports older than {args.months} months")
+        return 0
+    moved = archive_reports(args.months)
+    print(f"Archived {moved} reports to {archive_path()}")
+    if not args.no_compact:
+        freed, size = compact_database()
+        print(f"Freed {freed} pages; database is now {size / 1024 / 1024:.1f} MB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,174 @@
+"""Buffered audit log of user actions
+
+log_action() only appends the event to an in-memory queue. A background
+thread writes queued events in batched transactions once AUDIT_BATCH_SIZE
+events are waiting or AUDIT_FLUSH_INTERVAL seconds have passed, so logging
+never adds a synchronous SQLite write to a user-facing request.
+"""
+import atexit
+import queue
+import threading
+import time
+from datetime import timezone
+
+from utils.connection import connection, transaction, get_pool
+
+AUDIT_BATCH_SIZE = 200
+AUDIT_FLUSH_INTERVAL = 2.0
+# Events queued beyond this are dropped (and counted) rather than blocking callers
+AUDIT_QUEUE_LIMIT = 50000
+
+
+def init_audit_db():
+    """Create the audit_log table (once per process)"""
+    get_pool().run_once('audit_schema', _create_audit_schema)
+
+
+def _create_audit_schema(c):
+    c.execute('''CREATE TABLE IF NOT EXISTS audit_log
+                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                  created_at TIMESTAMP NOT NULL,
+                  username TEXT,
+                  action TEXT NOT NULL,
+                  details TEXT)''')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_audit_created ON audit_log(created_at)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_audit_user_created ON audit_log(username, created_at)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_audit_action_created ON audit_log(action, created_at)')
+
+
+def _timestamp(value):
+    """Format a datetime (or pass through a string) as a UTC TIMESTAMP string"""
+    if value is None or isinstance(value, str):
+        return value
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    return value.strftime('%Y-%m-%d %H:%M:%S')
+
+
+class AuditLogWriter:
+    """Queue of audit events drained by one background writer thread"""
+
+    def __init__(self, batch_size=AUDIT_BATCH_SIZE, interval=AUDIT_FLUSH_INTERVAL,
+                 queue_limit=AUDIT_QUEUE_LIMIT):
+        """Initialize the writer (the thread starts on the first event)
+
+        Args:
+            batch_size: Events that trigger an immediate flush
+            interval: Maximum seconds an event waits in memory
+            queue_limit: Maximum queued events before new ones are dropped
+        """
+        self.batch_size = batch_size
+        self.interval = interval
+        self.dropped = 0
+        self.written = 0
+        self._queue = queue.Queue(maxsize=queue_limit)
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+
+    def log(self, username, action, details=None):
+        """Queue one event; never blocks and never touches the database"""
+        event = (time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime()), username, action, details)
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            self.dropped += 1
+            return
+        if self._thread is None:
+            self._start()
+
+    def _start(self):
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='audit-log-writer',
+                                                daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                self._write(batch)
+            except Exception:
+                # Keep the writer alive; a failed batch is counted as dropped
+                self.dropped += len(batch)
+
+    def _write(self, batch):
+        if not batch:
+            return
+        init_audit_db()
+        with self._write_lock, transaction() as conn:
+            conn.executemany('''INSERT INTO audit_log (created_at, username, action, details)
+                                VALUES (?, ?, ?, ?)''', batch)
+        self.written += len(batch)
+
+    def flush(self):
+        """Write every queued event now from the calling thread"""
+        batch = []
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        self._write(batch)
+
+    def pending(self):
+        """Number of events waiting to be written"""
+        return self._queue.qsize()
+
+
+audit_writer = AuditLogWriter()
+atexit.register(audit_writer.flush)
+
+
+def log_action(username, action, details=None):
+    """Record an audit event (asynchronously)
+
+    Args:
+        username: Acting user, or None for anonymous actions
+        action: Event name, e.g. 'LOGIN', 'GENERATE_REPORT', 'DELETE_REPORT'
+        details: Optional free-text description
+    """
+    audit_writer.log(username, action, details)
+
+
+def get_audit_log(username=None, action=None, since=None, until=None, limit=100):
+    """Query audit events, newest first
+
+    Queued events are flushed first so callers see their own recent actions.
+
+    Args:
+        username: Only events by this user
+        action: Only events with this action
+        since: Only events at or after this datetime (UTC) or TIMESTAMP string
+        until: Only events before this datetime (UTC) or TIMESTAMP string
+        limit: Maximum number of rows
+
+    Returns:
+        list: (id, created_at, username, action, details) tuples
+    """
+    audit_writer.flush()
+    init_audit_db()
+    clauses = []
+    params = []
+    for column, op, value in (('username', '=', username), ('action', '=', action),
+                              ('created_at', '>=', _timestamp(since)),
+                              ('created_at', '<', _timestamp(until))):
+        if value is not None:
+            clauses.append(f'{column} {op} ?')
+            params.append(value)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+    with connection() as conn:
+        return conn.execute(f'''SELECT id, created_at, username, action, details
+                                FROM audit_log {where}
+                                ORDER BY created_at DESC, id DESC LIMIT ?''',
+                            params + [limit]).fetchall()
@@ -1,30 +1,248 @@
 """Authentication manager using streamlit-authenticator"""
+import atexit
+import copy
+import os
+import tempfile
+import threading
+
 import streamlit as st
-import yaml
-from yaml.loader import SafeLoader
-import streamlit_authenticator as stauth
 from datetime import datetime, timedelta
 
+# yaml and streamlit_authenticator (with bcrypt) are imported on first use,
+# keeping them out of app startup; utils.warmup preloads them in the background
+
+CONFIG_FILE = 'config/credentials.yml'
+
+# Seconds to wait for further changes before writing the credentials file
+WRITE_DEBOUNCE_SECONDS = 0.5
+
+# Per-login state streamlit-authenticator keeps on accounts; never written to the file
+RUNTIME_USER_FIELDS = ('logged_in', 'failed_login_attempts')
+
+
+def _persisted(config):
+    """Deep copy of config without the runtime account fields"""
+    config = copy.deepcopy(config)
+    for account in config.get('credentials', {}).get('usernames', {}).values():
+        for field in RUNTIME_USER_FIELDS:
+            account.pop(field, None)
+    return config
+
+
+class CredentialStore:
+    """Process-wide cache of one credentials YAML file
+    
+    The parsed config is shared by every session and re-read only when the
+    file's mtime changes; callers must not mutate it, but take a private
+    copy with snapshot() and hand changed accounts back with update_user().
+    Writes are serialized, coalesced (several changes within the debounce
+    window produce one write) and atomic: the YAML is written to a temp
+    file in the same directory and renamed over the original, so readers
+    never see a half-written file. Only credential fields are written.
+    """
+    
+    def __init__(self, path, debounce=WRITE_DEBOUNCE_SECONDS):
+        """Initialize the store
+        
+        Args:
+            path: Credentials YAML file
+            debounce: Seconds to coalesce save() calls before writing
+        """
+        self.path = path
+        self.debounce = debounce
+        self._lock = threading.RLock()
+        self._config = None
+        self._mtime = None
+        self._timer = None
+        self._dirty = False
+        # Bumped whenever the config changes, so copies can tell they are stale
+        self.version = 0
+    
+    def _file_mtime(self):
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+    
+    def get(self):
+        """Return the shared config dict, reloading it if the file changed
+        
+        Returns:
+            dict or None: Parsed config, or None if the file does not exist
+        """
+        mtime = self._file_mtime()
+        if self._config is not None and (mtime == self._mtime or self._dirty):
+            return self._config
+        with self._lock:
+            if self._config is None or (mtime != self._mtime and not self._dirty):
+                if mtime is None:
+                    return None
+                import yaml
+                with open(self.path) as file:
+                    self._config = yaml.load(file, Loader=yaml.SafeLoader)
+                self._mtime = mtime
+                self.version += 1
+            return self._config
+    
+    def snapshot(self):
+        """Return a private deep copy of the config, or None if there is no file"""
+        config = self.get()
+        with self._lock:
+            return copy.deepcopy(config)
+    
+    def replace(self, config):
+        """Set a new config and write it immediately"""
+        with self._lock:
+            self._config = copy.deepcopy(config)
+            self._dirty = True
+            self.version += 1
+            self.flush()
+    
+    def update_user(self, username, account):
+        """Store one account's changed credentials and schedule a write
+        
+        Args:
+            username: Account to add or replace
+            account: Its fields (runtime fields are dropped)
+        """
+        account = {key: copy.deepcopy(value) for key, value in account.items()
+                   if key not in RUNTIME_USER_FIELDS}
+        with self._lock:
+            self._config['credentials']['usernames'][username.lower()] = account
+            self.version += 1
+            self.save()
+    
+    def save(self):
+        """Schedule a write of the shared config"""
+        with self._lock:
+            self._dirty = True
+            if self._timer is None:
+                self._timer = threading.Timer(self.debounce, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+    
+    def flush(self):
+        """Write pending changes now (no-op when nothing changed)"""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self._dirty:
+                return
+            import yaml
+            text = yaml.dump(_persisted(self._config), default_flow_style=False)
+            directory = os.path.dirname(self.path) or '.'
+            os.makedirs(directory, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.credentials-', suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'w') as file:
+                    file.write(text)
+                    file.flush()
+                    os.fsync(file.fileno())
+                os.replace(temp_path, self.path)
+            except BaseException:
+                os.unlink(temp_path)
+                raise
+            self._mtime = self._file_mtime()
+            self._dirty = False
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_credential_store(path=CONFIG_FILE):
+    """Return the process-wide CredentialStore for path"""
+    path = os.path.abspath(path)
+    store = _stores.get(path)
+    if store is None:
+        with _stores_lock:
+            store = _stores.setdefault(path, CredentialStore(path))
+    return store
+
+
+def authenticate_credentials(username, password, path=CONFIG_FILE):
+    """Check a password against the credentials file
+    
+    On success the account is mirrored into the users table, so it can
+    own server-side sessions (see utils.sessions.login).
+    
+    Returns:
+        tuple: (success, user dict or None)
+    """
+    config = get_credential_store(path).get()
+    username = username.lower().strip()
+    account = (config or {}).get('credentials', {}).get('usernames', {}).get(username)
+    if account is None:
+        return False, None
+    import streamlit_authenticator as stauth
+    if not stauth.Hasher.check_pw(password, account['password']):
+        return False, None
+    from utils.database import init_auth_db, sync_user
+    init_auth_db()
+    full_name = ' '.join(part for part in (account.get('first_name'),
+                                           account.get('last_name')) if part)
+    roles = account.get('roles') or ['viewer']
+    return True, sync_user(username, account.get('email'), full_name or username, roles[0])
+
+
+@atexit.register
+def _flush_stores():
+    for store in list(_stores.values()):
+        store.flush()
+
+
+def get_auth_manager(config_file=CONFIG_FILE):
+    """Return this browser session's AuthManager, rebuilt only when the credentials change"""
+    store = get_credential_store(config_file)
+    store.get()
+    manager = st.session_state.get('auth_manager')
+    if manager is None or manager.store is not store or manager.version != store.version:
+        manager = AuthManager(config_file)
+        st.session_state.auth_manager = manager
+    return manager
+
+
 class AuthManager:
-    def __init__(self, config_file='config/credentials.yml'):
-        """Initialize authentication manager"""
+    def __init__(self, config_file=CONFIG_FILE):
+        """Initialize authentication manager
+        
+        The manager works on its own copy of the shared CredentialStore
+        config (streamlit-authenticator mutates the credentials it is given)
+        and hands changed accounts back to the store. Use get_auth_manager()
+        to reuse one manager across reruns.
+        """
         self.config_file = config_file
+        self.store = get_credential_store(config_file)
         self.load_config()
-        self.authenticator = stauth.Authenticate(
-            self.config['credentials'],
-            self.config['cookie']['name'],
-            self.config['cookie']['key'],
-            self.config['cookie']['expiry_days']
-        )
+        self._authenticator = None
+    
+    @property
+    def authenticator(self):
+        """streamlit-authenticator widget set, built on first use"""
+        if self._authenticator is None:
+            import streamlit_authenticator as stauth
+            self._authenticator = stauth.Authenticate(
+                self.config['credentials'],
+                self.config['cookie']['name'],
+                self.config['cookie']['key'],
+                self.config['cookie']['expiry_days']
+            )
+        return self._authenticator
     
     def load_config(self):
         """Load authentication config"""
-        try:
-            with open(self.config_file) as file:
-                self.config = yaml.load(file, Loader=SafeLoader)
-        except FileNotFoundError:
+        self.version = self.store.version
+        self.config = self.store.snapshot()
+        if self.config is None:
             self.create_default_config()
     
+    def _save_user(self, username):
+        """Hand one account changed by a widget back to the shared store"""
+        username = username.lower()
+        self.store.update_user(username, self.config['credentials']['usernames'][username])
+        self.version = self.store.version
+    
     def create_default_config(self):
         """Create default config file"""
         self.config = {
@@ -37,10 +255,8 @@ class AuthManager:
                 'usernames': {
                     'admin': {
                         'email': 'admin@medghor.com',
-                        'failed_login_attempts': 0,
                         'first_name': 'Admin',
                         'last_name': 'User',
-                        'logged_in': False,
                         'password': 'admin123',  # Will be hashed
                         'roles': ['admin']
                     }
@@ -49,11 +265,12 @@ class AuthManager:
         }
         
         # Hash passwords
+        import streamlit_authenticator as stauth
         stauth.Hasher.hash_passwords(self.config['credentials'])
         
         # Save config
-        with open(self.config_file, 'w') as file:
-            yaml.dump(self.config, file, default_flow_style=False)
+        self.store.replace(self.config)
+        self.version = self.store.version
     
     def login(self):
         """Display login form and authenticate"""
@@ -70,11 +287,11 @@ class AuthManager:
     def register_user(self):
         """Display registration form"""
         try:
-            if self.authenticator.register_user('main'):
+            _, username, _ = self.authenticator.register_user('main')
+            if username:
                 st.success('User registered successfully')
                 # Save updated config
-                with open(self.config_file, 'w') as file:
-                    yaml.dump(self.config, file, default_flow_style=False)
+                self._save_user(username)
         except Exception as e:
             st.error(e)
     
@@ -83,8 +300,7 @@ class AuthManager:
         try:
             if self.authenticator.reset_password(st.session_state['username'], 'main'):
                 st.success('Password reset successfully')
-                with open(self.config_file, 'w') as file:
-                    yaml.dump(self.config, file, default_flow_style=False)
+                self._save_user(st.session_state['username'])
         except Exception as e:
             st.error(e)
     
@@ -93,7 +309,6 @@ class AuthManager:
         try:
             if self.authenticator.update_user_details(st.session_state['username'], 'main'):
                 st.success('User details updated successfully')
-                with open(self.config_file, 'w') as file:
-                    yaml.dump(self.config, file, default_flow_style=False)
+                self._save_user(st.session_state['username'])
         except Exception as e:
             st.error(e)
@@ -0,0 +1,254 @@
+"""Batch PDF generation across CPU cores for Medghor Focus Item reports
+
+Usage:
+    python -m utils.batch_pdf --specs specs.json --zip offers.zip
+    python -m utils.batch_pdf --report-ids 12 13 14 --out-dir offers/
+    python -m utils.batch_pdf --all-reports --zip history.zip --workers 4
+
+A specs file is a JSON list of objects with start_date, end_date
+('YYYY-MM-DD'), brand_name, products and optionally rate_label,
+contact_number and file_name.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime
+
+from utils.pdf_generator import generate_pdf
+
+DEFAULT_RATE_LABEL = "Rate/Discount"
+# Saved reports read per query with --all-reports
+REPORTS_PAGE_SIZE = 100
+
+
+def _parse_date(value):
+    if isinstance(value, str):
+        return datetime.strptime(value, '%Y-%m-%d')
+    return value
+
+
+def spec_file_name(spec):
+    """Output file name for a spec, matching the app's download names
+
+    An explicit file_name is reduced to its base name so it can never
+    point outside the output directory.
+
+    Raises:
+        ValueError: If file_name is empty or a dot name, or a date is invalid
+        KeyError: If a field needed for the default name is missing
+    """
+    if spec.get('file_name'):
+        file_name = os.path.basename(str(spec['file_name']).replace('\\', '/'))
+        if file_name.strip('.') == '':
+            raise ValueError(f"Invalid file_name {spec['file_name']!r}")
+        return file_name
+    if spec.get('report_id'):
+        return f"Medghor_Report_{spec['report_id']}.pdf"
+    start = _parse_date(spec['start_date'])
+    end = _parse_date(spec['end_date'])
+    brand = ''.join(ch if ch.isalnum() else '_' for ch in spec['brand_name'])
+    return f"Medghor_{brand}_{start.strftime('%d%m%Y')}_{end.strftime('%d%m%Y')}.pdf"
+
+
+def _iter_all_reports(page_size=REPORTS_PAGE_SIZE):
+    """Yield (id, start, end, brand, products_json) for every saved report, page by page"""
+    from utils.database import get_reports_page, load_report
+
+    cursor = None
+    while True:
+        rows, cursor = get_reports_page(page_size, cursor=cursor)
+        for row in rows:
+            report = load_report(row[0])
+            if report is not None:
+                yield (row[0], *report)
+        if cursor is None:
+            break
+
+
+def specs_from_reports(report_ids=None, rate_label=DEFAULT_RATE_LABEL):
+    """Build render specs from saved reports
+
+    Every saved report is read lazily, one page of the history at a time,
+    so render_batch only holds the specs it has in flight. Explicit IDs are
+    loaded up front so a missing report fails before anything is rendered.
+
+    Args:
+        report_ids: IDs to load, or None for every saved report
+        rate_label: Column label to render (it is not stored with reports)
+
+    Returns:
+        iterator: Spec dictionaries accepted by render_batch
+    """
+    from utils.database import init_db, load_report
+
+    init_db()
+    if report_ids is None:
+        rows = _iter_all_reports()
+    else:
+        rows = []
+        for report_id in report_ids:
+            report = load_report(report_id)
+            if report is None:
+                raise ValueError(f"Report #{report_id} not found")
+            rows.append((report_id, *report))
+
+    return ({
+        'report_id': report_id,
+        'start_date': start,
+        'end_date': end,
+        'brand_name': brand,
+        'products': json.loads(products_json),
+        'rate_label': rate_label,
+    } for report_id, start, end, brand, products_json in rows)
+
+
+def _unique_file_name(file_name, used):
+    """Return file_name, or file_name with a _2, _3... suffix if already used
+
+    Names are compared case-insensitively so they stay distinct on
+    case-insensitive file systems too.
+    """
+    root, ext = os.path.splitext(file_name)
+    candidate, index = file_name, 1
+    while candidate.lower() in used:
+        index += 1
+        candidate = f"{root}_{index}{ext}"
+    used.add(candidate.lower())
+    return candidate
+
+
+def _render_spec(spec, file_name=None):
+    """Worker entry point: render one spec, never raising across processes"""
+    started = time.perf_counter()
+    file_name = file_name or spec_file_name(spec)
+    try:
+        buffer = generate_pdf(
+            _parse_date(spec['start_date']),
+            _parse_date(spec['end_date']),
+            spec['brand_name'],
+            spec['products'],
+            spec.get('rate_label', DEFAULT_RATE_LABEL),
+            spec.get('contact_number', "1234567890"),
+        )
+        return file_name, buffer.getvalue(), time.perf_counter() - started, None
+    except Exception as e:
+        return file_name, None, time.perf_counter() - started, f"{type(e).__name__}: {e}"
+
+
+def render_batch(specs, zip_path=None, out_dir=None, workers=None):
+    """Render many report specs in parallel and stream them to a ZIP or directory
+
+    Finished PDFs are written as soon as each worker returns and at most
+    two documents per worker are in flight, so memory stays bounded however
+    many specs are passed. Specs that map to the same file name get a
+    numeric suffix (in input order), so no PDF overwrites another. A spec
+    that cannot be named or rendered is reported as failed (as spec_<n>
+    when it has no usable name) without stopping the batch.
+
+    Args:
+        specs: Iterable of spec dictionaries (see module docstring)
+        zip_path: ZIP file to write, or None
+        out_dir: Directory to write PDFs into, or None
+        workers: Number of worker processes (default: CPU count)
+
+    Returns:
+        list: One dict per spec, in completion order, with 'file_name',
+        'seconds', 'size' and 'error' (None on success) keys
+
+    Raises:
+        ValueError: If neither zip_path nor out_dir is given
+    """
+    if not zip_path and not out_dir:
+        raise ValueError("Either zip_path or out_dir is required")
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+
+    results = []
+    used_names = set()
+    index = 0
+    workers = workers or os.cpu_count() or 1
+    archive = zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) if zip_path else None
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            pending = set()
+            spec_iter = iter(specs)
+            while True:
+                # Keep a bounded number of documents in flight
+                for spec in spec_iter:
+                    index += 1
+                    try:
+                        file_name = _unique_file_name(spec_file_name(spec), used_names)
+                    except Exception as e:
+                        # A malformed spec fails on its own; the rest of the batch still runs
+                        results.append({
+                            'file_name': f"spec_{index}",
+                            'seconds': 0.0,
+                            'size': 0,
+                            'error': f"{type(e).__name__}: {e}",
+                        })
+                        continue
+                    pending.add(executor.submit(_render_spec, spec, file_name))
+                    if len(pending) >= workers * 2:
+                        break
+                if not pending:
+                    break
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    file_name, data, seconds, error = future.result()
+                    if data is not None:
+                        if archive:
+                            archive.writestr(file_name, data)
+                        else:
+                            with open(os.path.join(out_dir, file_name), 'wb') as file:
+                                file.write(data)
+                    results.append({
+                        'file_name': file_name,
+                        'seconds': seconds,
+                        'size': len(data) if data else 0,
+                        'error': error,
+                    })
+    finally:
+        if archive:
+            archive.close()
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render Medghor offer sheets in bulk")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--specs', help="JSON file containing a list of report specs")
+    source.add_argument('--report-ids', type=int, nargs='+', help="Saved report IDs to render")
+    source.add_argument('--all-reports', action='store_true', help="Render every saved report")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument('--zip', help="Write PDFs into this ZIP file")
+    target.add_argument('--out-dir', help="Write PDFs into this directory")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes")
+    parser.add_argument('--rate-label', default=DEFAULT_RATE_LABEL,
+                        help="Column label for saved reports")
+    args = parser.parse_args(argv)
+
+    if args.specs:
+        with open(args.specs) as file:
+            specs = json.load(file)
+    else:
+        specs = specs_from_reports(args.report_ids, args.rate_label)
+
+    started = time.perf_counter()
+    results = render_batch(specs, zip_path=args.zip, out_dir=args.out_dir,
+                           workers=args.workers)
+    elapsed = time.perf_counter() - started
+
+    for result in sorted(results, key=lambda r: r['file_name']):
+        status = f"{result['size']:>9} bytes" if not result['error'] else f"FAILED {result['error']}"
+        print(f"{result['seconds'] * 1000:8.1f} ms  {result['file_name']}  {status}")
+    failed = sum(1 for result in results if result['error'])
+    print(f"\n{len(results) - failed} rendered, {failed} failed in {elapsed:.2f}s")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,191 @@
+"""Pooled SQLite connection manager for Medghor Focus Item PDF Generator"""
+import math
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from utils.rates import rate_field
+
+DB_PATH = 'medghor_reports.db'
+
+# Per-connection tuning applied once when a connection is opened
+PRAGMAS = (
+    'PRAGMA auto_vacuum = INCREMENTAL', # new files only; see archive.compact_database
+    'PRAGMA journal_mode = WAL',       # readers never block the writer
+    'PRAGMA synchronous = NORMAL',     # safe with WAL, far fewer fsyncs
+    'PRAGMA cache_size = -16000',      # 16 MB page cache per connection
+    'PRAGMA mmap_size = 268435456',    # 256 MB memory-mapped reads
+    'PRAGMA temp_store = MEMORY',
+    'PRAGMA busy_timeout = 5000',
+)
+
+
+def _logaddexp(a, b):
+    """ln(e**a + e**b) without overflow; NULL is treated as an empty sum"""
+    if a is None:
+        return b
+    if b is None:
+        return a
+    high, low = max(a, b), min(a, b)
+    return high + math.log1p(math.exp(low - high))
+
+
+# Python SQL functions registered on every connection
+FUNCTIONS = (
+    ('logaddexp', 2, _logaddexp),
+    ('rate_field', 2, rate_field),
+)
+
+
+class ConnectionPool:
+    """Pool of tuned SQLite connections, one checked out per thread at a time
+
+    A thread that already holds a connection gets the same one back on
+    nested use, so helpers can call each other inside a single transaction.
+    """
+
+    def __init__(self, path=DB_PATH, size=8):
+        """Initialize the pool
+
+        Args:
+            path: SQLite database file
+            size: Maximum number of idle connections kept open
+        """
+        self.path = path
+        self._idle = queue.LifoQueue(maxsize=size)
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+        self._initialized = set()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None,
+                               check_same_thread=False)
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        for name, num_params, func in FUNCTIONS:
+            conn.create_function(name, num_params, func, deterministic=True)
+        return conn
+
+    @contextmanager
+    def connection(self):
+        """Check out a connection for the current thread (autocommit mode)"""
+        held = getattr(self._local, 'conn', None)
+        if held is not None:
+            self._local.depth += 1
+            try:
+                yield held
+            finally:
+                self._local.depth -= 1
+            return
+
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = self._connect()
+        self._local.conn = conn
+        self._local.depth = 1
+        try:
+            yield conn
+        finally:
+            self._local.conn = None
+            self._local.depth = 0
+            if conn.in_transaction:
+                conn.rollback()
+            try:
+                self._idle.put_nowait(conn)
+            except queue.Full:
+                conn.close()
+
+    @contextmanager
+    def transaction(self):
+        """Run a write transaction; joins the caller's transaction if one is open
+
+        BEGIN IMMEDIATE takes the write lock up front, so concurrent writers
+        wait on busy_timeout instead of failing with "database is locked"
+        halfway through.
+        """
+        with self.connection() as conn:
+            if conn.in_transaction:
+                yield conn
+                return
+            self._local.after_commit = []
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                yield conn
+            except BaseException:
+                self._local.after_commit = None
+                conn.rollback()
+                raise
+            callbacks, self._local.after_commit = self._local.after_commit, None
+            conn.commit()
+            for callback in callbacks:
+                callback()
+
+    def after_commit(self, callback):
+        """Call callback once the current thread's outermost transaction commits
+
+        Outside a transaction it is called right away; if the transaction
+        rolls back it is never called. Used for in-process caches that must
+        not be refreshed from data other connections cannot see yet.
+        """
+        held = getattr(self._local, 'conn', None)
+        pending = getattr(self._local, 'after_commit', None)
+        if held is not None and held.in_transaction and pending is not None:
+            pending.append(callback)
+        else:
+            callback()
+
+    def run_once(self, name, setup):
+        """Run setup(conn) in a transaction the first time name is seen
+
+        Args:
+            name: Identifier of the setup step (e.g. 'main_schema')
+            setup: Callable receiving the connection
+        """
+        if name in self._initialized:
+            return
+        with self._init_lock:
+            if name in self._initialized:
+                return
+            with self.transaction() as conn:
+                setup(conn)
+            self._initialized.add(name)
+
+    def close_all(self):
+        """Close idle connections and forget completed setup steps"""
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+        self._initialized.clear()
+
+
+_pool = ConnectionPool()
+
+
+def get_pool():
+    """Return the process-wide connection pool"""
+    return _pool
+
+
+def set_database_path(path):
+    """Point the process-wide pool at another database file"""
+    _pool.close_all()
+    _pool.path = path
+
+
+def connection():
+    """Check out a pooled connection for reads"""
+    return _pool.connection()
+
+
+def transaction():
+    """Open a pooled write transaction"""
+    return _pool.transaction()
+
+
+def after_commit(callback):
+    """Defer callback until the current write transaction commits"""
+    _pool.after_commit(callback)
@@ -1,14 +1,46 @@
 """Database operations for Medghor Focus Item PDF Generator"""
 import sqlite3
 import json
+import math
+import threading
+import time
+import zlib
 from datetime import datetime
 import hashlib
+from utils.connection import after_commit, connection, transaction, get_pool
+from utils.tracing import instrument_module
+from utils.audit import log_action  # noqa: F401  (re-exported for components.login)
+from utils.rates import (RATE_FIELDS, RATE_PARSER_VERSION, parse_rate, backfill_rate_fields,
+                         stored_parser_version)
+from utils.analytics import _create_analytics_schema, update_report_stats
+
+# Popularity decays with a 30 day half-life. Scores are stored as
+# ln(sum(exp(DECAY_RATE * days_since_epoch))) over every use, so ranking by
+# the stored value equals ranking by the decayed score at any later time.
+POPULARITY_HALF_LIFE_DAYS = 30
+POPULARITY_DECAY_RATE = math.log(2) / POPULARITY_HALF_LIFE_DAYS
+POPULARITY_EPOCH = datetime(2025, 1, 1).timestamp()
+
+POPULAR_CACHE_TTL = 300
+
+# Product searches with more matches than this skip bm25 ranking
+SEARCH_RANKED_MATCHES = 500
+
+# Report product lists are stored once per distinct content, compressed
+PAYLOAD_CODEC = 'zlib'
+PAYLOAD_COMPRESS_LEVEL = 6
+
+_LAST_RATE_COLUMNS = ', '.join(f'last_{field}' for field in RATE_FIELDS)
+_LAST_RATE_UPDATES = ', '.join(f'last_{field} = excluded.last_{field}' for field in RATE_FIELDS)
+
+_popular_cache = {'version': 0, 'expires': 0.0, 'limit': 0, 'rows': []}
+_popular_cache_lock = threading.Lock()
 
 def init_db():
-    """Initialize main application database tables"""
-    conn = sqlite3.connect('medghor_reports.db')
-    c = conn.cursor()
-    
+    """Initialize main application database tables (once per process)"""
+    get_pool().run_once('main_schema', _create_main_schema)
+
+def _create_main_schema(c):
     # Create reports table
     c.execute('''CREATE TABLE IF NOT EXISTS reports
                  (id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -27,14 +59,180 @@ def init_db():
                   usage_count INTEGER DEFAULT 1,
                   last_used TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
     
-    conn.commit()
-    conn.close()
+    # Listing projection column so history pages never read the products blob
+    columns = [row[1] for row in c.execute('PRAGMA table_info(reports)')]
+    if 'product_count' not in columns:
+        c.execute('ALTER TABLE reports ADD COLUMN product_count INTEGER')
+    c.execute('''UPDATE reports SET product_count = json_array_length(products)
+                 WHERE product_count IS NULL''')
+    
+    # Indexes backing keyset pagination on (created_at, id)
+    c.execute('CREATE INDEX IF NOT EXISTS idx_reports_created ON reports(created_at, id)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_reports_user_created ON reports(user_id, created_at, id)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_reports_brand_created ON reports(brand_name, created_at, id)')
+    
+    # Normalized report contents: one row per product line of a report
+    c.execute('''CREATE TABLE IF NOT EXISTS report_items
+                 (report_id INTEGER NOT NULL REFERENCES reports(id),
+                  position INTEGER NOT NULL,
+                  product_id INTEGER NOT NULL REFERENCES products(id),
+                  rate TEXT,
+                  PRIMARY KEY (report_id, position)) WITHOUT ROWID''')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_report_items_product ON report_items(product_id, report_id)')
+    
+    # Numeric rate fields parsed from the rate text (see utils.rates)
+    item_columns = [row[1] for row in c.execute('PRAGMA table_info(report_items)')]
+    product_columns = [row[1] for row in c.execute('PRAGMA table_info(products)')]
+    if 'net_price' not in item_columns:
+        c.execute('ALTER TABLE report_items ADD COLUMN net_price REAL')
+        c.execute('ALTER TABLE report_items ADD COLUMN discount_pct REAL')
+        c.execute('ALTER TABLE report_items ADD COLUMN scheme_buy INTEGER')
+        c.execute('ALTER TABLE report_items ADD COLUMN scheme_free INTEGER')
+    if 'last_net_price' not in product_columns:
+        c.execute('ALTER TABLE products ADD COLUMN last_net_price REAL')
+        c.execute('ALTER TABLE products ADD COLUMN last_discount_pct REAL')
+        c.execute('ALTER TABLE products ADD COLUMN last_scheme_buy INTEGER')
+        c.execute('ALTER TABLE products ADD COLUMN last_scheme_free INTEGER')
+    rates_reparsed = ('net_price' not in item_columns or 'last_net_price' not in product_columns
+                      or stored_parser_version(c) != RATE_PARSER_VERSION)
+    if rates_reparsed:
+        backfill_rate_fields(c)
+    c.execute('''CREATE INDEX IF NOT EXISTS idx_report_items_discount
+                 ON report_items(discount_pct) WHERE discount_pct IS NOT NULL''')
+    c.execute('''CREATE INDEX IF NOT EXISTS idx_report_items_net_price
+                 ON report_items(net_price) WHERE net_price IS NOT NULL''')
+    c.execute('''CREATE INDEX IF NOT EXISTS idx_products_last_discount
+                 ON products(last_discount_pct) WHERE last_discount_pct IS NOT NULL''')
+    c.execute('''CREATE INDEX IF NOT EXISTS idx_products_last_net_price
+                 ON products(last_net_price) WHERE last_net_price IS NOT NULL''')
+    
+    _backfill_report_items(c)
+    
+    # Popularity ranking: time-decayed score plus raw usage/recency
+    if 'popularity' not in product_columns:
+        c.execute('ALTER TABLE products ADD COLUMN popularity REAL')
+    _backfill_popularity(c)
+    c.execute('CREATE INDEX IF NOT EXISTS idx_products_popularity ON products(popularity DESC)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_products_usage ON products(usage_count DESC, last_used DESC)')
+    
+    # Trigram full-text index over product names, kept in sync by triggers
+    fts_exists = c.execute('''SELECT 1 FROM sqlite_master
+                              WHERE type = 'table' AND name = 'products_fts' ''').fetchone()
+    c.execute('''CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5
+                 (product_name, content='products', content_rowid='id', tokenize='trigram')''')
+    c.execute('''CREATE TRIGGER IF NOT EXISTS products_fts_insert AFTER INSERT ON products BEGIN
+                     INSERT INTO products_fts(rowid, product_name) VALUES (new.id, new.product_name);
+                 END''')
+    c.execute('''CREATE TRIGGER IF NOT EXISTS products_fts_delete AFTER DELETE ON products BEGIN
+                     INSERT INTO products_fts(products_fts, rowid, product_name)
+                     VALUES ('delete', old.id, old.product_name);
+                 END''')
+    c.execute('''CREATE TRIGGER IF NOT EXISTS products_fts_update
+                 AFTER UPDATE OF product_name ON products BEGIN
+                     INSERT INTO products_fts(products_fts, rowid, product_name)
+                     VALUES ('delete', old.id, old.product_name);
+                     INSERT INTO products_fts(rowid, product_name) VALUES (new.id, new.product_name);
+                 END''')
+    if not fts_exists:
+        c.execute("INSERT INTO products_fts(products_fts) VALUES ('rebuild')")
+    
+    # Content-addressed, compressed product lists shared by identical reports
+    c.execute('''CREATE TABLE IF NOT EXISTS report_payloads
+                 (hash TEXT PRIMARY KEY,
+                  codec TEXT NOT NULL,
+                  data BLOB NOT NULL,
+                  size INTEGER NOT NULL) WITHOUT ROWID''')
+    if 'payload_hash' not in columns:
+        c.execute('ALTER TABLE reports ADD COLUMN payload_hash TEXT')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_reports_payload ON reports(payload_hash)')
+    _migrate_report_payloads(c)
+    
+    # Weekly per-product and per-brand summaries (see utils.analytics)
+    _create_analytics_schema(c, rebuild=rates_reparsed)
 
-def init_auth_db():
-    """Initialize authentication tables"""
-    conn = sqlite3.connect('medghor_reports.db')
-    c = conn.cursor()
+def _backfill_report_items(c):
+    """Populate report_items from the products JSON of reports saved before it existed"""
+    pending = c.execute('''SELECT 1 FROM reports r
+                           WHERE r.product_count > 0
+                           AND NOT EXISTS (SELECT 1 FROM report_items i WHERE i.report_id = r.id)
+                           LIMIT 1''').fetchone()
+    if not pending:
+        return
     
+    c.execute('''INSERT OR IGNORE INTO products (product_name, last_rate, usage_count,
+                                                 last_net_price, last_discount_pct,
+                                                 last_scheme_buy, last_scheme_free)
+                 SELECT name, rate, 0, rate_field(rate, 0), rate_field(rate, 1),
+                        rate_field(rate, 2), rate_field(rate, 3)
+                 FROM (SELECT json_extract(j.value, '$.name') AS name,
+                              json_extract(j.value, '$.rate') AS rate
+                       FROM reports r, json_each(r.products) j)''')
+    c.execute('''INSERT INTO report_items (report_id, position, product_id, rate, net_price,
+                                           discount_pct, scheme_buy, scheme_free)
+                 SELECT report_id, position, product_id, rate, rate_field(rate, 0),
+                        rate_field(rate, 1), rate_field(rate, 2), rate_field(rate, 3)
+                 FROM (SELECT r.id AS report_id, j.key AS position, p.id AS product_id,
+                              json_extract(j.value, '$.rate') AS rate
+                       FROM reports r, json_each(r.products) j
+                       JOIN products p ON p.product_name = json_extract(j.value, '$.name')
+                       WHERE NOT EXISTS (SELECT 1 FROM report_items i WHERE i.report_id = r.id))''')
+
+def _migrate_report_payloads(c, batch_size=1000):
+    """Move inline products JSON of older reports into report_payloads
+    
+    Runs after the other backfills, which still read reports.products.
+    """
+    last_id = 0
+    while True:
+        rows = c.execute('''SELECT id, products FROM reports
+                            WHERE id > ? AND payload_hash IS NULL AND products IS NOT NULL
+                            ORDER BY id LIMIT ?''', (last_id, batch_size)).fetchall()
+        if not rows:
+            return
+        updates = [(_store_payload(c, products_json), report_id)
+                   for report_id, products_json in rows]
+        c.executemany('UPDATE reports SET payload_hash = ?, products = NULL WHERE id = ?', updates)
+        last_id = rows[-1][0]
+
+def _store_payload(conn, products_json):
+    """Store a products JSON payload once and return its content hash"""
+    data = products_json.encode()
+    payload_hash = hashlib.sha256(data).hexdigest()
+    conn.execute('''INSERT OR IGNORE INTO report_payloads (hash, codec, data, size)
+                    VALUES (?, ?, ?, ?)''',
+                 (payload_hash, PAYLOAD_CODEC, zlib.compress(data, PAYLOAD_COMPRESS_LEVEL), len(data)))
+    return payload_hash
+
+def _decode_payload(products, codec, data):
+    """Products JSON text of a report row, whether inline or stored as a payload"""
+    if data is None:
+        return products
+    if codec == 'zlib':
+        return zlib.decompress(data).decode()
+    raise ValueError(f"Unknown report payload codec '{codec}'")
+
+def _popularity_score(timestamp):
+    """Score contributed by one use at the given unix timestamp"""
+    return POPULARITY_DECAY_RATE * (timestamp - POPULARITY_EPOCH) / 86400
+
+def _backfill_popularity(c):
+    """Seed popularity for products saved before scores existed
+    
+    Every past use is assumed to have happened at last_used. Products that
+    were never used in a report keep a NULL score and rank last.
+    """
+    rows = c.execute('''SELECT id, usage_count, strftime('%s', last_used) FROM products
+                        WHERE popularity IS NULL AND usage_count > 0''').fetchall()
+    c.executemany('UPDATE products SET popularity = ? WHERE id = ?',
+                  [(math.log(max(usage_count or 0, 1)) + _popularity_score(float(last_used or time.time())),
+                    product_id)
+                   for product_id, usage_count, last_used in rows])
+
+def init_auth_db():
+    """Initialize authentication tables (once per process)"""
+    get_pool().run_once('auth_schema', _create_auth_schema)
+
+def _create_auth_schema(c):
     # Users table
     c.execute('''CREATE TABLE IF NOT EXISTS users
                  (id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -56,73 +254,366 @@ def init_auth_db():
                   created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                   expires_at TIMESTAMP,
                   FOREIGN KEY (user_id) REFERENCES users(id))''')
-    
-    conn.commit()
-    conn.close()
+    c.execute('''CREATE INDEX IF NOT EXISTS idx_user_sessions_expires
+                 ON user_sessions(expires_at)''')
+    c.execute('''CREATE INDEX IF NOT EXISTS idx_user_sessions_user
+                 ON user_sessions(user_id)''')
 
 def save_report(start_date, end_date, brand_name, products, user_id=1):
-    """Save report to database"""
-    conn = sqlite3.connect('medghor_reports.db')
-    c = conn.cursor()
+    """Save report to database
     
+    The report row, its report_items and the products usage upserts are
+    written in one transaction with batched executemany calls. The product
+    list is stored compressed in report_payloads, once per distinct list.
+    
+    Returns:
+        int: ID of the new report
+    """
     products_json = json.dumps(products)
-    c.execute('''INSERT INTO reports (start_date, end_date, brand_name, products, user_id)
-                 VALUES (?, ?, ?, ?, ?)''',
-              (start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d'), 
-               brand_name, products_json, user_id))
-    
-    # Update products usage
-    for product in products:
-        c.execute('''INSERT INTO products (product_name, last_rate, usage_count, last_used)
-                     VALUES (?, ?, 1, CURRENT_TIMESTAMP)
-                     ON CONFLICT(product_name) DO UPDATE SET
-                     last_rate = ?,
-                     usage_count = usage_count + 1,
-                     last_used = CURRENT_TIMESTAMP''',
-                  (product['name'], product['rate'], product['rate']))
-    
-    conn.commit()
-    conn.close()
+    with transaction() as conn:
+        payload_hash = _store_payload(conn, products_json)
+        c = conn.execute('''INSERT INTO reports (start_date, end_date, brand_name, payload_hash,
+                                                user_id, product_count)
+                            VALUES (?, ?, ?, ?, ?, ?)''',
+                         (start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d'), 
+                          brand_name, payload_hash, user_id, len(products)))
+        report_id = c.lastrowid
+        
+        # Update products usage
+        score = _popularity_score(time.time())
+        parsed = [parse_rate(product['rate']) for product in products]
+        conn.executemany(f'''INSERT INTO products (product_name, last_rate, usage_count, last_used,
+                                                  popularity, {_LAST_RATE_COLUMNS})
+                             VALUES (?, ?, 1, CURRENT_TIMESTAMP, ?, ?, ?, ?, ?)
+                             ON CONFLICT(product_name) DO UPDATE SET
+                             last_rate = excluded.last_rate,
+                             usage_count = usage_count + 1,
+                             last_used = CURRENT_TIMESTAMP,
+                             popularity = logaddexp(popularity, excluded.popularity),
+                             {_LAST_RATE_UPDATES}''',
+                          [(product['name'], product['rate'], score, *fields)
+                           for product, fields in zip(products, parsed)])
+        
+        product_ids = _get_product_ids(conn, [product['name'] for product in products])
+        conn.executemany(f'''INSERT INTO report_items (report_id, position, product_id, rate,
+                                                      {', '.join(RATE_FIELDS)})
+                             VALUES (?, ?, ?, ?, ?, ?, ?, ?)''',
+                          [(report_id, position, product_ids[product['name']], product['rate'],
+                            *fields)
+                           for position, (product, fields) in enumerate(zip(products, parsed))])
+        update_report_stats(conn, report_id, 1)
+    
+    # Called from inside a caller's transaction, wait until the report is visible
+    after_commit(invalidate_popular_products)
+    return report_id
+
+def upsert_products(products):
+    """Insert or update products from a price list without counting a use
+    
+    New products start with usage_count 0; existing ones only get their
+    last_rate updated. Runs as one executemany and joins the caller's
+    transaction when there is one.
+    
+    Args:
+        products: List of product dictionaries with 'name' and 'rate' keys
+    """
+    with transaction() as conn:
+        conn.executemany(f'''INSERT INTO products (product_name, last_rate, usage_count,
+                                                  {_LAST_RATE_COLUMNS})
+                             VALUES (?, ?, 0, ?, ?, ?, ?)
+                             ON CONFLICT(product_name) DO UPDATE SET
+                             last_rate = excluded.last_rate,
+                             {_LAST_RATE_UPDATES}''',
+                          [(product['name'], product['rate'], *parse_rate(product['rate']))
+                           for product in products])
+
+def _get_product_ids(conn, names, chunk_size=500):
+    """Map product names to products.id, querying in chunks of bound parameters"""
+    names = list(dict.fromkeys(names))
+    product_ids = {}
+    for i in range(0, len(names), chunk_size):
+        chunk = names[i:i + chunk_size]
+        placeholders = ', '.join('?' * len(chunk))
+        product_ids.update(
+            (name, product_id) for product_id, name in conn.execute(
+                f'SELECT id, product_name FROM products WHERE product_name IN ({placeholders})',
+                chunk))
+    return product_ids
 
 def get_all_reports(user_id=None):
     """Retrieve all reports from database"""
-    conn = sqlite3.connect('medghor_reports.db')
-    c = conn.cursor()
+    where = 'WHERE r.user_id = ?' if user_id else ''
+    with connection() as conn:
+        rows = conn.execute(f'''SELECT r.id, r.start_date, r.end_date, r.brand_name, r.products,
+                                       r.user_id, r.created_at, p.codec, p.data
+                                FROM reports r
+                                LEFT JOIN report_payloads p ON p.hash = r.payload_hash
+                                {where} ORDER BY r.created_at DESC''',
+                            (user_id,) if user_id else ()).fetchall()
+    return [(report_id, start, end, brand, _decode_payload(products, codec, data),
+             owner, created)
+            for report_id, start, end, brand, products, owner, created, codec, data in rows]
+
+def get_reports_page(limit=20, cursor=None, user_id=None, brand_name=None,
+                     date_from=None, date_to=None):
+    """Retrieve one page of report history, newest first
+    
+    Uses keyset pagination on (created_at, id) and leaves out the products
+    blob, so the cost of a page does not depend on the size of the history.
+    
+    Args:
+        limit: Maximum number of reports to return
+        cursor: (created_at, id) of the last report on the previous page
+        user_id: Only return reports created by this user
+        brand_name: Only return reports for this brand
+        date_from: Only return reports whose period ends on or after this date
+        date_to: Only return reports whose period starts on or before this date
     
+    Returns:
+        tuple: (rows, next_cursor) where each row is
+        (id, start_date, end_date, brand_name, product_count, user_id, created_at)
+        and next_cursor is None on the last page
+    """
+    clauses = []
+    params = []
+    if cursor:
+        clauses.append('(created_at, id) < (?, ?)')
+        params.extend(cursor)
     if user_id:
-        c.execute('SELECT * FROM reports WHERE user_id = ? ORDER BY created_at DESC', (user_id,))
-    else:
-        c.execute('SELECT * FROM reports ORDER BY created_at DESC')
+        clauses.append('user_id = ?')
+        params.append(user_id)
+    if brand_name:
+        clauses.append('brand_name = ?')
+        params.append(brand_name)
+    if date_from:
+        clauses.append('end_date >= ?')
+        params.append(date_from.strftime('%Y-%m-%d'))
+    if date_to:
+        clauses.append('start_date <= ?')
+        params.append(date_to.strftime('%Y-%m-%d'))
     
-    reports = c.fetchall()
-    conn.close()
-    return reports
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+    with connection() as conn:
+        rows = conn.execute(f'''SELECT id, start_date, end_date, brand_name, product_count,
+                                         user_id, created_at
+                                  FROM reports {where}
+                                  ORDER BY created_at DESC, id DESC
+                                  LIMIT ?''', (*params, limit + 1)).fetchall()
+    
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = (rows[-1][6], rows[-1][0])
+    return rows, next_cursor
 
 def get_popular_products(limit=20):
-    """Get most frequently used products"""
-    conn = sqlite3.connect('medghor_reports.db')
-    c = conn.cursor()
-    c.execute('SELECT product_name, last_rate, usage_count FROM products ORDER BY usage_count DESC LIMIT ?', (limit,))
-    products = c.fetchall()
-    conn.close()
-    return products
+    """Get the most popular products, ranked by time-decayed usage
+    
+    Results are served from a process-level cache that expires after
+    POPULAR_CACHE_TTL seconds and is invalidated whenever a report is saved.
+    
+    Returns:
+        list: (product_name, last_rate, usage_count) tuples
+    """
+    now = time.monotonic()
+    with _popular_cache_lock:
+        cache = _popular_cache
+        if cache['expires'] > now and cache['limit'] >= limit:
+            return cache['rows'][:limit]
+        version = cache['version']
+    
+    with connection() as conn:
+        rows = conn.execute('''SELECT product_name, last_rate, usage_count FROM products
+                               ORDER BY popularity DESC LIMIT ?''', (limit,)).fetchall()
+    
+    with _popular_cache_lock:
+        # Do not cache rows read before a concurrent save invalidated them
+        if _popular_cache['version'] == version:
+            _popular_cache.update(expires=now + POPULAR_CACHE_TTL, limit=limit, rows=rows)
+    return rows
+
+def invalidate_popular_products():
+    """Drop the cached popular products list"""
+    with _popular_cache_lock:
+        _popular_cache.update(version=_popular_cache['version'] + 1, expires=0.0,
+                              limit=0, rows=[])
+
+def _fts_phrase(text):
+    """Quote text as an FTS5 string literal"""
+    return '"' + text.replace('"', '""') + '"'
+
+def search_products(query, limit=10):
+    """Search saved products by name for autocomplete
+    
+    Every word of the query of three or more characters must appear
+    somewhere in the name (case-insensitive substring match on the trigram
+    index). When nothing matches, a fuzzy pass matches any trigram of the
+    query so small typos still surface candidates. Names starting with the
+    query come first, then by relevance and popularity.
+    
+    Args:
+        query: Text typed by the user
+        limit: Maximum number of matches to return
+    
+    Returns:
+        list: (product_name, last_rate, usage_count) tuples
+    """
+    words = query.split()
+    if not words:
+        return []
+    
+    with connection() as conn:
+        if all(len(word) < 3 for word in words):
+            # Too short for trigrams: plain prefix match
+            pattern = query.strip().replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+            return conn.execute('''SELECT product_name, last_rate, usage_count FROM products
+                                   WHERE product_name LIKE ? ESCAPE '\\'
+                                   ORDER BY popularity DESC LIMIT ?''', (pattern, limit)).fetchall()
+        
+        strict = ' AND '.join(_fts_phrase(word) for word in words if len(word) >= 3)
+        candidates = _match_products(conn, strict, limit * 5)
+        if not candidates:
+            trigrams = {word[i:i + 3].lower() for word in words for i in range(len(word) - 2)}
+            fuzzy = ' OR '.join(_fts_phrase(trigram) for trigram in sorted(trigrams))
+            candidates = _match_products(conn, fuzzy, limit * 5)
+    
+    prefix = query.strip().upper()
+    candidates.sort(key=lambda row: (not row[0].upper().startswith(prefix), row[3], -(row[4] or 0)))
+    return [row[:3] for row in candidates[:limit]]
+
+def _match_products(conn, match, limit):
+    """Best FTS matches as (name, last_rate, usage_count, rank, popularity) rows
+    
+    bm25 ranking has to score every match, so very broad queries (a few
+    letters matching most of the catalog) take the first matches unranked
+    and leave ordering to prefix and popularity.
+    """
+    total = conn.execute('SELECT count(*) FROM products_fts WHERE products_fts MATCH ?',
+                         (match,)).fetchone()[0]
+    order = 'ORDER BY rank' if total <= SEARCH_RANKED_MATCHES else ''
+    return conn.execute(f'''SELECT p.product_name, p.last_rate, p.usage_count, f.rank,
+                                    p.popularity
+                             FROM (SELECT rowid, rank FROM products_fts
+                                   WHERE products_fts MATCH ?
+                                   {order} LIMIT ?) f
+                             JOIN products p ON p.id = f.rowid''', (match, limit)).fetchall()
 
 def delete_report(report_id):
     """Delete a report by ID"""
-    conn = sqlite3.connect('medghor_reports.db')
-    c = conn.cursor()
-    c.execute('DELETE FROM reports WHERE id = ?', (report_id,))
-    conn.commit()
-    conn.close()
+    with transaction() as conn:
+        row = conn.execute('SELECT payload_hash FROM reports WHERE id = ?', (report_id,)).fetchone()
+        update_report_stats(conn, report_id, -1)
+        conn.execute('DELETE FROM report_items WHERE report_id = ?', (report_id,))
+        conn.execute('DELETE FROM reports WHERE id = ?', (report_id,))
+        if row and row[0]:
+            # Drop the payload unless another report shares it
+            conn.execute('''DELETE FROM report_payloads WHERE hash = ?
+                            AND NOT EXISTS (SELECT 1 FROM reports WHERE payload_hash = ?)''',
+                         (row[0], row[0]))
 
 def load_report(report_id):
-    """Load a specific report by ID"""
-    conn = sqlite3.connect('medghor_reports.db')
-    c = conn.cursor()
-    c.execute('SELECT start_date, end_date, brand_name, products FROM reports WHERE id = ?', (report_id,))
-    report = c.fetchone()
-    conn.close()
-    return report
+    """Load a specific report by ID, falling back to the archive database"""
+    with connection() as conn:
+        row = conn.execute('''SELECT r.start_date, r.end_date, r.brand_name, r.products,
+                                     p.codec, p.data
+                              FROM reports r
+                              LEFT JOIN report_payloads p ON p.hash = r.payload_hash
+                              WHERE r.id = ?''', (report_id,)).fetchone()
+    if row is None:
+        from utils.archive import load_archived_report
+        return load_archived_report(report_id)
+    start, end, brand, products, codec, data = row
+    return start, end, brand, _decode_payload(products, codec, data)
+
+def iter_report_products(report_id):
+    """Yield a report's products in order straight from the database cursor
+    
+    Suitable as the products argument of generate_pdf_stream for reports
+    too large to decode into memory at once.
+    """
+    with connection() as conn:
+        for name, rate in conn.execute('''SELECT p.product_name, i.rate
+                                         FROM report_items i
+                                         JOIN products p ON p.id = i.product_id
+                                         WHERE i.report_id = ?
+                                         ORDER BY i.position''', (report_id,)):
+            yield {'name': name, 'rate': rate}
+
+def get_reports_with_product(product_name, limit=50):
+    """Find the most recent reports that contained a product
+    
+    Returns:
+        list: (id, start_date, end_date, brand_name, rate, created_at) rows
+    """
+    with connection() as conn:
+        return conn.execute('''SELECT r.id, r.start_date, r.end_date, r.brand_name, i.rate,
+                                      r.created_at
+                               FROM products p
+                               JOIN report_items i ON i.product_id = p.id
+                               JOIN reports r ON r.id = i.report_id
+                               WHERE p.product_name = ?
+                               ORDER BY r.created_at DESC, r.id DESC
+                               LIMIT ?''', (product_name, limit)).fetchall()
+
+def get_product_rate_history(product_name):
+    """Get the rate a product was offered at in every report, oldest first
+    
+    Returns:
+        list: (start_date, end_date, brand_name, rate) rows
+    """
+    with connection() as conn:
+        return conn.execute('''SELECT r.start_date, r.end_date, r.brand_name, i.rate
+                               FROM products p
+                               JOIN report_items i ON i.product_id = p.id
+                               JOIN reports r ON r.id = i.report_id
+                               WHERE p.product_name = ?
+                               ORDER BY r.start_date, r.id''', (product_name,)).fetchall()
+
+def find_offers(min_discount=None, max_net_price=None, brand_name=None, date_from=None,
+                date_to=None, limit=100):
+    """Find report items by their parsed rate fields
+    
+    Args:
+        min_discount: Minimum discount percentage
+        max_net_price: Maximum net price
+        brand_name: Only reports of this brand
+        date_from: Only reports starting on or after this date (YYYY-MM-DD)
+        date_to: Only reports ending on or before this date (YYYY-MM-DD)
+        limit: Maximum number of rows
+    
+    Returns:
+        list: (report_id, start_date, end_date, brand_name, product_name, rate,
+        net_price, discount_pct, scheme_buy, scheme_free) rows, best offer first
+    """
+    conditions, params = [], []
+    if min_discount is not None:
+        conditions.append('i.discount_pct >= ?')
+        params.append(min_discount)
+    if max_net_price is not None:
+        conditions.append('i.net_price <= ?')
+        params.append(max_net_price)
+    if brand_name:
+        conditions.append('r.brand_name = ?')
+        params.append(brand_name)
+    if date_from:
+        conditions.append('r.start_date >= ?')
+        params.append(date_from)
+    if date_to:
+        conditions.append('r.end_date <= ?')
+        params.append(date_to)
+    where = ' AND '.join(conditions) or '1'
+    order = 'i.net_price' if max_net_price is not None and min_discount is None \
+        else 'i.discount_pct DESC'
+    with connection() as conn:
+        return conn.execute(f'''SELECT r.id, r.start_date, r.end_date, r.brand_name, p.product_name,
+                                       i.rate, i.net_price, i.discount_pct, i.scheme_buy,
+                                       i.scheme_free
+                                FROM report_items i
+                                JOIN reports r ON r.id = i.report_id
+                                JOIN products p ON p.id = i.product_id
+                                WHERE {where}
+                                ORDER BY {order}, r.start_date DESC, r.id DESC
+                                LIMIT ?''', (*params, limit)).fetchall()
 
 def hash_password(password):
     """Hash password using SHA-256"""
@@ -130,41 +621,61 @@ def hash_password(password):
 
 def create_user(username, email, password, full_name, role='viewer'):
     """Create a new user"""
-    conn = sqlite3.connect('medghor_reports.db')
-    c = conn.cursor()
-    
     password_hash = hash_password(password)
     
     try:
-        c.execute('''INSERT INTO users (username, email, password_hash, full_name, role)
-                     VALUES (?, ?, ?, ?, ?)''',
-                  (username, email, password_hash, full_name, role))
-        conn.commit()
+        with transaction() as conn:
+            conn.execute('''INSERT INTO users (username, email, password_hash, full_name, role)
+                            VALUES (?, ?, ?, ?, ?)''',
+                         (username, email, password_hash, full_name, role))
         return True, "User created successfully"
     except sqlite3.IntegrityError:
         return False, "Username or email already exists"
-    finally:
-        conn.close()
+
+def sync_user(username, email, full_name, role='viewer'):
+    """Mirror an account kept outside the database into users
+
+    Accounts from the credentials file need a users row so sessions and
+    the audit log can refer to them. Their password stays in the file, so
+    the stored hash never matches and authenticate_user() rejects them.
+
+    Returns:
+        dict: id, username, email, full_name, role and is_active
+    """
+    with transaction() as conn:
+        row = conn.execute('''INSERT INTO users (username, email, password_hash, full_name, role)
+                              VALUES (?, ?, '!', ?, ?)
+                              ON CONFLICT(username) DO UPDATE SET
+                              email = excluded.email,
+                              full_name = excluded.full_name,
+                              role = excluded.role,
+                              last_login = CURRENT_TIMESTAMP
+                              RETURNING id, is_active''',
+                           (username, email or f"{username}@medghor.local", full_name,
+                            role)).fetchone()
+    return {'id': row[0], 'username': username, 'email': email, 'full_name': full_name,
+            'role': role, 'is_active': row[1]}
 
 def authenticate_user(username, password):
     """Authenticate user credentials"""
-    conn = sqlite3.connect('medghor_reports.db')
-    c = conn.cursor()
-    
     password_hash = hash_password(password)
     
-    c.execute('''SELECT id, username, email, full_name, role, is_active, failed_login_attempts
-                 FROM users WHERE username = ? AND password_hash = ?''',
-              (username, password_hash))
-    
-    user = c.fetchone()
+    with transaction() as conn:
+        user = conn.execute('''SELECT id, username, email, full_name, role, is_active,
+                                       failed_login_attempts
+                                FROM users WHERE username = ? AND password_hash = ?''',
+                            (username, password_hash)).fetchone()
+        
+        if user:
+            # Reset failed attempts
+            conn.execute('''UPDATE users SET failed_login_attempts = 0, last_login = CURRENT_TIMESTAMP
+                            WHERE id = ?''', (user[0],))
+        else:
+            # Increment failed attempts
+            conn.execute('''UPDATE users SET failed_login_attempts = failed_login_attempts + 1
+                            WHERE username = ?''', (username,))
     
     if user:
-        user_id = user[0]
-        # Reset failed attempts
-        c.execute('UPDATE users SET failed_login_attempts = 0, last_login = CURRENT_TIMESTAMP WHERE id = ?', (user_id,))
-        conn.commit()
-        conn.close()
         return True, {
             'id': user[0],
             'username': user[1],
@@ -173,9 +684,7 @@ def authenticate_user(username, password):
             'role': user[4],
             'is_active': user[5]
         }
-    else:
-        # Increment failed attempts
-        c.execute('UPDATE users SET failed_login_attempts = failed_login_attempts + 1 WHERE username = ?', (username,))
-        conn.commit()
-        conn.close()
-        return False, None
+    return False, None
+
+# Trace every public function above (a flag check while tracing is disabled)
+instrument_module(globals(), 'db.')
@@ -0,0 +1,315 @@
+"""Headless HTTP service for rendering offer sheets and reading saved reports
+
+Usage:
+    python -m utils.http_service                       # 127.0.0.1:8502, 4 workers
+    python -m utils.http_service --host 0.0.0.0 --port 9000 --workers 8
+
+Endpoints:
+    GET  /health                      -> {"status": "ok"}
+    GET  /reports?limit=&cursor=&brand=&user_id=
+                                      -> {"reports": [...], "next_cursor": str|null}
+    GET  /reports/<id>                -> report with decoded products
+    GET  /reports/<id>/pdf?rate_label=
+                                      -> application/pdf
+    POST /render                      -> application/pdf, body is JSON with
+                                         start_date, end_date ('YYYY-MM-DD'),
+                                         brand_name, products and optionally
+                                         rate_label, contact_number, save
+
+PDF responses carry an ETag derived from the render inputs (the PDF cache
+key), so a matching If-None-Match is answered with 304 before anything is
+rendered. Requests are served by a fixed pool of worker threads; when the
+pool and its backlog are full, new connections get 503 immediately.
+"""
+import argparse
+import json
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from utils.database import init_db, get_reports_page, load_report, save_report
+from utils.pdf_cache import make_cache_key, pdf_cache
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8502
+DEFAULT_WORKERS = 4
+# Connections allowed to wait for a worker before the server answers 503
+DEFAULT_BACKLOG = 64
+# How long a new connection may wait for a free slot before it is rejected
+SLOT_WAIT_SECONDS = 0.05
+MAX_BODY_BYTES = 8 * 1024 * 1024
+MAX_PAGE_SIZE = 200
+DEFAULT_RATE_LABEL = "Rate/Discount"
+DEFAULT_CONTACT_NUMBER = "1234567890"
+
+
+def _pdf_etag(start_date, end_date, brand_name, products, rate_label, contact_number):
+    return '"' + make_cache_key(start_date, end_date, brand_name, products, rate_label,
+                                contact_number) + '"'
+
+
+class RequestError(Exception):
+    """Client error answered with the given HTTP status"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _parse_date(value, field):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d')
+    except (TypeError, ValueError):
+        raise RequestError(400, f"{field} must be a 'YYYY-MM-DD' date")
+
+
+def _encode_cursor(cursor):
+    return f"{cursor[0]}|{cursor[1]}" if cursor else None
+
+
+def _decode_cursor(value):
+    if not value:
+        return None
+    created_at, _, report_id = value.rpartition('|')
+    if not created_at or not report_id.isdigit():
+        raise RequestError(400, "Invalid cursor")
+    return created_at, int(report_id)
+
+
+def _validate_products(products):
+    if not isinstance(products, list) or not products:
+        raise RequestError(400, "products must be a non-empty list")
+    for product in products:
+        if not isinstance(product, dict) or not isinstance(product.get('name'), str) \
+                or not isinstance(product.get('rate'), str):
+            raise RequestError(400, "each product needs string 'name' and 'rate' fields")
+    return [{'name': product['name'], 'rate': product['rate']} for product in products]
+
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    """Routes requests to the database and PDF cache"""
+
+    server_version = 'MedghorHTTP/1.0'
+
+    def do_GET(self):
+        self._dispatch(self._get)
+
+    def do_POST(self):
+        self._dispatch(self._post)
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+    def _dispatch(self, handler):
+        try:
+            url = urlsplit(self.path)
+            handler(url.path.rstrip('/') or '/', parse_qs(url.query))
+        except RequestError as e:
+            self._send_json({'error': str(e)}, e.status)
+        except Exception as e:
+            self.log_error("Unhandled error: %r", e)
+            self._send_json({'error': 'Internal server error'}, 500)
+
+    def _get(self, path, query):
+        parts = path.strip('/').split('/')
+        if path == '/health':
+            self._send_json({'status': 'ok'})
+        elif path == '/reports':
+            self._list_reports(query)
+        elif len(parts) == 2 and parts[0] == 'reports' and parts[1].isdigit():
+            self._get_report(int(parts[1]))
+        elif len(parts) == 3 and parts[0] == 'reports' and parts[1].isdigit() and parts[2] == 'pdf':
+            self._get_report_pdf(int(parts[1]), query)
+        else:
+            raise RequestError(404, "Not found")
+
+    def _post(self, path, query):
+        if path != '/render':
+            raise RequestError(404, "Not found")
+        body = self._read_json()
+        start_date = _parse_date(body.get('start_date'), 'start_date')
+        end_date = _parse_date(body.get('end_date'), 'end_date')
+        brand_name = body.get('brand_name')
+        if not isinstance(brand_name, str) or not brand_name.strip():
+            raise RequestError(400, "brand_name is required")
+        products = _validate_products(body.get('products'))
+        rate_label = body.get('rate_label') or DEFAULT_RATE_LABEL
+        contact_number = body.get('contact_number') or DEFAULT_CONTACT_NUMBER
+
+        etag = _pdf_etag(start_date, end_date, brand_name, products, rate_label, contact_number)
+        # A 304 must not save a second copy of the report
+        if self._send_not_modified(etag):
+            return
+        if body.get('save'):
+            save_report(start_date, end_date, brand_name, products)
+        self._send_pdf(start_date, end_date, brand_name, products, rate_label, contact_number,
+                       etag)
+
+    def _list_reports(self, query):
+        try:
+            limit = min(int(query.get('limit', ['20'])[0]), MAX_PAGE_SIZE)
+            user_id = int(query['user_id'][0]) if 'user_id' in query else None
+        except ValueError:
+            raise RequestError(400, "limit and user_id must be integers")
+        rows, next_cursor = get_reports_page(
+            limit=max(limit, 1),
+            cursor=_decode_cursor(query.get('cursor', [None])[0]),
+            user_id=user_id,
+            brand_name=query.get('brand', [None])[0])
+        keys = ('id', 'start_date', 'end_date', 'brand_name', 'product_count', 'user_id',
+                'created_at')
+        self._send_json({'reports': [dict(zip(keys, row)) for row in rows],
+                         'next_cursor': _encode_cursor(next_cursor)})
+
+    def _load(self, report_id):
+        report = load_report(report_id)
+        if report is None:
+            raise RequestError(404, f"Report #{report_id} not found")
+        start, end, brand, products_json = report
+        return start, end, brand, json.loads(products_json)
+
+    def _get_report(self, report_id):
+        start, end, brand, products = self._load(report_id)
+        self._send_json({'id': report_id, 'start_date': start, 'end_date': end,
+                         'brand_name': brand, 'products': products})
+
+    def _get_report_pdf(self, report_id, query):
+        start, end, brand, products = self._load(report_id)
+        rate_label = query.get('rate_label', [DEFAULT_RATE_LABEL])[0]
+        self._send_pdf(_parse_date(start, 'start_date'), _parse_date(end, 'end_date'),
+                       brand, products, rate_label, DEFAULT_CONTACT_NUMBER)
+
+    def _read_json(self):
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+        except ValueError:
+            raise RequestError(400, "Invalid Content-Length")
+        if length > MAX_BODY_BYTES:
+            raise RequestError(413, "Request body too large")
+        try:
+            body = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            raise RequestError(400, "Body must be JSON")
+        if not isinstance(body, dict):
+            raise RequestError(400, "Body must be a JSON object")
+        return body
+
+    def _send_not_modified(self, etag):
+        """Answer 304 if If-None-Match matches etag; returns True when it did"""
+        if etag not in [tag.strip() for tag in self.headers.get('If-None-Match', '').split(',')]:
+            return False
+        self.send_response(304)
+        self.send_header('ETag', etag)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+        return True
+
+    def _send_pdf(self, start_date, end_date, brand_name, products, rate_label, contact_number,
+                  etag=None):
+        if etag is None:
+            etag = _pdf_etag(start_date, end_date, brand_name, products, rate_label,
+                             contact_number)
+            if self._send_not_modified(etag):
+                return
+        data = self.server.pdf_cache.get_or_render(start_date, end_date, brand_name, products,
+                                                   rate_label, contact_number)
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/pdf')
+        self.send_header('Content-Length', str(len(data)))
+        self.send_header('ETag', etag)
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_json(self, payload, status=200):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class BoundedHTTPServer(HTTPServer):
+    """HTTPServer that hands connections to a fixed-size thread pool"""
+
+    daemon_threads = True
+
+    def __init__(self, address, handler=ServiceHandler, workers=DEFAULT_WORKERS,
+                 backlog=DEFAULT_BACKLOG, quiet=False, cache=None):
+        """Initialize the server
+
+        Args:
+            address: (host, port) to listen on
+            handler: Request handler class
+            workers: Worker threads serving requests
+            backlog: Connections allowed to queue for a worker
+            quiet: Suppress per-request access logs
+            cache: PDFCache used for renders (the process-wide pdf_cache by default)
+        """
+        super().__init__(address, handler)
+        self.quiet = quiet
+        self.pdf_cache = cache if cache is not None else pdf_cache
+        self._executor = ThreadPoolExecutor(max_workers=workers,
+                                            thread_name_prefix='http-worker')
+        self._slots = threading.BoundedSemaphore(workers + backlog)
+
+    def process_request(self, request, client_address):
+        # A short wait absorbs the gap between a response being sent and its slot being freed
+        if not self._slots.acquire(timeout=SLOT_WAIT_SECONDS):
+            self._reject(request)
+            return
+        self._executor.submit(self._process, request, client_address)
+
+    def _process(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self._slots.release()
+            self.shutdown_request(request)
+
+    def _reject(self, request):
+        try:
+            request.sendall(b'HTTP/1.0 503 Service Unavailable\r\nContent-Length: 0\r\n'
+                            b'Retry-After: 1\r\nConnection: close\r\n\r\n')
+        except OSError:
+            pass
+        self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self._executor.shutdown(wait=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve Medghor offer sheets over HTTP")
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS)
+    parser.add_argument('--backlog', type=int, default=DEFAULT_BACKLOG,
+                        help="Connections that may wait for a worker before getting 503")
+    parser.add_argument('--quiet', action='store_true', help="Disable access logs")
+    args = parser.parse_args(argv)
+
+    init_db()
+    server = BoundedHTTPServer((args.host, args.port), workers=args.workers,
+                               backlog=args.backlog, quiet=args.quiet)
+    print(f"Serving on http://{args.host}:{server.server_port} with {args.workers} workers",
+          file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
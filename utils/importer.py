@@ -0,0 +1,147 @@
+"""Bulk product import from distributor price lists (CSV or Excel)"""
+import csv
+import io
+import os
+import zipfile
+
+from utils.connection import transaction
+from utils.database import upsert_products, invalidate_popular_products
+
+MAX_NAME_LENGTH = 200
+MAX_RATE_LENGTH = 60
+MAX_REPORTED_ERRORS = 50
+
+# Header names recognised for each column (compared case-insensitively)
+NAME_HEADERS = ('product name', 'product', 'name', 'item', 'item name', 'description')
+RATE_HEADERS = ('rate/discount', 'rate', 'discount', 'offer', 'price', 'net rate', 'scheme')
+
+
+def _find_columns(header):
+    """Return (name_index, rate_index) if header looks like a header row, else None"""
+    cells = [str(cell).strip().lower() if cell is not None else '' for cell in header]
+    name_idx = next((i for i, cell in enumerate(cells) if cell in NAME_HEADERS), None)
+    rate_idx = next((i for i, cell in enumerate(cells) if cell in RATE_HEADERS), None)
+    if name_idx is None or rate_idx is None:
+        return None
+    return name_idx, rate_idx
+
+
+def _iter_csv(file):
+    text = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+    try:
+        yield from csv.reader(text)
+    except UnicodeDecodeError:
+        raise ValueError("The CSV file is not UTF-8 text. Save it as CSV UTF-8 and try again")
+    finally:
+        text.detach()
+
+
+def _iter_xlsx(file):
+    try:
+        from openpyxl import load_workbook
+        from openpyxl.utils.exceptions import InvalidFileException
+    except ImportError:
+        raise ValueError("Excel import needs the openpyxl package (pip install openpyxl)")
+    try:
+        workbook = load_workbook(file, read_only=True, data_only=True)
+    except (zipfile.BadZipFile, InvalidFileException, KeyError):
+        raise ValueError("The file is not a valid Excel workbook (.xlsx)")
+    try:
+        yield from workbook.active.iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+def iter_price_list(file, file_name):
+    """Stream (line_number, name, rate) tuples from an uploaded price list
+
+    The first row is treated as a header when it names a product and a
+    rate column; otherwise the first two columns are used.
+
+    Args:
+        file: Binary file-like object (e.g. a Streamlit UploadedFile)
+        file_name: Original file name, used to pick the format
+
+    Raises:
+        ValueError: If the file type is not supported or the file is corrupt
+    """
+    extension = os.path.splitext(file_name)[1].lower()
+    if extension == '.csv':
+        rows = _iter_csv(file)
+    elif extension in ('.xlsx', '.xlsm'):
+        rows = _iter_xlsx(file)
+    else:
+        raise ValueError(f"Unsupported file type '{extension}'. Upload a .csv or .xlsx file")
+
+    name_idx, rate_idx = 0, 1
+    for line_number, row in enumerate(rows, 1):
+        row = list(row)
+        if line_number == 1:
+            columns = _find_columns(row)
+            if columns:
+                name_idx, rate_idx = columns
+                continue
+        if not any(cell not in (None, '') for cell in row):
+            continue
+        name = row[name_idx] if name_idx < len(row) else None
+        rate = row[rate_idx] if rate_idx < len(row) else None
+        yield line_number, name, rate
+
+
+def validate_row(name, rate):
+    """Normalize one price list row
+
+    Returns:
+        tuple: (product dict or None, error message or None)
+    """
+    name = str(name).strip() if name is not None else ''
+    rate = str(rate).strip() if rate is not None else ''
+    if not name:
+        return None, "missing product name"
+    if not rate:
+        return None, "missing rate"
+    if len(name) > MAX_NAME_LENGTH:
+        return None, f"product name longer than {MAX_NAME_LENGTH} characters"
+    if len(rate) > MAX_RATE_LENGTH:
+        return None, f"rate longer than {MAX_RATE_LENGTH} characters"
+    return {'name': name, 'rate': rate}, None
+
+
+def import_price_list(file, file_name, chunk_size=500):
+    """Validate a price list and upsert its products in batches
+
+    The whole file is parsed and validated before the write transaction
+    starts, so a slow upload or a corrupt file never holds the database
+    write lock. The rows are then written with one executemany per chunk
+    in a single transaction: either the whole list is imported or nothing
+    is.
+
+    Args:
+        file: Binary file-like object
+        file_name: Original file name
+        chunk_size: Rows per executemany batch
+
+    Returns:
+        tuple: (products, errors, skipped) where products is the list of
+        valid product dictionaries in file order, errors holds up to
+        MAX_REPORTED_ERRORS (line_number, message) tuples and skipped is
+        the total number of invalid rows
+    """
+    products = []
+    errors = []
+    skipped = 0
+    for line_number, name, rate in iter_price_list(file, file_name):
+        product, error = validate_row(name, rate)
+        if error:
+            skipped += 1
+            if len(errors) < MAX_REPORTED_ERRORS:
+                errors.append((line_number, error))
+            continue
+        products.append(product)
+
+    with transaction():
+        for start in range(0, len(products), chunk_size):
+            upsert_products(products[start:start + chunk_size])
+
+    invalidate_popular_products()
+    return products, errors, skipped
@@ -0,0 +1,315 @@
+"""Persistent background queue for PDF generation jobs
+
+submit_job() stores the request in the jobs table and returns its ID
+immediately. A small pool of worker threads claims queued jobs, renders
+the PDF, saves the report and stores the finished PDF with the job, so a
+heavy sheet never blocks the Streamlit session that asked for it. The UI
+polls get_job() and downloads the bytes with get_job_pdf().
+
+Several processes may share the jobs table. A claimed job records its
+owner and a heartbeat that the owning pool refreshes while the job runs;
+only claims whose heartbeat has gone stale (their process died) are put
+back in the queue.
+"""
+import io
+import json
+import logging
+import os
+import socket
+import threading
+import uuid
+import time
+from datetime import datetime
+
+from utils.audit import log_action
+from utils.connection import connection, transaction, get_pool
+from utils.database import init_db, save_report
+from utils.pdf_cache import generate_pdf_cached
+
+logger = logging.getLogger(__name__)
+
+JOB_WORKERS = 2
+# Seconds an idle worker waits before checking the table again
+JOB_POLL_INTERVAL = 1.0
+# Drafts larger than this are rendered page by page
+STREAMING_THRESHOLD = 500
+# Finished jobs (and their PDFs) are kept this long; sessions cache the bytes they showed
+JOB_RETENTION_DAYS = 1
+# Seconds between purges run by the worker pool
+JOB_PURGE_INTERVAL = 3600
+# Seconds between heartbeats of running jobs, and the age after which a claim is stale
+JOB_HEARTBEAT_INTERVAL = 10
+JOB_STALE_SECONDS = 60
+
+JOB_STATES = ('queued', 'running', 'done', 'failed')
+
+
+def init_jobs_db():
+    """Create the jobs table (once per process) and start the worker pool
+
+    Starting the workers here means jobs left in the queue by a previous
+    process are picked up without waiting for a new submission.
+    """
+    get_pool().run_once('jobs_schema', _create_jobs_schema)
+    job_pool.start()
+
+
+def _create_jobs_schema(c):
+    c.execute('''CREATE TABLE IF NOT EXISTS jobs
+                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                  status TEXT NOT NULL DEFAULT 'queued',
+                  start_date TEXT NOT NULL,
+                  end_date TEXT NOT NULL,
+                  brand_name TEXT NOT NULL,
+                  rate_label TEXT NOT NULL,
+                  products TEXT NOT NULL,
+                  product_count INTEGER NOT NULL,
+                  user_id INTEGER,
+                  username TEXT,
+                  report_id INTEGER,
+                  pdf BLOB,
+                  error TEXT,
+                  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                  started_at TIMESTAMP,
+                  finished_at TIMESTAMP)''')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, id)')
+    columns = [row[1] for row in c.execute('PRAGMA table_info(jobs)')]
+    if 'worker' not in columns:
+        c.execute('ALTER TABLE jobs ADD COLUMN worker TEXT')
+        c.execute('ALTER TABLE jobs ADD COLUMN heartbeat_at TIMESTAMP')
+    _requeue_stale_jobs(c)
+
+
+def _requeue_stale_jobs(conn):
+    """Queue again running jobs whose owner stopped sending heartbeats
+
+    Returns:
+        int: Number of jobs requeued
+    """
+    return conn.execute('''UPDATE jobs SET status = 'queued', started_at = NULL, worker = NULL,
+                                          heartbeat_at = NULL
+                           WHERE status = 'running'
+                           AND (heartbeat_at IS NULL OR heartbeat_at < datetime('now', ?))''',
+                        (f'-{JOB_STALE_SECONDS} seconds',)).rowcount
+
+
+def submit_job(start_date, end_date, brand_name, products, rate_label, user_id=1,
+               username=None):
+    """Queue a PDF generation request
+
+    Args:
+        start_date: Start date of the report period
+        end_date: End date of the report period
+        brand_name: Brand name for the report
+        products: List of product dictionaries with 'name' and 'rate' keys
+        rate_label: Custom label for the rate/discount column
+        user_id: Owner of the saved report
+        username: Acting user, recorded in the audit log
+
+    Returns:
+        int: Job ID
+    """
+    init_jobs_db()
+    with transaction() as conn:
+        job_id = conn.execute('''INSERT INTO jobs (start_date, end_date, brand_name, rate_label,
+                                                  products, product_count, user_id, username)
+                                 VALUES (?, ?, ?, ?, ?, ?, ?, ?)''',
+                              (start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d'),
+                               brand_name, rate_label, json.dumps(products), len(products),
+                               user_id, username)).lastrowid
+    job_pool.wake()
+    return job_id
+
+
+def get_job(job_id):
+    """Status of one job (without the PDF bytes)
+
+    Returns:
+        dict or None: id, status, brand_name, start_date, end_date,
+        product_count, report_id, error, created_at, started_at,
+        finished_at and size
+    """
+    init_jobs_db()
+    with connection() as conn:
+        row = conn.execute('''SELECT id, status, brand_name, start_date, end_date, product_count,
+                                     report_id, error, created_at, started_at, finished_at,
+                                     length(pdf)
+                              FROM jobs WHERE id = ?''', (job_id,)).fetchone()
+    if row is None:
+        return None
+    keys = ('id', 'status', 'brand_name', 'start_date', 'end_date', 'product_count',
+            'report_id', 'error', 'created_at', 'started_at', 'finished_at', 'size')
+    return dict(zip(keys, row))
+
+
+def get_job_pdf(job_id):
+    """Return the finished PDF bytes of a job, or None"""
+    init_jobs_db()
+    with connection() as conn:
+        row = conn.execute("SELECT pdf FROM jobs WHERE id = ? AND status = 'done'",
+                           (job_id,)).fetchone()
+    return row[0] if row else None
+
+
+def purge_jobs(older_than_days=JOB_RETENTION_DAYS):
+    """Delete finished and failed jobs (and their PDFs) older than the cutoff
+
+    Returns:
+        int: Number of jobs removed
+    """
+    init_jobs_db()
+    with transaction() as conn:
+        return conn.execute('''DELETE FROM jobs WHERE status IN ('done', 'failed')
+                               AND finished_at < datetime('now', ?)''',
+                            (f'-{int(older_than_days)} days',)).rowcount
+
+
+def _claim_job(owner):
+    """Mark the oldest queued job running for owner and return its row, or None"""
+    with transaction() as conn:
+        return conn.execute('''UPDATE jobs SET status = 'running', started_at = CURRENT_TIMESTAMP,
+                                             worker = ?, heartbeat_at = CURRENT_TIMESTAMP
+                               WHERE id = (SELECT id FROM jobs WHERE status = 'queued'
+                                           ORDER BY id LIMIT 1)
+                               RETURNING id, start_date, end_date, brand_name, rate_label,
+                                         products, user_id, username''', (owner,)).fetchone()
+
+
+def _run_job(row):
+    job_id, start, end, brand_name, rate_label, products_json, user_id, username = row
+    try:
+        start_date = datetime.strptime(start, '%Y-%m-%d')
+        end_date = datetime.strptime(end, '%Y-%m-%d')
+        products = json.loads(products_json)
+        if len(products) > STREAMING_THRESHOLD:
+            from utils.pdf_generator import generate_pdf_stream
+            buffer = io.BytesIO()
+            generate_pdf_stream(start_date, end_date, brand_name, products, rate_label, buffer)
+            pdf = buffer.getvalue()
+        else:
+            pdf = generate_pdf_cached(start_date, end_date, brand_name, products,
+                                      rate_label).getvalue()
+        init_db()
+        with transaction() as conn:
+            report_id = save_report(start_date, end_date, brand_name, products, user_id)
+            conn.execute('''UPDATE jobs SET status = 'done', report_id = ?, pdf = ?,
+                                            finished_at = CURRENT_TIMESTAMP
+                            WHERE id = ?''', (report_id, pdf, job_id))
+        log_action(username, 'GENERATE_REPORT',
+                   f"Report {report_id}: {brand_name}, {len(products)} products (job {job_id})")
+    except Exception as e:
+        logger.exception("PDF job %s failed", job_id)
+        try:
+            with transaction() as conn:
+                conn.execute('''UPDATE jobs SET status = 'failed', error = ?,
+                                                finished_at = CURRENT_TIMESTAMP
+                                WHERE id = ?''', (f"{type(e).__name__}: {e}", job_id))
+        except Exception:
+            logger.exception("Could not mark PDF job %s as failed", job_id)
+
+
+class JobWorkerPool:
+    """Worker threads that drain the jobs table"""
+
+    def __init__(self, workers=JOB_WORKERS, poll_interval=JOB_POLL_INTERVAL,
+                 purge_interval=JOB_PURGE_INTERVAL, heartbeat_interval=JOB_HEARTBEAT_INTERVAL):
+        """Initialize the pool (threads start with init_jobs_db)
+
+        Args:
+            workers: Number of worker threads
+            poll_interval: Seconds an idle worker sleeps between checks
+            purge_interval: Seconds between purges of old finished jobs
+            heartbeat_interval: Seconds between heartbeats of the jobs being run
+        """
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.purge_interval = purge_interval
+        self.heartbeat_interval = heartbeat_interval
+        # Identifies this pool's claims in the shared jobs table
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._active = set()
+        self._active_lock = threading.Lock()
+        self._next_purge = 0.0
+        self._purge_lock = threading.Lock()
+        self._threads = []
+        self._wakeup = threading.Condition()
+        self._start_lock = threading.Lock()
+
+    def start(self):
+        """Start the worker threads if they are not running yet"""
+        if self._threads:
+            return
+        with self._start_lock:
+            if self._threads:
+                return
+            get_pool().run_once('jobs_schema', _create_jobs_schema)
+            for index in range(self.workers):
+                thread = threading.Thread(target=self._run, name=f'pdf-job-worker-{index}',
+                                          daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            thread = threading.Thread(target=self._heartbeat, name='pdf-job-heartbeat',
+                                      daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def wake(self):
+        """Tell idle workers that a job was queued"""
+        with self._wakeup:
+            self._wakeup.notify()
+
+    def _maybe_purge(self):
+        """Purge old finished jobs if the purge interval has passed (one worker at a time)"""
+        now = time.monotonic()
+        if now < self._next_purge or not self._purge_lock.acquire(blocking=False):
+            return
+        try:
+            self._next_purge = now + self.purge_interval
+            purge_jobs()
+        except Exception:
+            pass
+        finally:
+            self._purge_lock.release()
+
+    def _heartbeat(self):
+        """Refresh the heartbeat of this pool's running jobs; requeue stale claims"""
+        while True:
+            time.sleep(self.heartbeat_interval)
+            try:
+                with self._active_lock:
+                    active = list(self._active)
+                with transaction() as conn:
+                    conn.executemany('''UPDATE jobs SET heartbeat_at = CURRENT_TIMESTAMP
+                                        WHERE id = ? AND worker = ? AND status = 'running'
+                                     ''',
+                                     [(job_id, self.owner) for job_id in active])
+                    _requeue_stale_jobs(conn)
+            except Exception:
+                logger.exception("PDF job heartbeat error")
+
+    def _idle_wait(self):
+        with self._wakeup:
+            self._wakeup.wait(self.poll_interval)
+
+    def _run(self):
+        # Never let an error (e.g. a locked database) end the thread: start() does not replace it
+        while True:
+            try:
+                row = _claim_job(self.owner)
+                if row is None:
+                    self._maybe_purge()
+                    self._idle_wait()
+                    continue
+                with self._active_lock:
+                    self._active.add(row[0])
+                try:
+                    _run_job(row)
+                finally:
+                    with self._active_lock:
+                        self._active.discard(row[0])
+            except Exception:
+                logger.exception("PDF job worker error")
+                self._idle_wait()
+
+
+job_pool = JobWorkerPool()
@@ -0,0 +1,272 @@
+"""Content-addressed cache for rendered Medghor PDFs"""
+import hashlib
+import io
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+from utils.connection import DB_PATH
+
+# Bump when the PDF layout changes so stale on-disk entries are not served
+CACHE_VERSION = 1
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_DISK_DIR = os.path.join(os.path.dirname(os.path.abspath(DB_PATH)),
+                                'pdf_cache')
+DEFAULT_DISK_MAX_BYTES = 256 * 1024 * 1024
+
+# The disk tier is opt-in: MEDGHOR_PDF_CACHE_DIR=<dir> (or "default" for
+# DEFAULT_DISK_DIR) enables it, MEDGHOR_PDF_CACHE_DISK_MB caps its size
+DISK_DIR_ENV = 'MEDGHOR_PDF_CACHE_DIR'
+DISK_MB_ENV = 'MEDGHOR_PDF_CACHE_DISK_MB'
+
+
+def make_cache_key(start_date, end_date, brand_name, products, rate_label,
+                   contact_number="1234567890"):
+    """Build a stable hash of everything that affects the rendered PDF
+
+    Args:
+        start_date: Start date of the report period
+        end_date: End date of the report period
+        brand_name: Brand name for the report
+        products: List of product dictionaries with 'name' and 'rate' keys
+        rate_label: Custom label for the rate/discount column
+        contact_number: Contact phone number
+
+    Returns:
+        str: Hex SHA-256 digest identifying the PDF
+    """
+    payload = json.dumps({
+        'version': CACHE_VERSION,
+        'start_date': start_date.strftime('%Y-%m-%d'),
+        'end_date': end_date.strftime('%Y-%m-%d'),
+        'brand_name': brand_name,
+        'products': [[p.get('name', 'N/A'), p.get('rate', 'N/A')] for p in products],
+        'rate_label': rate_label,
+        'contact_number': contact_number,
+    }, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class PDFCache:
+    """Two-tier PDF cache: in-memory LRU with a byte budget plus optional disk
+
+    The disk tier is an LRU with its own byte budget. Its index is built
+    from the directory (oldest mtime first) on first use; disk hits touch
+    the file so recently served PDFs are evicted last.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, disk_dir=None,
+                 disk_max_bytes=DEFAULT_DISK_MAX_BYTES):
+        """Initialize the cache
+
+        Args:
+            max_bytes: Byte budget for the in-memory tier
+            disk_dir: Directory for the on-disk tier, or None to disable it
+            disk_max_bytes: Byte budget for the on-disk tier
+        """
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self._disk_entries = None
+        self._disk_size = 0
+        self._disk_lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_evictions = 0
+
+    def get(self, key):
+        """Return cached PDF bytes for key, or None"""
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return data
+
+        data = self._read_disk(key)
+        if data is not None:
+            with self._lock:
+                self.disk_hits += 1
+                self._store(key, data)
+            return data
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, data):
+        """Store PDF bytes under key in both tiers"""
+        with self._lock:
+            self._store(key, data)
+        self._write_disk(key, data)
+
+    def get_or_render(self, start_date, end_date, brand_name, products, rate_label,
+                      contact_number="1234567890"):
+        """Return PDF bytes for the inputs, rendering only on a cache miss
+
+        Returns:
+            bytes: The rendered PDF
+        """
+        key = make_cache_key(start_date, end_date, brand_name, products,
+                             rate_label, contact_number)
+        data = self.get(key)
+        if data is None:
+            # Imported on first miss so ReportLab stays out of app startup
+            from utils.pdf_generator import generate_pdf
+            data = generate_pdf(start_date, end_date, brand_name, products,
+                                rate_label, contact_number).getvalue()
+            self.put(key, data)
+        return data
+
+    def stats(self):
+        """Return hit/miss/eviction counters and current memory and disk usage"""
+        with self._lock:
+            stats = {
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'bytes': self._size,
+                'max_bytes': self.max_bytes,
+            }
+        # The disk tier's index and counters are guarded by their own lock
+        with self._disk_lock:
+            stats.update({
+                'disk_evictions': self.disk_evictions,
+                'disk_entries': len(self._disk_entries or ()),
+                'disk_bytes': self._disk_size,
+                'disk_max_bytes': self.disk_max_bytes if self.disk_dir else 0,
+            })
+        return stats
+
+    def clear(self):
+        """Drop every in-memory entry (the disk tier is left untouched)"""
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def _store(self, key, data):
+        """Insert into the memory tier and evict LRU entries over budget"""
+        if len(data) > self.max_bytes:
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._size -= len(old)
+        self._entries[key] = data
+        self._size += len(data)
+        while self._size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._size -= len(evicted)
+            self.evictions += 1
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, key[:2], f"{key}.pdf")
+
+    def _load_disk_index(self):
+        """Build the disk LRU index from the directory (caller holds _disk_lock)"""
+        if self._disk_entries is not None:
+            return
+        found = []
+        try:
+            for shard in os.scandir(self.disk_dir):
+                if not shard.is_dir():
+                    continue
+                for entry in os.scandir(shard.path):
+                    if entry.name.endswith('.pdf'):
+                        stat = entry.stat()
+                        found.append((stat.st_mtime, entry.name[:-4], stat.st_size))
+        except OSError:
+            pass
+        found.sort()
+        self._disk_entries = OrderedDict((key, size) for _, key, size in found)
+        self._disk_size = sum(size for _, _, size in found)
+
+    def _read_disk(self, key):
+        if not self.disk_dir:
+            return None
+        with self._disk_lock:
+            self._load_disk_index()
+            if key not in self._disk_entries:
+                return None
+            path = self._disk_path(key)
+            try:
+                with open(path, 'rb') as file:
+                    data = file.read()
+                os.utime(path)
+            except OSError:
+                self._disk_size -= self._disk_entries.pop(key)
+                return None
+            self._disk_entries.move_to_end(key)
+            return data
+
+    def _write_disk(self, key, data):
+        """Write atomically so concurrent readers never see a partial file"""
+        if not self.disk_dir or len(data) > self.disk_max_bytes:
+            return
+        path = self._disk_path(key)
+        with self._disk_lock:
+            self._load_disk_index()
+            tmp_path = None
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+                with os.fdopen(fd, 'wb') as file:
+                    file.write(data)
+                os.replace(tmp_path, path)
+                tmp_path = None
+            except OSError:
+                return
+            finally:
+                # A failed write or rename must not leave the temp file behind
+                if tmp_path is not None:
+                    try:
+                        os.remove(tmp_path)
+                    except OSError:
+                        pass
+            self._disk_size += len(data) - self._disk_entries.pop(key, 0)
+            self._disk_entries[key] = len(data)
+            while self._disk_size > self.disk_max_bytes:
+                evicted, size = self._disk_entries.popitem(last=False)
+                self._disk_size -= size
+                self.disk_evictions += 1
+                try:
+                    os.remove(self._disk_path(evicted))
+                except OSError:
+                    pass
+
+
+def _disk_settings():
+    """Disk tier directory and byte budget from the environment (None: disabled)"""
+    disk_dir = os.environ.get(DISK_DIR_ENV, '').strip() or None
+    if disk_dir == 'default':
+        disk_dir = DEFAULT_DISK_DIR
+    try:
+        disk_max_bytes = int(float(os.environ[DISK_MB_ENV]) * 1024 * 1024)
+    except (KeyError, ValueError):
+        disk_max_bytes = DEFAULT_DISK_MAX_BYTES
+    return disk_dir, disk_max_bytes
+
+
+# Process-wide cache shared by every Streamlit session
+_disk_dir, _disk_max_bytes = _disk_settings()
+pdf_cache = PDFCache(disk_dir=_disk_dir, disk_max_bytes=_disk_max_bytes)
+
+
+def generate_pdf_cached(start_date, end_date, brand_name, products, rate_label,
+                        contact_number="1234567890"):
+    """Drop-in replacement for generate_pdf that goes through the shared cache
+
+    Returns:
+        BytesIO buffer containing the generated PDF
+    """
+    return io.BytesIO(pdf_cache.get_or_render(start_date, end_date, brand_name,
+                                              products, rate_label, contact_number))
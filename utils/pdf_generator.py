@@ -2,10 +2,15 @@
 from reportlab.lib.pagesizes import A4
 from reportlab.lib import colors
 from reportlab.lib.units import inch
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+from reportlab.platypus import (SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak,
+                                Flowable)
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.enums import TA_CENTER, TA_LEFT
+from xml.sax.saxutils import escape
+from functools import lru_cache
+from itertools import chain
 import io
+from utils.tracing import span
 
 
 class ColorPalette:
@@ -19,9 +24,13 @@ class ColorPalette:
 
 
 class PDFStyles:
-    """Centralized style definitions"""
+    """Centralized style definitions
+    
+    Styles are built once per process and shared by every render.
+    """
     
     @staticmethod
+    @lru_cache(maxsize=None)
     def get_title_style():
         """Style for main title"""
         return ParagraphStyle(
@@ -35,6 +44,7 @@ class PDFStyles:
         )
     
     @staticmethod
+    @lru_cache(maxsize=None)
     def get_brand_style():
         """Style for brand name"""
         return ParagraphStyle(
@@ -47,9 +57,92 @@ class PDFStyles:
         )
 
 
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def get_contents_style():
+        """Style for brand links in the table of contents"""
+        return ParagraphStyle(
+            'ContentsStyle',
+            fontName='Helvetica',
+            fontSize=10,
+            textColor=ColorPalette.TEXT_BLACK,
+            alignment=TA_LEFT
+        )
+
+
+class TableTemplates:
+    """Static table style commands, compiled once per process"""
+    
+    TITLE = TableStyle([
+        ('BACKGROUND', (0, 0), (-1, -1), ColorPalette.PRIMARY_ORANGE),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ('TOPPADDING', (0, 0), (-1, -1), 15),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 15),
+        ('LEFTPADDING', (0, 0), (-1, -1), 10),
+        ('RIGHTPADDING', (0, 0), (-1, -1), 10),
+        ('BOX', (0, 0), (-1, -1), 2, ColorPalette.TEXT_BLACK),
+    ])
+    
+    BRAND = TableStyle([
+        ('BACKGROUND', (0, 0), (-1, -1), ColorPalette.LIGHT_ORANGE),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ('TOPPADDING', (0, 0), (-1, -1), 10),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 10),
+        ('BOX', (0, 0), (-1, -1), 1, ColorPalette.TEXT_BLACK),
+    ])
+    
+    # Same size for any number of rows: zebra stripes come from ROWBACKGROUNDS
+    PRODUCT = TableStyle([
+        # Header row styling
+        ('BACKGROUND', (0, 0), (-1, 0), ColorPalette.HEADER_GRAY),
+        ('TEXTCOLOR', (0, 0), (-1, 0), ColorPalette.TEXT_BLACK),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 11),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('TOPPADDING', (0, 0), (-1, 0), 12),
+        
+        # Data rows styling
+        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+        ('FONTSIZE', (0, 1), (-1, -1), 10),
+        ('TOPPADDING', (0, 1), (-1, -1), 8),
+        ('BOTTOMPADDING', (0, 1), (-1, -1), 8),
+        
+        # Alignment
+        ('ALIGN', (0, 0), (0, -1), 'CENTER'),  # Serial number column
+        ('ALIGN', (1, 0), (1, -1), 'LEFT'),    # Product name column
+        ('ALIGN', (2, 0), (2, -1), 'CENTER'),  # Rate column
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        
+        # Borders
+        ('GRID', (0, 0), (-1, -1), 1, ColorPalette.TEXT_BLACK),
+        ('LINEBELOW', (0, 0), (-1, 0), 2, ColorPalette.TEXT_BLACK),
+        
+        # Alternate row colors for better readability
+        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [ColorPalette.WHITE, ColorPalette.ALT_ROW_GRAY]),
+    ])
+    
+    # Product table layout with centered item counts and right-aligned page numbers
+    CONTENTS = TableStyle([
+        ('ALIGN', (2, 0), (2, -1), 'CENTER'),  # Items column
+        ('ALIGN', (3, 0), (3, -1), 'RIGHT'),   # Page column
+    ], parent=PRODUCT)
+    
+    # Column widths: Serial (0.5"), Product Name (5"), Rate (1.5")
+    PRODUCT_COL_WIDTHS = [0.5*inch, 5*inch, 1.5*inch]
+    
+    # Column widths: Serial (0.5"), Brand (4.5"), Items (1"), Page (1")
+    CONTENTS_COL_WIDTHS = [0.5*inch, 4.5*inch, 1*inch, 1*inch]
+
+
 def create_title_section(start_date, end_date, contact_number="1234567890"):
     """Create formatted title section with orange background
     
+    Built fresh for every render: flowables keep per-draw state (drawOn sets
+    self.canv), so they must not be shared between concurrent renders. Only
+    the styles are cached.
+    
     Args:
         start_date: Start date of the report period
         end_date: End date of the report period
@@ -67,25 +160,14 @@ def create_title_section(start_date, end_date, contact_number="1234567890"):
     )
     
     title = Paragraph(title_text, title_style)
-    title_table = Table([[title]], colWidths=[7.5*inch])
-    
-    title_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, -1), ColorPalette.PRIMARY_ORANGE),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ('TOPPADDING', (0, 0), (-1, -1), 15),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 15),
-        ('LEFTPADDING', (0, 0), (-1, -1), 10),
-        ('RIGHTPADDING', (0, 0), (-1, -1), 10),
-        ('BOX', (0, 0), (-1, -1), 2, ColorPalette.TEXT_BLACK),
-    ]))
-    
-    return title_table
+    return Table([[title]], colWidths=[7.5*inch], style=TableTemplates.TITLE)
 
 
 def create_brand_section(brand_name):
     """Create formatted brand name section
     
+    Built fresh for every render (see create_title_section).
+    
     Args:
         brand_name: Brand name to display
     
@@ -94,18 +176,7 @@ def create_brand_section(brand_name):
     """
     brand_style = PDFStyles.get_brand_style()
     brand = Paragraph(brand_name, brand_style)
-    brand_table = Table([[brand]], colWidths=[7.5*inch])
-    
-    brand_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, -1), ColorPalette.LIGHT_ORANGE),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ('TOPPADDING', (0, 0), (-1, -1), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 10),
-        ('BOX', (0, 0), (-1, -1), 1, ColorPalette.TEXT_BLACK),
-    ]))
-    
-    return brand_table
+    return Table([[brand]], colWidths=[7.5*inch], style=TableTemplates.BRAND)
 
 
 def create_product_table(products, rate_label):
@@ -120,52 +191,13 @@ def create_product_table(products, rate_label):
     """
     # Prepare table data
     data = [['SL', 'PRODUCT NAME', rate_label.upper()]]
+    data.extend(
+        [str(idx), product.get('name', 'N/A'), product.get('rate', 'N/A')]
+        for idx, product in enumerate(products, 1)
+    )
     
-    for idx, product in enumerate(products, 1):
-        data.append([
-            str(idx),
-            product.get('name', 'N/A'),
-            product.get('rate', 'N/A')
-        ])
-    
-    # Column widths: Serial (0.5"), Product Name (5"), Rate (1.5")
-    col_widths = [0.5*inch, 5*inch, 1.5*inch]
-    product_table = Table(data, colWidths=col_widths, repeatRows=1)
-    
-    # Base table styling
-    table_style = [
-        # Header row styling
-        ('BACKGROUND', (0, 0), (-1, 0), ColorPalette.HEADER_GRAY),
-        ('TEXTCOLOR', (0, 0), (-1, 0), ColorPalette.TEXT_BLACK),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 11),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('TOPPADDING', (0, 0), (-1, 0), 12),
-        
-        # Data rows styling
-        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 1), (-1, -1), 10),
-        ('TOPPADDING', (0, 1), (-1, -1), 8),
-        ('BOTTOMPADDING', (0, 1), (-1, -1), 8),
-        
-        # Alignment
-        ('ALIGN', (0, 0), (0, -1), 'CENTER'),  # Serial number column
-        ('ALIGN', (1, 0), (1, -1), 'LEFT'),    # Product name column
-        ('ALIGN', (2, 0), (2, -1), 'CENTER'),  # Rate column
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        
-        # Borders
-        ('GRID', (0, 0), (-1, -1), 1, ColorPalette.TEXT_BLACK),
-        ('LINEBELOW', (0, 0), (-1, 0), 2, ColorPalette.TEXT_BLACK),
-    ]
-    
-    # Alternate row colors for better readability
-    for i in range(1, len(data)):
-        bg_color = ColorPalette.ALT_ROW_GRAY if i % 2 == 0 else ColorPalette.WHITE
-        table_style.append(('BACKGROUND', (0, i), (-1, i), bg_color))
-    
-    product_table.setStyle(TableStyle(table_style))
-    return product_table
+    return Table(data, colWidths=TableTemplates.PRODUCT_COL_WIDTHS, repeatRows=1,
+                 style=TableTemplates.PRODUCT)
 
 
 def generate_pdf(start_date, end_date, brand_name, products, rate_label, 
@@ -205,29 +237,321 @@ def generate_pdf(start_date, end_date, brand_name, products, rate_label,
     elements = []
     
     # Add title section
-    title_table = create_title_section(start_date, end_date, contact_number)
+    with span('pdf.title'):
+        title_table = create_title_section(start_date, end_date, contact_number)
     elements.append(title_table)
     elements.append(Spacer(1, 0.2*inch))
     
     # Add brand section
-    brand_table = create_brand_section(brand_name)
+    with span('pdf.brand'):
+        brand_table = create_brand_section(brand_name)
     elements.append(brand_table)
     elements.append(Spacer(1, 0.15*inch))
     
     # Add product table
-    product_table = create_product_table(products, rate_label)
+    with span('pdf.product_table') as table_span:
+        product_table = create_product_table(products, rate_label)
+        table_span.rows = len(products)
     elements.append(product_table)
     
     # Add footer spacer
     elements.append(Spacer(1, 0.3*inch))
     
     # Build PDF
-    doc.build(elements)
+    with span('pdf.build') as build_span:
+        doc.build(elements)
+        build_span.size = buffer.tell()
     buffer.seek(0)
     
     return buffer
 
 
+class _FlowableStream(list):
+    """List of flowables that is refilled lazily from an iterator
+    
+    doc.build() consumes flowables from the front of a list and checks
+    len() before every step, so topping up a small buffer there lets
+    ReportLab lay out an arbitrarily long iterator while only a few
+    flowables exist at a time.
+    """
+    
+    def __init__(self, iterable, buffer_size=4):
+        super().__init__()
+        self._source = iter(iterable)
+        self._buffer_size = buffer_size
+    
+    def __len__(self):
+        while self._source is not None and list.__len__(self) < self._buffer_size:
+            try:
+                self.append(next(self._source))
+            except StopIteration:
+                self._source = None
+        return list.__len__(self)
+
+
+def _table_height(table):
+    return table.wrap(0, 0)[1]
+
+
+def _rows_per_chunk(available_height, rate_label):
+    """Number of product rows (always even) that fit below one table header"""
+    one_row = _table_height(create_product_table([{}], rate_label))
+    two_rows = _table_height(create_product_table([{}, {}], rate_label))
+    row_height = two_rows - one_row
+    header_height = one_row - row_height
+    # Keep one row of slack and an even count so zebra stripes stay continuous
+    rows = int((available_height - header_height) // row_height) - 1
+    return max(2, rows - rows % 2)
+
+
+def _stream_flowables(title_table, brand_table, first_product, products, rate_label,
+                      first_page_rows, page_rows):
+    """Yield header flowables followed by one product table per page"""
+    yield title_table
+    yield Spacer(1, 0.2*inch)
+    yield brand_table
+    yield Spacer(1, 0.15*inch)
+    
+    serial = 1
+    for chunk in _iter_page_chunks(chain([first_product], products), first_page_rows, page_rows):
+        if serial > 1:
+            yield PageBreak()
+        yield _create_product_chunk(chunk, rate_label, serial)
+        serial += len(chunk)
+    
+    yield Spacer(1, 0.3*inch)
+
+
+def _iter_page_chunks(products, first_page_rows, page_rows):
+    """Split products into per-page lists: first_page_rows, then page_rows each"""
+    chunk = []
+    limit = first_page_rows
+    for product in products:
+        chunk.append(product)
+        if len(chunk) == limit:
+            yield chunk
+            chunk = []
+            limit = page_rows
+    if chunk:
+        yield chunk
+
+
+def _create_product_chunk(products, rate_label, first_serial):
+    """Product table for one page, numbered from first_serial"""
+    data = [['SL', 'PRODUCT NAME', rate_label.upper()]]
+    data.extend(
+        [str(idx), product.get('name', 'N/A'), product.get('rate', 'N/A')]
+        for idx, product in enumerate(products, first_serial)
+    )
+    return Table(data, colWidths=TableTemplates.PRODUCT_COL_WIDTHS, repeatRows=1,
+                 style=TableTemplates.PRODUCT)
+
+
+def generate_pdf_stream(start_date, end_date, brand_name, products, rate_label, output,
+                        contact_number="1234567890"):
+    """Generate a focus item report for very large catalogs
+    
+    Products may be any iterable (e.g. rows straight from a database
+    cursor). The product table is emitted one page at a time and ReportLab
+    only ever holds a handful of flowables, so memory for the layout stays
+    bounded however many rows there are.
+    
+    Args:
+        start_date: Start date of the report period
+        end_date: End date of the report period
+        brand_name: Brand name for the report
+        products: Iterable of product dictionaries with 'name' and 'rate' keys
+        rate_label: Custom label for the rate/discount column
+        output: File name or writable binary stream to write the PDF to
+        contact_number: Contact phone number (default: "1234567890")
+    
+    Raises:
+        ValueError: If products is empty
+    """
+    products = iter(products)
+    first_product = next(products, None)
+    if first_product is None:
+        raise ValueError("Products list cannot be empty")
+    
+    doc = SimpleDocTemplate(
+        output,
+        pagesize=A4,
+        rightMargin=0.5*inch,
+        leftMargin=0.5*inch,
+        topMargin=0.5*inch,
+        bottomMargin=0.5*inch,
+        title=f"Medghor Offer - {brand_name}",
+        author="Medghor",
+        pageCompression=1
+    )
+    
+    # Frame padding is 6pt on each side
+    frame_height = doc.height - 12
+    title_table = create_title_section(start_date, end_date, contact_number)
+    brand_table = create_brand_section(brand_name)
+    header_height = (_table_height(title_table) + 0.2*inch +
+                     _table_height(brand_table) + 0.15*inch)
+    
+    flowables = _stream_flowables(
+        title_table, brand_table, first_product, products, rate_label,
+        first_page_rows=_rows_per_chunk(frame_height - header_height, rate_label),
+        page_rows=_rows_per_chunk(frame_height, rate_label)
+    )
+    with span('pdf.stream_build'):
+        doc.build(_FlowableStream(flowables))
+
+
+class _SectionAnchor(Flowable):
+    """Zero-size flowable marking a section start for links and the PDF outline"""
+    
+    def __init__(self, key, title):
+        super().__init__()
+        self.key = key
+        self.title = title
+    
+    def wrap(self, available_width, available_height):
+        return 0, 0
+    
+    def draw(self):
+        self.canv.bookmarkPage(self.key)
+        self.canv.addOutlineEntry(self.title, self.key, level=0)
+
+
+def _count_pages(flowable, width, first_height, frame_height):
+    """Pages a splittable flowable occupies when it starts with first_height left"""
+    pages = 1
+    available = first_height
+    while flowable.wrap(width, available)[1] > available:
+        parts = flowable.split(width, available)
+        if len(parts) < 2:
+            available = frame_height
+            pages += 1
+            continue
+        flowable = parts[-1]
+        available = frame_height
+        pages += 1
+    return pages
+
+
+def create_contents_table(sections, page_numbers):
+    """Create the table of contents listing each section with its first page
+    
+    Args:
+        sections: List of (brand_name, products, rate_label) tuples
+        page_numbers: First page of each section
+    
+    Returns:
+        Table object; brand names link to their sections
+    """
+    link_style = PDFStyles.get_contents_style()
+    data = [['SL', 'BRAND', 'ITEMS', 'PAGE']]
+    data.extend(
+        [str(idx), Paragraph(f'<a href="#section{idx}">{escape(brand_name)}</a>', link_style),
+         str(len(products)), str(page)]
+        for idx, ((brand_name, products, _), page) in enumerate(zip(sections, page_numbers), 1)
+    )
+    return Table(data, colWidths=TableTemplates.CONTENTS_COL_WIDTHS, repeatRows=1,
+                 style=TableTemplates.CONTENTS)
+
+
+def generate_multi_brand_pdf(start_date, end_date, sections, contact_number="1234567890",
+                             table_of_contents=True):
+    """Generate one document with a section per brand in a single build pass
+    
+    The title header is shared, every section starts on a new page with its
+    brand header, and product tables are cut into per-page chunks exactly
+    like generate_pdf_stream. Because the page breaks are decided here, the
+    first page of each section is known before layout, so the table of
+    contents gets its page numbers without a second doc.build pass.
+    
+    Args:
+        start_date: Start date of the report period
+        end_date: End date of the report period
+        sections: List of (brand_name, products, rate_label) tuples
+        contact_number: Contact phone number (default: "1234567890")
+        table_of_contents: Add a contents table after the title
+    
+    Returns:
+        BytesIO buffer containing the generated PDF
+    
+    Raises:
+        ValueError: If there are no sections or a section has no products
+    """
+    sections = [(brand_name, list(products), rate_label)
+                for brand_name, products, rate_label in sections]
+    if not sections:
+        raise ValueError("At least one section is required")
+    for brand_name, products, _ in sections:
+        if not products:
+            raise ValueError(f"Products list for '{brand_name}' cannot be empty")
+    
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(
+        buffer,
+        pagesize=A4,
+        rightMargin=0.5*inch,
+        leftMargin=0.5*inch,
+        topMargin=0.5*inch,
+        bottomMargin=0.5*inch,
+        title=f"Medghor Offer - {len(sections)} brands",
+        author="Medghor",
+        pageCompression=1
+    )
+    
+    # Frame padding is 6pt on each side
+    frame_height = doc.height - 12
+    frame_width = doc.width - 12
+    title_table = create_title_section(start_date, end_date, contact_number)
+    title_height = _table_height(title_table) + 0.2*inch
+    
+    with span('pdf.multi_layout') as layout_span:
+        # Split every section into pages up front
+        section_chunks = []
+        section_start_height = frame_height if table_of_contents else frame_height - title_height
+        for brand_name, products, rate_label in sections:
+            brand_height = _table_height(create_brand_section(brand_name)) + 0.15*inch
+            section_chunks.append(list(_iter_page_chunks(
+                products,
+                _rows_per_chunk(section_start_height - brand_height, rate_label),
+                _rows_per_chunk(frame_height, rate_label))))
+            section_start_height = frame_height
+        
+        page_numbers = []
+        if table_of_contents:
+            # Page numbers do not change the contents table height, so count with placeholders
+            placeholder = create_contents_table(sections, [0] * len(sections))
+            next_page = 1 + _count_pages(placeholder, frame_width,
+                                         frame_height - title_height, frame_height)
+        else:
+            next_page = 1
+        for chunks in section_chunks:
+            page_numbers.append(next_page)
+            next_page += len(chunks)
+        layout_span.rows = sum(len(products) for _, products, _ in sections)
+    
+    elements = [title_table, Spacer(1, 0.2*inch)]
+    if table_of_contents:
+        elements.append(create_contents_table(sections, page_numbers))
+    for idx, ((brand_name, _, rate_label), chunks) in enumerate(zip(sections, section_chunks), 1):
+        if table_of_contents or idx > 1:
+            elements.append(PageBreak())
+        elements.append(_SectionAnchor(f'section{idx}', brand_name))
+        elements.append(create_brand_section(brand_name))
+        elements.append(Spacer(1, 0.15*inch))
+        serial = 1
+        for chunk in chunks:
+            if serial > 1:
+                elements.append(PageBreak())
+            elements.append(_create_product_chunk(chunk, rate_label, serial))
+            serial += len(chunk)
+    
+    with span('pdf.multi_build') as build_span:
+        doc.build(elements)
+        build_span.size = buffer.tell()
+    buffer.seek(0)
+    
+    return buffer
+
 # Example usage
 if __name__ == "__main__":
     from datetime import datetime
@@ -0,0 +1,135 @@
+"""Structured parsing of free-text offer rates
+
+Operators type rates like "39/- NET", "15% @ 9+1", "₹245" or "10+1".
+parse_rate() splits them into numeric fields that are stored next to the
+text in report_items and products, so price and discount questions become
+indexed SQL range queries.
+
+Usage:
+    python -m utils.rates --backfill     # re-parse every stored rate
+    python -m utils.rates "15% @ 9+1"    # show how a rate is parsed
+"""
+import argparse
+import re
+import sys
+from functools import lru_cache
+
+# Order of the parsed fields everywhere they are stored or returned
+RATE_FIELDS = ('net_price', 'discount_pct', 'scheme_buy', 'scheme_free')
+
+# Bump whenever parse_rate() changes so stored fields are re-parsed at startup
+RATE_PARSER_VERSION = 2
+
+# Digits with optional thousands separators (1,250 and Indian 1,25,000) and decimals
+_NUMBER = r'((?<![\d,.])\d{1,3}(?:,\d{2,3})+(?:\.\d+)?(?![\d,])|\d+(?:\.\d+)?)'
+_CURRENCY = r'(?:₹|\brs\.?|\binr\b)'
+_DISCOUNT = re.compile(_NUMBER + r'\s*%')
+_SCHEME = re.compile(r'(?<![\d.,])(\d+)\s*\+\s*(\d+)(?![\d.,])')
+# The printed MRP is not the offer price; remove it before looking for one
+_MRP = re.compile(r'\bmrp\b\s*[:.=-]?\s*(?:' + _CURRENCY + r'\s*)?' + _NUMBER + r'(?:\s*/-)?',
+                  re.IGNORECASE)
+_PRICE_PATTERNS = (
+    re.compile(_CURRENCY + r'\s*' + _NUMBER, re.IGNORECASE),              # ₹245, Rs. 1,499
+    re.compile(_NUMBER + r'\s*/-'),                                        # 39/-
+    re.compile(_NUMBER + r'\s*(?:net|ptr|nett)\b', re.IGNORECASE),         # 39 NET
+    re.compile(r'\b(?:net|ptr|nett)\s*' + _NUMBER, re.IGNORECASE),         # NET 39
+    re.compile(r'@\s*' + _NUMBER + r'(?![\d,.]|\s*%)'),                    # @ 45
+)
+_BARE_NUMBER = re.compile(r'^\s*' + _NUMBER + r'\s*$')
+
+
+def _to_float(number):
+    return float(number.replace(',', ''))
+
+
+@lru_cache(maxsize=4096)
+def parse_rate(text):
+    """Split a rate string into (net_price, discount_pct, scheme_buy, scheme_free)
+
+    Fields that are not present are None, e.g. "15% @ 9+1" gives
+    (None, 15.0, 9, 1) and "39/- NET" gives (39.0, None, None, None).
+    """
+    if not text:
+        return None, None, None, None
+    text = str(text)
+
+    discount = _DISCOUNT.search(text)
+    discount_pct = _to_float(discount.group(1)) if discount else None
+
+    scheme = _SCHEME.search(text)
+    scheme_buy = scheme_free = None
+    if scheme:
+        scheme_buy, scheme_free = int(scheme.group(1)), int(scheme.group(2))
+        text = text[:scheme.start()] + ' ' + text[scheme.end():]
+
+    net_price = None
+    text = _MRP.sub(' ', text)
+    if discount:
+        # Keep the percentage from being read as a price
+        text = _DISCOUNT.sub(' ', text)
+    for pattern in _PRICE_PATTERNS:
+        match = pattern.search(text)
+        if match:
+            net_price = _to_float(match.group(1))
+            break
+    else:
+        match = _BARE_NUMBER.match(text)
+        if match and not scheme and not discount:
+            net_price = _to_float(match.group(1))
+
+    return net_price, discount_pct, scheme_buy, scheme_free
+
+
+def rate_field(text, index):
+    """SQL helper: one parsed field of a rate (registered as rate_field(rate, i))"""
+    return parse_rate(text)[index]
+
+
+def backfill_rate_fields(conn):
+    """Re-parse every stored rate into the numeric columns
+
+    Runs as set-based UPDATEs through the rate_field() SQL function; each
+    distinct rate string is parsed once thanks to the parse_rate cache.
+    Records RATE_PARSER_VERSION as the version of the stored fields.
+    """
+    stored_parser_version(conn)
+    assignments = ', '.join(f'{field} = rate_field(rate, {i})' for i, field in enumerate(RATE_FIELDS))
+    conn.execute(f'UPDATE report_items SET {assignments}')
+    last_assignments = ', '.join(f'last_{field} = rate_field(last_rate, {i})'
+                                 for i, field in enumerate(RATE_FIELDS))
+    conn.execute(f'UPDATE products SET {last_assignments}')
+    conn.execute('DELETE FROM rate_parser_state')
+    conn.execute('INSERT INTO rate_parser_state (version) VALUES (?)', (RATE_PARSER_VERSION,))
+
+
+def stored_parser_version(conn):
+    """Parser version the stored rate fields were computed with (0 if unknown)"""
+    conn.execute('CREATE TABLE IF NOT EXISTS rate_parser_state (version INTEGER NOT NULL)')
+    row = conn.execute('SELECT version FROM rate_parser_state').fetchone()
+    return row[0] if row else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Parse offer rates into numeric fields")
+    parser.add_argument('rates', nargs='*', help="Rate strings to parse and print")
+    parser.add_argument('--backfill', action='store_true',
+                        help="Re-parse every rate stored in the database")
+    args = parser.parse_args(argv)
+
+    for rate in args.rates:
+        print(rate, dict(zip(RATE_FIELDS, parse_rate(rate))))
+    if args.backfill:
+        from utils.analytics import rebuild_analytics
+        from utils.connection import transaction
+        from utils.database import init_db
+        init_db()
+        with transaction() as conn:
+            backfill_rate_fields(conn)
+            # The weekly averages are built from the parsed fields
+            rebuild_analytics()
+        print("Rate fields backfilled and analytics rebuilt")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,222 @@
+"""Server-side login sessions and login rate limiting
+
+Sessions are opaque random tokens. Only their SHA-256 digest is stored in
+user_sessions, so a copy of the database cannot be replayed as a login.
+Validated tokens are cached in memory for a short TTL, so checking the
+session on every Streamlit rerun does not touch SQLite. Expired rows are
+swept periodically by whichever call notices the sweep is due.
+
+components.login signs users in through login(), checking passwords
+against the credentials file (utils.auth.authenticate_credentials).
+"""
+import collections
+import hashlib
+import secrets
+import threading
+import time
+
+from utils.connection import connection, transaction
+from utils.database import authenticate_user, init_auth_db
+
+SESSION_TTL_SECONDS = 12 * 3600
+VALIDATION_CACHE_TTL = 60
+# Live sessions kept in the validation cache; the least recently used go first
+VALIDATION_CACHE_SIZE = 10000
+SWEEP_INTERVAL = 600
+
+# Sliding-window login limits, checked before the password is hashed
+RATE_LIMIT_WINDOW = 15 * 60
+MAX_FAILURES_PER_USERNAME = 5
+MAX_ATTEMPTS_PER_IP = 30
+
+_cache = collections.OrderedDict()
+_cache_lock = threading.Lock()
+_next_sweep = 0.0
+
+
+def _digest(token):
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+class LoginRateLimiter:
+    """In-memory sliding-window counters keyed by username and client IP"""
+
+    def __init__(self, window=RATE_LIMIT_WINDOW, max_failures=MAX_FAILURES_PER_USERNAME,
+                 max_attempts=MAX_ATTEMPTS_PER_IP):
+        """Initialize the limiter
+
+        Args:
+            window: Window length in seconds
+            max_failures: Failed logins allowed per username within the window
+            max_attempts: Login attempts allowed per IP within the window
+        """
+        self.window = window
+        self.max_failures = max_failures
+        self.max_attempts = max_attempts
+        self._failures = collections.defaultdict(collections.deque)
+        self._attempts = collections.defaultdict(collections.deque)
+        self._lock = threading.Lock()
+
+    def _trim(self, events, now):
+        while events and events[0] <= now - self.window:
+            events.popleft()
+
+    def retry_after(self, username, ip=None):
+        """Seconds until another attempt is allowed (0 when allowed now)"""
+        now = time.monotonic()
+        waits = [0.0]
+        with self._lock:
+            for events, limit in ((self._failures.get(username.lower()), self.max_failures),
+                                  (self._attempts.get(ip) if ip else None, self.max_attempts)):
+                if events is None:
+                    continue
+                self._trim(events, now)
+                if len(events) >= limit:
+                    waits.append(events[len(events) - limit] + self.window - now)
+        return max(waits)
+
+    def record_attempt(self, username, ip=None, success=False):
+        """Count one login attempt; a success clears the username's failures"""
+        now = time.monotonic()
+        with self._lock:
+            if ip:
+                self._attempts[ip].append(now)
+            if success:
+                self._failures.pop(username.lower(), None)
+            else:
+                self._failures[username.lower()].append(now)
+
+    def prune(self):
+        """Forget keys with no events inside the window"""
+        now = time.monotonic()
+        with self._lock:
+            for table in (self._failures, self._attempts):
+                for key in list(table):
+                    self._trim(table[key], now)
+                    if not table[key]:
+                        del table[key]
+
+
+rate_limiter = LoginRateLimiter()
+
+
+def login(username, password, ip=None, authenticate=authenticate_user):
+    """Check credentials and issue a session token
+
+    Rate limits are checked first, so throttled attempts never reach the
+    password check or the database.
+
+    Args:
+        username: Login name
+        password: Plain-text password
+        ip: Client address used for per-IP limiting, if known
+        authenticate: Callable (username, password) -> (success, user dict)
+
+    Returns:
+        tuple: (token or None, user dict or None, error message or None)
+    """
+    wait = rate_limiter.retry_after(username, ip)
+    if wait > 0:
+        return None, None, f"Too many login attempts. Try again in {int(wait) + 1} seconds"
+
+    init_auth_db()
+    success, user = authenticate(username, password)
+    rate_limiter.record_attempt(username, ip, success)
+    if not success:
+        return None, None, "Username/password is incorrect"
+    if not user['is_active']:
+        return None, None, "This account is disabled"
+    return create_session(user['id']), user, None
+
+
+def create_session(user_id, ttl=SESSION_TTL_SECONDS):
+    """Store a new session for user_id and return its token"""
+    _maybe_sweep()
+    token = secrets.token_urlsafe(32)
+    with transaction() as conn:
+        conn.execute('''INSERT INTO user_sessions (user_id, session_token, expires_at)
+                        VALUES (?, ?, datetime('now', ?))''',
+                     (user_id, _digest(token), f'+{int(ttl)} seconds'))
+    return token
+
+
+def validate_session(token):
+    """Return the user dict for a live session token, or None
+
+    Live sessions are cached for VALIDATION_CACHE_TTL seconds, never
+    beyond their own expiry. Unknown tokens are not cached, so random
+    tokens cannot grow the cache.
+    """
+    if not token:
+        return None
+    digest = _digest(token)
+    now = time.time()
+    with _cache_lock:
+        entry = _cache.get(digest)
+        if entry is not None and entry[0] > now:
+            _cache.move_to_end(digest)
+            return entry[1]
+
+    _maybe_sweep()
+    init_auth_db()
+    with connection() as conn:
+        row = conn.execute('''SELECT u.id, u.username, u.email, u.full_name, u.role,
+                                     CAST(strftime('%s', s.expires_at) AS INTEGER)
+                              FROM user_sessions s JOIN users u ON u.id = s.user_id
+                              WHERE s.session_token = ? AND s.expires_at > datetime('now')
+                                AND u.is_active = 1''', (digest,)).fetchone()
+    if row is None:
+        return None
+    user = {'id': row[0], 'username': row[1], 'email': row[2],
+            'full_name': row[3], 'role': row[4]}
+    with _cache_lock:
+        _cache[digest] = (min(now + VALIDATION_CACHE_TTL, row[5]), user)
+        _cache.move_to_end(digest)
+        while len(_cache) > VALIDATION_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return user
+
+
+def revoke_session(token):
+    """Log a session out"""
+    digest = _digest(token)
+    with _cache_lock:
+        _cache.pop(digest, None)
+    with transaction() as conn:
+        conn.execute('DELETE FROM user_sessions WHERE session_token = ?', (digest,))
+
+
+def revoke_user_sessions(user_id):
+    """Log a user out everywhere (e.g. after a password change)"""
+    with transaction() as conn:
+        conn.execute('DELETE FROM user_sessions WHERE user_id = ?', (user_id,))
+    with _cache_lock:
+        _cache.clear()
+
+
+def sweep_expired_sessions():
+    """Delete expired sessions and stale cache/limiter entries
+
+    Returns:
+        int: Number of session rows removed
+    """
+    now = time.time()
+    with _cache_lock:
+        for digest in [d for d, (until, _) in _cache.items() if until <= now]:
+            del _cache[digest]
+    rate_limiter.prune()
+    init_auth_db()
+    with transaction() as conn:
+        return conn.execute("DELETE FROM user_sessions WHERE expires_at <= datetime('now')").rowcount
+
+
+def _maybe_sweep():
+    global _next_sweep
+    now = time.time()
+    if now < _next_sweep:
+        return
+    with _cache_lock:
+        if now < _next_sweep:
+            return
+        _next_sweep = now + SWEEP_INTERVAL
+    sweep_expired_sessions()
@@ -0,0 +1,236 @@
+"""Lightweight latency tracing for database calls and PDF stages
+
+Tracing is off by default. While disabled, traced functions and spans cost
+one flag check; when enabled they record a latency histogram, row counts
+and output byte sizes per operation, which can be read with snapshot() or
+exported with prometheus_text().
+"""
+import functools
+import inspect
+import threading
+import time
+
+# Histogram bucket upper bounds in seconds
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_enabled = False
+_lock = threading.Lock()
+_metrics = {}
+
+
+def enable():
+    """Start recording metrics"""
+    global _enabled
+    _enabled = True
+
+
+def disable():
+    """Stop recording metrics (already recorded data is kept)"""
+    global _enabled
+    _enabled = False
+
+
+def is_enabled():
+    return _enabled
+
+
+def reset():
+    """Drop every recorded metric"""
+    with _lock:
+        _metrics.clear()
+
+
+def record(name, seconds, rows=None, size=None):
+    """Add one observation for operation name"""
+    with _lock:
+        metric = _metrics.get(name)
+        if metric is None:
+            metric = _metrics[name] = {
+                'count': 0, 'sum': 0.0, 'max': 0.0,
+                'buckets': [0] * (len(BUCKETS) + 1),
+                'rows': 0, 'bytes': 0,
+            }
+        metric['count'] += 1
+        metric['sum'] += seconds
+        metric['max'] = max(metric['max'], seconds)
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                metric['buckets'][i] += 1
+                break
+        else:
+            metric['buckets'][-1] += 1
+        if rows:
+            metric['rows'] += rows
+        if size:
+            metric['bytes'] += size
+
+
+class _Span:
+    """Times a block of code; set rows/size inside the block to record them"""
+
+    __slots__ = ('name', 'rows', 'size', '_started')
+
+    def __init__(self, name):
+        self.name = name
+        self.rows = None
+        self.size = None
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        record(self.name, time.perf_counter() - self._started, self.rows, self.size)
+        return False
+
+
+class _NullSpan:
+    """Shared do-nothing span used while tracing is disabled"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def __setattr__(self, name, value):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(name):
+    """Context manager timing a block, e.g. ``with span('pdf.build') as s:``"""
+    return _Span(name) if _enabled else _NULL_SPAN
+
+
+def _count_rows(result):
+    """Best-effort row count of a database function result"""
+    if isinstance(result, list):
+        return len(result)
+    if isinstance(result, tuple):
+        return len(result[0]) if result and isinstance(result[0], list) else 1
+    return 0
+
+
+def traced(name):
+    """Decorator recording latency and row counts of a function under name"""
+    def decorator(func):
+        if inspect.isgeneratorfunction(func):
+            @functools.wraps(func)
+            def generator_wrapper(*args, **kwargs):
+                if not _enabled:
+                    yield from func(*args, **kwargs)
+                    return
+                started = time.perf_counter()
+                rows = 0
+                try:
+                    for item in func(*args, **kwargs):
+                        rows += 1
+                        yield item
+                finally:
+                    record(name, time.perf_counter() - started, rows)
+            return generator_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            started = time.perf_counter()
+            result = func(*args, **kwargs)
+            record(name, time.perf_counter() - started, _count_rows(result))
+            return result
+        return wrapper
+    return decorator
+
+
+def instrument_module(namespace, prefix):
+    """Wrap every public function defined in a module namespace with traced()
+
+    Call at the bottom of a module as ``instrument_module(globals(), 'db.')``
+    so later ``from module import func`` imports get the traced version.
+    """
+    module_name = namespace['__name__']
+    for attr, value in list(namespace.items()):
+        if (inspect.isfunction(value) and not attr.startswith('_')
+                and value.__module__ == module_name):
+            namespace[attr] = traced(prefix + attr)(value)
+
+
+def _quantile(metric, q):
+    """Histogram estimate of quantile q in seconds (bucket upper bound)"""
+    target = q * metric['count']
+    seen = 0
+    for i, count in enumerate(metric['buckets']):
+        seen += count
+        if seen >= target and count:
+            return min(BUCKETS[i], metric['max']) if i < len(BUCKETS) else metric['max']
+    return metric['max']
+
+
+def snapshot():
+    """Summary rows for every traced operation, slowest total time first
+
+    Returns:
+        list: Dictionaries with op, count, total/mean/p50/p95/max in ms,
+        rows and bytes
+    """
+    with _lock:
+        metrics = {name: dict(metric, buckets=list(metric['buckets']))
+                   for name, metric in _metrics.items()}
+    rows = []
+    for name, metric in metrics.items():
+        rows.append({
+            'op': name,
+            'count': metric['count'],
+            'total_ms': round(metric['sum'] * 1000, 2),
+            'mean_ms': round(metric['sum'] * 1000 / metric['count'], 3),
+            'p50_ms': round(_quantile(metric, 0.5) * 1000, 3),
+            'p95_ms': round(_quantile(metric, 0.95) * 1000, 3),
+            'max_ms': round(metric['max'] * 1000, 3),
+            'rows': metric['rows'],
+            'bytes': metric['bytes'],
+        })
+    rows.sort(key=lambda row: row['total_ms'], reverse=True)
+    return rows
+
+
+def prometheus_text(extra_counters=None):
+    """Export metrics in the Prometheus text exposition format
+
+    Args:
+        extra_counters: Optional {metric_name: value} added as plain gauges
+
+    Returns:
+        str: Exposition text
+    """
+    with _lock:
+        metrics = sorted((name, dict(metric, buckets=list(metric['buckets'])))
+                         for name, metric in _metrics.items())
+
+    lines = ['# HELP medghor_latency_seconds Latency of traced operations',
+             '# TYPE medghor_latency_seconds histogram']
+    for name, metric in metrics:
+        cumulative = 0
+        for bound, count in zip(BUCKETS + (float('inf'),), metric['buckets']):
+            cumulative += count
+            le = '+Inf' if bound == float('inf') else repr(bound)
+            lines.append(f'medghor_latency_seconds_bucket{{op="{name}",le="{le}"}} {cumulative}')
+        lines.append(f'medghor_latency_seconds_sum{{op="{name}"}} {metric["sum"]:.6f}')
+        lines.append(f'medghor_latency_seconds_count{{op="{name}"}} {metric["count"]}')
+
+    lines += ['# HELP medghor_rows_total Rows returned or written by traced operations',
+              '# TYPE medghor_rows_total counter']
+    lines += [f'medghor_rows_total{{op="{name}"}} {metric["rows"]}' for name, metric in metrics]
+    lines += ['# HELP medghor_output_bytes_total Bytes produced by traced operations',
+              '# TYPE medghor_output_bytes_total counter']
+    lines += [f'medghor_output_bytes_total{{op="{name}"}} {metric["bytes"]}'
+              for name, metric in metrics]
+
+    for metric_name, value in sorted((extra_counters or {}).items()):
+        lines.append(f'# TYPE {metric_name} gauge')
+        lines.append(f'{metric_name} {value}')
+    return '\n'.join(lines) + '\n'
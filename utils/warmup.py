@@ -0,0 +1,54 @@
+"""One-time background warm-up of modules kept out of app startup
+
+ReportLab and the authentication stack (streamlit_authenticator, bcrypt,
+yaml) are only imported when first used, so the first page paints without
+them. start_warmup() is called at the end of the app script, after the
+first page has been sent, and loads them on a daemon thread so the first
+PDF or login does not pay the import cost either.
+
+Set MEDGHOR_WARMUP=0 to disable (the startup benchmark does this to check
+that nothing heavy is imported eagerly).
+"""
+import os
+import threading
+import time
+
+WARMUP_ENV = 'MEDGHOR_WARMUP'
+
+_started = False
+_lock = threading.Lock()
+warmup_seconds = None
+
+
+def preload():
+    """Import deferred modules and build the process-wide cached PDF styles"""
+    from utils.pdf_generator import PDFStyles
+    PDFStyles.get_title_style()
+    PDFStyles.get_brand_style()
+    PDFStyles.get_contents_style()
+    try:
+        import yaml  # noqa: F401
+        import streamlit_authenticator  # noqa: F401
+    except ImportError:
+        pass
+
+
+def _run():
+    global warmup_seconds
+    started = time.perf_counter()
+    try:
+        preload()
+    finally:
+        warmup_seconds = time.perf_counter() - started
+
+
+def start_warmup():
+    """Start the warm-up thread once per process (no-op afterwards)"""
+    global _started
+    if _started or os.environ.get(WARMUP_ENV, '1') == '0':
+        return
+    with _lock:
+        if _started:
+            return
+        _started = True
+    threading.Thread(target=_run, name='warmup', daemon=True).start()